@@ -1,11 +1,18 @@
-from fastapi import APIRouter, HTTPException
-from typing import Dict, List, Any
+from fastapi import APIRouter, HTTPException, Request
+from typing import Dict, List, Any, Tuple
 from datetime import datetime, date, timedelta
 from chinese_calendar import is_workday, is_holiday
 import subprocess
 import sys
 import importlib
 import pkg_resources
+from services.response_cache import response_cache
+from services.excel_service import excel_service
+from core.logger import get_logger, get_row_logger
+
+logger = get_logger(__name__)
+# 逐日的出错日志量大，按采样率输出
+row_logger = get_row_logger(__name__)
 
 router = APIRouter()
 
@@ -19,7 +26,7 @@ def check_and_update_chinese_calendar():
     try:
         # 获取当前安装的版本
         current_version = pkg_resources.get_distribution("chinese-calendar").version
-        print(f"当前chinese-calendar版本: {current_version}")
+        logger.info("当前chinese-calendar版本: %s", current_version)
         
         # 尝试获取最新版本信息
         try:
@@ -37,11 +44,11 @@ def check_and_update_chinese_calendar():
             latest_version_match = re.search(r"chinese-calendar \((.*?)\)", output)
             if latest_version_match:
                 latest_version = latest_version_match.group(1).split(",")[0]
-                print(f"最新chinese-calendar版本: {latest_version}")
+                logger.info("最新chinese-calendar版本: %s", latest_version)
                 
                 # 如果当前版本不是最新版本，尝试更新
                 if current_version != latest_version:
-                    print(f"正在更新chinese-calendar从 {current_version} 到 {latest_version}...")
+                    logger.info("正在更新chinese-calendar从 %s 到 %s...", current_version, latest_version)
                     update_result = subprocess.run(
                         [sys.executable, "-m", "pip", "install", "--upgrade", "chinese-calendar", "--trusted-host", "pypi.org", "--trusted-host", "files.pythonhosted.org"],
                         capture_output=True,
@@ -49,40 +56,66 @@ def check_and_update_chinese_calendar():
                     )
                     
                     if update_result.returncode == 0:
-                        print("chinese-calendar更新成功")
+                        logger.info("chinese-calendar更新成功")
                         # 重新加载模块
                         importlib.reload(sys.modules['chinese_calendar'])
+                        # 节假日数据可能变化，清除已缓存的响应
+                        response_cache.invalidate_tag("holidays")
+                        # 工作日位图和考勤导出产物依赖节假日数据
+                        excel_service.on_calendar_updated()
                         return True
                     else:
-                        print(f"chinese-calendar更新失败: {update_result.stderr}")
+                        logger.error("chinese-calendar更新失败: %s", update_result.stderr)
             
         except Exception as e:
-            print(f"获取最新版本信息失败: {e}")
+            logger.warning("获取最新版本信息失败: %s", e)
         
         return False
     
     except Exception as e:
-        print(f"检查chinese-calendar版本失败: {e}")
+        logger.warning("检查chinese-calendar版本失败: %s", e)
         return False
 
+# 节假日数据按年份缓存，允许浏览器缓存一天
+HOLIDAY_CACHE_CONTROL = "public, max-age=86400"
+
 @router.get("/holidays")
-async def get_holidays(year: int) -> Dict[str, List[str]]:
+async def get_holidays(request: Request, year: int):
     """
     获取指定年份的节假日和调休工作日信息
     
+    结果按年份缓存序列化和预压缩后的响应体，并支持ETag条件请求
+    
     Args:
         year: 年份
         
     Returns:
         Dict[str, List[str]]: 包含节假日和调休工作日的字典
     """
+    cache_key = f"holidays:{year}"
+    body = response_cache.get(cache_key)
+    if body is None:
+        result, complete = compute_holidays(year)
+        if not complete:
+            # 日历数据不完整时不缓存，下次请求重新计算
+            return result
+        body = response_cache.put(cache_key, result, tags=["holidays"])
+    return response_cache.build_response(request, body, HOLIDAY_CACHE_CONTROL)
+
+def compute_holidays(year: int) -> Tuple[Dict[str, List[str]], bool]:
+    """
+    计算指定年份的节假日和调休工作日
+    
+    Returns:
+        Tuple[Dict[str, List[str]], bool]: 节假日数据，以及数据是否完整（未退回按周末判断）
+    """
     # 验证年份范围
     current_year = datetime.now().year
     if year < 1949 or year > current_year + 5:  # 允许查询未来5年的数据
         return {
             "holidays": [],
             "workdaysOnWeekends": []
-        }
+        }, True
     
     # 获取该年的所有日期
     start_date = date(year, 1, 1)
@@ -93,6 +126,7 @@ async def get_holidays(year: int) -> Dict[str, List[str]]:
     workdaysOnWeekends = []
     
     update_attempted = False
+    complete = True
     
     # 遍历该年的每一天
     for i in range(delta.days + 1):
@@ -111,7 +145,7 @@ async def get_holidays(year: int) -> Dict[str, List[str]]:
         except NotImplementedError as e:
             # 如果是因为年份不支持导致的错误，尝试更新库
             if not update_attempted:
-                print(f"获取 {year} 年数据失败，尝试更新chinese-calendar库...")
+                logger.warning("获取 %s 年数据失败，尝试更新chinese-calendar库...", year)
                 update_attempted = True
                 updated = check_and_update_chinese_calendar()
                 
@@ -127,15 +161,17 @@ async def get_holidays(year: int) -> Dict[str, List[str]]:
                         # 如果成功获取数据，继续处理
                         continue
                     except Exception as inner_e:
-                        print(f"更新后仍然无法获取数据: {inner_e}")
+                        logger.error("更新后仍然无法获取数据: %s", inner_e)
             
             # 如果更新失败或者更新后仍然无法获取数据，使用基本的周末判断
-            print(f"处理日期 {date_str} 时出错: {e}")
+            complete = False
+            row_logger.warning("处理日期 %s 时出错: %s", date_str, e)
             if weekday >= 5:  # 周六和周日
                 holidays.append(date_str)
         except Exception as e:
             # 如果出错，记录日志但不中断处理
-            print(f"处理日期 {date_str} 时出错: {e}")
+            complete = False
+            row_logger.warning("处理日期 %s 时出错: %s", date_str, e)
             # 对于出错的日期，使用基本的周末判断
             if weekday >= 5:  # 周六和周日
                 holidays.append(date_str)
@@ -143,4 +179,4 @@ async def get_holidays(year: int) -> Dict[str, List[str]]:
     return {
         "holidays": holidays,
         "workdaysOnWeekends": workdaysOnWeekends
-    } 
\ No newline at end of file
+    }, complete
@@ -1,9 +1,11 @@
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
 from models.schemas import ProcessingResponse
-from services.invoice_service import InvoiceService
+from services.invoice_service import invoice_service
+from core.logger import get_logger
+
+logger = get_logger(__name__)
 
 router = APIRouter()
-invoice_service = InvoiceService()
 
 @router.post("/upload", response_model=ProcessingResponse)
 async def upload_invoice(
@@ -49,5 +51,5 @@ async def upload_invoice(
     except HTTPException as e:
         raise e
     except Exception as e:
-        print(f"发票识别失败: {str(e)}")
+        logger.exception("发票识别失败: %s", e)
         raise HTTPException(status_code=500, detail=f"发票识别失败: {str(e)}") 
\ No newline at end of file
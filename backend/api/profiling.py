@@ -0,0 +1,38 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Header
+from fastapi.responses import FileResponse
+from models.schemas import ProcessingResponse
+from core.profiling import request_profiler
+
+router = APIRouter()
+
+
+def verify_profile_token(token: Optional[str]):
+    """校验剖析令牌，未配置 PROFILE_TOKEN 或令牌不一致时拒绝访问"""
+    if not request_profiler.is_authorized(token):
+        raise HTTPException(status_code=403, detail="无权访问剖析结果")
+
+
+@router.get("", response_model=ProcessingResponse)
+async def list_profiles(x_profile_token: Optional[str] = Header(None)):
+    """
+    列出已保存的剖析结果，最新的在前
+    """
+    verify_profile_token(x_profile_token)
+    return ProcessingResponse(
+        success=True,
+        message="获取剖析结果列表成功",
+        data=request_profiler.list_profiles()
+    )
+
+
+@router.get("/{name}")
+async def download_profile(name: str, x_profile_token: Optional[str] = Header(None)):
+    """
+    下载剖析结果（折叠调用栈格式，可用 flamegraph.pl 或 speedscope 生成火焰图）
+    """
+    verify_profile_token(x_profile_token)
+    path = request_profiler.get_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="剖析结果不存在")
+    return FileResponse(path, filename=name, media_type="text/plain; charset=utf-8")
@@ -1,17 +1,23 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Body
-from fastapi.responses import FileResponse
-from services.excel_service import ExcelService
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Body, Request
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse, Response
+from services.excel_service import excel_service, MERGE_SAMPLE_SIZE
+from services.artifact_service import artifact_service
+from services.response_cache import response_cache
+from services.file_index import InvalidSortError
+from core.metrics import export_timer
 from models.schemas import ProcessingResponse, ExportRequest
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+from datetime import date
 import os
 from urllib.parse import quote
 from api import holiday, settings
 import numpy as np
 import json
-import traceback
+from core.logger import get_logger
+
+logger = get_logger(__name__)
 
 router = APIRouter()
-excel_service = ExcelService()
 
 # 注册节假日路由
 router.include_router(holiday.router, tags=["holiday"])
@@ -19,6 +25,64 @@ router.include_router(holiday.router, tags=["holiday"])
 # 注册系统设置路由
 router.include_router(settings.router, prefix="/settings", tags=["settings"])
 
+# 是否通过 nginx 的 X-Accel-Redirect 发送导出文件，启用后由 nginx 直接从上传目录读取文件，
+# 不再经过 Python 进程；需要 nginx 配置对应的 internal location 并挂载上传目录
+EXPORT_ACCEL_REDIRECT = os.getenv("EXPORT_ACCEL_REDIRECT", "False").lower() == "true"
+# nginx 中映射到上传目录的 internal location 前缀
+EXPORT_ACCEL_PREFIX = os.getenv("EXPORT_ACCEL_PREFIX", "/_protected_uploads/")
+# 上传目录，X-Accel-Redirect 路径相对于该目录计算
+UPLOADS_ROOT = os.path.abspath(os.getenv("UPLOADS_ROOT", "uploads"))
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+def build_content_disposition(filename: str) -> str:
+    """
+    构建附件下载的 Content-Disposition 响应头
+    
+    filename 保持URL编码的文件名以兼容前端的解析方式，
+    filename* 按 RFC 5987 声明UTF-8编码，浏览器优先使用
+    """
+    encoded_filename = quote(filename)
+    return f'attachment; filename="{encoded_filename}"; filename*=UTF-8\'\'{encoded_filename}'
+
+def get_accel_redirect_path(file_path: str) -> Optional[str]:
+    """获取导出文件对应的 X-Accel-Redirect 路径，文件不在上传目录下时返回None"""
+    abs_path = os.path.abspath(file_path)
+    if os.path.commonpath([abs_path, UPLOADS_ROOT]) != UPLOADS_ROOT:
+        return None
+    relative_path = os.path.relpath(abs_path, UPLOADS_ROOT).replace(os.sep, '/')
+    return EXPORT_ACCEL_PREFIX.rstrip('/') + '/' + quote(relative_path)
+
+def build_export_response(file_path: str, filename: str, extra_headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    构建导出文件的下载响应
+    
+    启用 X-Accel-Redirect 时只返回响应头，由 nginx 使用 sendfile 发送文件，
+    否则通过 FileResponse 由 Python 进程发送
+    
+    参数:
+    - file_path: 导出产物在磁盘上的路径
+    - filename: 下载时使用的文件名
+    - extra_headers: 附加的响应头
+    """
+    headers = {
+        'Content-Disposition': build_content_disposition(filename)
+    }
+    if extra_headers:
+        headers.update(extra_headers)
+    
+    if EXPORT_ACCEL_REDIRECT:
+        accel_path = get_accel_redirect_path(file_path)
+        if accel_path:
+            headers['X-Accel-Redirect'] = accel_path
+            return Response(headers=headers, media_type=XLSX_MEDIA_TYPE)
+    
+    return FileResponse(
+        file_path,
+        headers=headers,
+        media_type=XLSX_MEDIA_TYPE
+    )
+
 @router.post("/upload", response_model=ProcessingResponse)
 async def upload_file(file: UploadFile = File(...), type: str = Query(..., description="文件类型：overtime 或 leave")):
     """
@@ -34,15 +98,14 @@ async def upload_file(file: UploadFile = File(...), type: str = Query(..., descr
     
     try:
         result = await excel_service.process_upload(file, type)
-        return ProcessingResponse(
+        return ORJSONResponse(ProcessingResponse(
             success=True,
             message="文件上传成功",
             data=result
-        )
+        ).dict())
     except Exception as e:
         # 详细记录错误信息
-        print(f"文件上传处理错误: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("文件上传处理错误: %s", e)
         
         return ProcessingResponse(
             success=False,
@@ -50,27 +113,66 @@ async def upload_file(file: UploadFile = File(...), type: str = Query(..., descr
             data=None
         )
 
+# 分页数据的缓存策略：同一文件ID的内容不会改变，可以长期缓存
+PAGE_CACHE_CONTROL = "private, max-age=3600"
+# 合并预览为POST请求，只通过ETag进行条件请求
+MERGE_CACHE_CONTROL = "private, no-cache"
+
 @router.get("/data/{file_id}", response_model=ProcessingResponse)
 async def get_paginated_data(
+    http_request: Request,
     file_id: str,
     page: int = Query(1, ge=1, description="页码"),
-    size: int = Query(10, ge=1, le=100, description="每页数量")
+    size: int = Query(10, ge=1, le=100, description="每页数量"),
+    name: Optional[str] = Query(None, description="按创建人/加班人筛选，多个姓名用逗号分隔"),
+    leave_type: Optional[str] = Query(None, description="按请假类型筛选，多个类型用逗号分隔"),
+    start_date: Optional[date] = Query(None, description="开始时间不早于该日期，格式YYYY-MM-DD"),
+    end_date: Optional[date] = Query(None, description="开始时间不晚于该日期，格式YYYY-MM-DD"),
+    keyword: Optional[str] = Query(None, description="全文搜索关键字"),
+    sort: Optional[str] = Query(None, description="排序列，多个列用逗号分隔，列名前加-表示降序")
 ):
     """
-    获取Excel文件的分页数据
+    获取Excel文件的分页数据，支持筛选、排序和搜索
     
     参数:
     - file_id: 文件ID
     - page: 页码，从1开始
     - size: 每页数量，默认10条
+    - name: 按创建人/加班人筛选
+    - leave_type: 按请假类型筛选
+    - start_date / end_date: 按开始时间的日期范围筛选
+    - keyword: 全文搜索关键字
+    - sort: 排序列，如 "-开始时间,创建人"
     """
     try:
-        result = await excel_service.get_paginated_data(file_id, page, size)
-        return ProcessingResponse(
-            success=True,
-            message="获取数据成功",
-            data=result
-        )
+        if file_id not in excel_service.files:
+            raise ValueError(f"文件ID {file_id} 不存在")
+        
+        # 同一文件内容的同一页结果不会改变，缓存预压缩的响应体
+        cache_key = (f"data:{excel_service.get_file_hash(file_id)}:{page}:{size}:"
+                     f"{name}:{leave_type}:{start_date}:{end_date}:{keyword}:{sort}")
+        body = response_cache.get(cache_key)
+        if body is None:
+            result = await excel_service.get_paginated_data(
+                file_id,
+                page,
+                size,
+                name=name,
+                leave_type=leave_type,
+                start_date=start_date,
+                end_date=end_date,
+                keyword=keyword,
+                sort=sort
+            )
+            body = response_cache.put(cache_key, ProcessingResponse(
+                success=True,
+                message="获取数据成功",
+                data=result
+            ).dict(), tags=[f"file:{file_id}"])
+        return response_cache.build_response(http_request, body, PAGE_CACHE_CONTROL)
+    except InvalidSortError as e:
+        # 排序列不存在属于请求参数错误
+        raise HTTPException(status_code=400, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
@@ -96,6 +198,52 @@ async def delete_file(file_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/merge/leave", response_model=ProcessingResponse)
+async def merge_leave_records(
+    http_request: Request,
+    request: ExportRequest,
+    stream: bool = Query(False, description="是否以NDJSON流的形式返回全部合并记录")
+):
+    """
+    合并请假记录并返回预览数据
+    
+    参数:
+    - request: 包含要合并的请假记录文件ID列表
+    - stream: 为true时返回NDJSON流，第一行为表头和总行数，之后每行一条记录；
+      否则只返回前100条记录作为预览
+    """
+    try:
+        if stream:
+            chunks = await excel_service.stream_merged_leave_records(request.file_ids)
+            return StreamingResponse(chunks, media_type="application/x-ndjson")
+
+        # 所有文件都存在时才使用缓存，否则交由合并逻辑报告错误
+        cache_key = None
+        body = None
+        if all(file_id in excel_service.files for file_id in request.file_ids):
+            cache_key = f"merge:{excel_service.get_merge_key(request.file_ids)}:{MERGE_SAMPLE_SIZE}"
+            body = response_cache.get(cache_key)
+        if body is None:
+            result = await excel_service.merge_leave_records(request.file_ids)
+            # 合并结果已是原生类型，直接使用orjson序列化，跳过响应模型校验
+            payload = {
+                "success": True,
+                "message": "合并请假记录成功",
+                "data": result
+            }
+            if cache_key is None:
+                return ORJSONResponse(payload)
+            body = response_cache.put(cache_key, payload, tags=[f"file:{file_id}" for file_id in request.file_ids])
+        return response_cache.build_response(http_request, body, MERGE_CACHE_CONTROL)
+    except ValueError as e:
+        return ORJSONResponse(ProcessingResponse(
+            success=False,
+            message=str(e),
+            data=None
+        ).dict())
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/export/overtime", response_class=FileResponse)
 async def export_overtime(request: ExportRequest):
     """
@@ -105,18 +253,9 @@ async def export_overtime(request: ExportRequest):
     - request: 包含要导出的文件ID列表
     """
     try:
-        file_path = await excel_service.export_overtime(request.file_ids)
-        filename = os.path.basename(file_path)
-        # 对中文文件名进行 URL 编码
-        encoded_filename = quote(filename)
-        headers = {
-            'Content-Disposition': f'attachment; filename="{encoded_filename}"'
-        }
-        return FileResponse(
-            file_path,
-            headers=headers,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
+        with export_timer('overtime'):
+            file_path = await excel_service.export_overtime(request.file_ids)
+        return build_export_response(file_path, excel_service.get_export_filename('overtime'))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -129,18 +268,9 @@ async def export_leave(request: ExportRequest):
     - request: 包含要导出的文件ID列表
     """
     try:
-        file_path = await excel_service.export_leave(request.file_ids)
-        filename = os.path.basename(file_path)
-        # 对中文文件名进行 URL 编码
-        encoded_filename = quote(filename)
-        headers = {
-            'Content-Disposition': f'attachment; filename="{encoded_filename}"'
-        }
-        return FileResponse(
-            file_path,
-            headers=headers,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
+        with export_timer('leave'):
+            file_path = await excel_service.export_leave(request.file_ids)
+        return build_export_response(file_path, excel_service.get_export_filename('leave'))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -156,18 +286,9 @@ async def export_attendance(request: ExportRequest):
         if not request.file_ids:
             raise HTTPException(status_code=400, detail="请提供至少一个文件ID")
 
-        file_path = await excel_service.export_attendance(request.file_ids)
-        filename = os.path.basename(file_path)
-        # 对中文文件名进行 URL 编码
-        encoded_filename = quote(filename)
-        headers = {
-            'Content-Disposition': f'attachment; filename="{encoded_filename}"'
-        }
-        return FileResponse(
-            file_path,
-            headers=headers,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
+        with export_timer('attendance'):
+            file_path = await excel_service.export_attendance(request.file_ids)
+        return build_export_response(file_path, excel_service.get_export_filename('attendance'))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -187,28 +308,23 @@ async def export_merged_leave(request: ExportRequest):
                 data=None
             ).dict()
         
-        file_path = await excel_service.export_merged_leave(request.file_ids)
-        filename = os.path.basename(file_path)
-        # 对中文文件名进行 URL 编码
-        encoded_filename = quote(filename)
-        headers = {
-            'Content-Disposition': f'attachment; filename="{encoded_filename}"'
-        }
-        return FileResponse(
-            file_path,
-            headers=headers,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
+        with export_timer('merged_leave'):
+            file_path = await excel_service.export_merged_leave(request.file_ids)
+        # 通过响应头返回去重时删除的重复行数
+        extra_headers = {}
+        dropped = artifact_service.get_metadata(file_path).get('dropped_duplicates')
+        if dropped is not None:
+            extra_headers['X-Dropped-Duplicates'] = str(dropped)
+        return build_export_response(file_path, excel_service.get_export_filename('merged_leave'), extra_headers)
     except ValueError as e:
-        print(f"导出合并请假记录值错误: {str(e)}")
+        logger.warning("导出合并请假记录值错误: %s", e)
         return ProcessingResponse(
             success=False,
             message=str(e),
             data=None
         ).dict()
     except Exception as e:
-        print(f"导出合并请假记录异常: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("导出合并请假记录异常: %s", e)
         return ProcessingResponse(
             success=False,
             message=f"导出合并请假记录失败: {str(e)}",
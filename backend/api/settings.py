@@ -1,10 +1,10 @@
 from fastapi import APIRouter, HTTPException
 from models.schemas import UpdateSystemSettingsRequest, ProcessingResponse
 from services.settings_service import settings_service
-from services.excel_service import ExcelService
+from services.excel_service import excel_service, EXCEL_ENGINES
+from services.records import validate_column_mapping
 
 router = APIRouter()
-excel_service = ExcelService()
 
 @router.get("/system", response_model=ProcessingResponse)
 async def get_system_settings():
@@ -34,7 +34,23 @@ async def update_system_settings(request: UpdateSystemSettingsRequest):
         if "max_files" in settings_dict and settings_dict["max_files"] < 10:
             raise ValueError("最大文件数量不能小于10")
         
+        # 验证max_storage_mb参数
+        if "max_storage_mb" in settings_dict and settings_dict["max_storage_mb"] < 10:
+            raise ValueError("最大占用空间不能小于10MB")
+        
+        # 验证excel_engine参数
+        if "excel_engine" in settings_dict and settings_dict["excel_engine"] not in EXCEL_ENGINES:
+            raise ValueError(f"Excel读取引擎必须是 {', '.join(EXCEL_ENGINES)} 之一")
+        
+        # 验证record_columns参数
+        if "record_columns" in settings_dict:
+            validate_column_mapping(settings_dict["record_columns"])
+        
         updated_settings = settings_service.update_settings(settings_dict)
+        
+        # 列映射变化后按新映射重新生成归一化记录
+        if "record_columns" in settings_dict:
+            excel_service.clear_record_cache()
         return ProcessingResponse(
             success=True,
             message="更新系统设置成功",
@@ -51,7 +67,7 @@ async def clean_files():
     立即清理文件
     """
     try:
-        # 强制清理文件
+        # 立即按文件数量和占用空间配额清理旧文件
         excel_service.check_and_clean_files()
         return ProcessingResponse(
             success=True,
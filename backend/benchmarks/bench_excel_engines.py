@@ -0,0 +1,59 @@
+"""Excel读取引擎性能对比
+
+在模拟的钉钉加班、请假导出上比较 calamine 与 openpyxl 引擎的读取耗时。
+
+用法（在 backend 目录下执行）:
+    python -m benchmarks.bench_excel_engines --rows 10000 50000 --repeat 3
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.generators import generate_overtime_workbook, generate_leave_workbook
+
+ENGINES = ['openpyxl', 'calamine']
+
+
+def time_read(path: str, engine: str, repeat: int) -> float:
+    """返回多次读取耗时的中位数（秒）"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pd.read_excel(path, header=None, engine=engine)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Excel读取引擎性能对比")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 50000], help="数据行数")
+    parser.add_argument('--repeat', type=int, default=3, help="每个用例重复次数")
+    parser.add_argument('--workdir', default=None, help="生成工作簿的目录，默认使用临时目录")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='excel_engine_bench_')
+    print(f"{'文件':<24}{'引擎':<12}{'耗时(秒)':>10}{'加速比':>10}")
+
+    for rows in args.rows:
+        cases = [
+            (f"加班记录 {rows}行", generate_overtime_workbook(os.path.join(workdir, f"overtime_{rows}.xlsx"), rows)),
+            (f"请假记录 {rows}行", generate_leave_workbook(os.path.join(workdir, f"leave_{rows}.xlsx"), rows)),
+        ]
+        for label, path in cases:
+            baseline = None
+            for engine in ENGINES:
+                try:
+                    elapsed = time_read(path, engine, args.repeat)
+                except ImportError as e:
+                    print(f"{label:<24}{engine:<12}{'不可用':>10}  ({e})")
+                    continue
+                baseline = baseline or elapsed
+                print(f"{label:<24}{engine:<12}{elapsed:>10.3f}{baseline / elapsed:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+"""模拟钉钉导出的加班、请假记录工作簿生成器
+
+生成的数据结构与钉钉审批导出一致：第一行为表头，包含大量审批相关列，
+其中业务列（加班人/创建人、开始时间、结束时间、时长等）与真实导出同名。
+相同的参数和随机种子总是生成相同的数据，便于对比不同版本的性能。
+"""
+import os
+import random
+from datetime import datetime, timedelta
+from typing import List
+
+import xlsxwriter
+
+# 钉钉审批导出中与业务无关的公共列
+APPROVAL_COLUMNS = [
+    '审批编号', '标题', '审批状态', '审批结果', '发起时间', '完成时间', '耗时(时:分:秒)',
+    '发起人工号', '发起人UserID', '发起人姓名', '发起人部门', '历史审批人姓名',
+    '审批记录', '当前处理人姓名', '审批耗时(时:分:秒)', '抄送人', '部门负责人',
+    '所属公司', '成本中心', '备注', '附件', '关联审批单', '审批人意见', '流程版本',
+    '业务类型', '数据来源', '更新时间'
+]
+
+OVERTIME_COLUMNS = ['加班人', '开始时间', '结束时间', '时长', '加班原因', '核算方式']
+LEAVE_COLUMNS = ['数据ID', '创建人', '请假类型', '开始时间', '结束时间', '时长', '请假事由']
+
+LEAVE_TYPES = ['年假', '事假', '病假', '调休', '婚假', '产假', '丧假']
+OVERTIME_REASONS = ['项目上线', '版本发布', '客户支持', '月末结账', '系统维护']
+
+
+def _names(count: int) -> List[str]:
+    """生成固定的员工姓名列表"""
+    surnames = '赵钱孙李周吴郑王冯陈褚卫蒋沈韩杨朱秦尤许何吕施张孔曹严华金魏陶姜'
+    given = '伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂英'
+    return [surnames[i % len(surnames)] + given[(i // len(surnames)) % len(given)] + str(i // 100 or '')
+            for i in range(count)]
+
+
+def _write_workbook(path: str, header: List[str], rows):
+    """以常量内存模式写入工作簿"""
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    worksheet = workbook.add_worksheet('Sheet1')
+    worksheet.write_row(0, 0, header)
+    for row_idx, row in enumerate(rows, start=1):
+        worksheet.write_row(row_idx, 0, row)
+    workbook.close()
+
+
+def _approval_values(rng: random.Random, row_idx: int, start: datetime) -> List[str]:
+    """生成公共审批列的值"""
+    created = start - timedelta(days=rng.randint(1, 5))
+    return [
+        f"2024{row_idx:010d}", f"加班/请假申请-{row_idx}", '已完成', '同意',
+        created.strftime('%Y-%m-%d %H:%M'), (created + timedelta(hours=3)).strftime('%Y-%m-%d %H:%M'),
+        '3:00:00', f"{10000 + row_idx % 5000}", f"user{row_idx % 5000}", '', '研发部', '部门主管',
+        '同意', '', '3:00:00', '', '部门主管', '示例公司', 'CC-001', '', '', '', '同意', 'v3',
+        '审批', '钉钉', created.strftime('%Y-%m-%d %H:%M')
+    ]
+
+
+def generate_overtime_workbook(path: str, rows: int, employees: int = 500, year: int = 2024,
+                               month: int = 3, seed: int = 42) -> str:
+    """生成加班记录工作簿
+
+    Args:
+        path: 输出文件路径
+        rows: 数据行数
+        employees: 员工人数
+        year: 记录所在年份
+        month: 记录所在月份
+        seed: 随机种子
+
+    Returns:
+        str: 输出文件路径
+    """
+    rng = random.Random(seed)
+    names = _names(employees)
+    header = APPROVAL_COLUMNS + OVERTIME_COLUMNS
+
+    def row_iter():
+        for i in range(rows):
+            start = datetime(year, month, rng.randint(1, 28), rng.choice([18, 19, 9]), 0)
+            hours = rng.choice([1, 2, 2.5, 3, 4, 8])
+            end = start + timedelta(hours=hours)
+            yield _approval_values(rng, i, start) + [
+                names[rng.randrange(employees)],
+                start.strftime('%Y-%m-%d %H:%M'),
+                end.strftime('%Y-%m-%d %H:%M'),
+                f"{hours:g}小时",
+                rng.choice(OVERTIME_REASONS),
+                '按加班时长'
+            ]
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    _write_workbook(path, header, row_iter())
+    return path
+
+
+def generate_leave_workbook(path: str, rows: int, employees: int = 500, year: int = 2024,
+                            month: int = 3, seed: int = 7, id_offset: int = 0) -> str:
+    """生成请假记录工作簿
+
+    Args:
+        path: 输出文件路径
+        rows: 数据行数
+        employees: 员工人数
+        year: 记录所在年份
+        month: 记录所在月份
+        seed: 随机种子
+        id_offset: 数据ID起始偏移，用于生成有部分重叠的多个文件
+
+    Returns:
+        str: 输出文件路径
+    """
+    rng = random.Random(seed)
+    names = _names(employees)
+    header = APPROVAL_COLUMNS + LEAVE_COLUMNS
+
+    def row_iter():
+        for i in range(rows):
+            start = datetime(year, month, rng.randint(1, 25))
+            if rng.random() < 0.7:
+                # 半天或一天的短假
+                hours = rng.choice([4, 8])
+                end = start
+                duration = f"{hours}小时" if hours < 8 else '1天'
+            else:
+                days = rng.randint(2, 10)
+                end = start + timedelta(days=days - 1)
+                duration = f"{days}天"
+            yield _approval_values(rng, i, start) + [
+                f"LV{id_offset + i:08d}",
+                names[rng.randrange(employees)],
+                rng.choice(LEAVE_TYPES),
+                start.strftime('%Y-%m-%d') + ' 上午',
+                end.strftime('%Y-%m-%d') + ' 下午',
+                duration,
+                '个人事务'
+            ]
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    _write_workbook(path, header, row_iter())
+    return path
+
+
+# 发票类型 -> (销售方名称, 明细项目)
+INVOICE_SELLERS = {
+    'highway': ('某某高速公路管理有限公司', '*运输服务*通行费'),
+    'taxi': ('某某出租汽车有限公司', '*交通服务*出租车费'),
+    'meal': ('某某餐饮管理有限公司', '*餐饮服务*餐费'),
+    'accommodation': ('某某酒店管理有限公司', '*住宿服务*住宿费'),
+    'office': ('某某办公用品有限公司', '*纸制品*打印纸'),
+    'other': ('某某商贸有限公司', '*服务*服务费'),
+}
+TAX_RATES = [0.03, 0.06, 0.09, 0.13]
+
+
+def generate_invoice_ocr_results(count: int, seed: int = 11) -> List[List[tuple]]:
+    """生成模拟PaddleOCR识别结果的电子发票文本块
+
+    每张发票是 (文本, 文本框四点坐标, 置信度) 的列表，与
+    InvoiceService._recognize_text_with_paddle 的返回格式一致，
+    包含发票号码、干扰编号（机器编号、校验码、税号）、明细行和价税合计。
+
+    Args:
+        count: 发票张数
+        seed: 随机种子
+
+    Returns:
+        List[List[tuple]]: 每张发票的文本块列表
+    """
+    rng = random.Random(seed)
+    invoice_types = list(INVOICE_SELLERS)
+    results = []
+    for i in range(count):
+        invoice_type = invoice_types[i % len(invoice_types)]
+        seller, item = INVOICE_SELLERS[invoice_type]
+        amount = round(rng.uniform(10, 5000), 2)
+        tax_rate = rng.choice(TAX_RATES)
+        tax = round(amount * tax_rate, 2)
+        total = round(amount + tax, 2)
+        lines = [
+            '电子发票（普通发票）',
+            f"发票号码：{24000000000000000000 + rng.randrange(10 ** 12)}",
+            f"开票日期：2024年{rng.randint(1, 12):02d}月{rng.randint(1, 28):02d}日",
+            f"机器编号：{rng.randrange(10 ** 11, 10 ** 12)}",
+            f"校验码：{rng.randrange(10 ** 19, 10 ** 20)}",
+            f"纳税人识别号：91{rng.randrange(10 ** 15, 10 ** 16)}",
+            f"销售方名称：{seller}",
+            item,
+            f"{amount:.2f}",
+            f"{tax_rate * 100:g}%",
+            f"{tax:.2f}",
+            f"合计 ¥{amount:.2f} ¥{tax:.2f}",
+            f"价税合计（大写） 整 （小写）¥{total:.2f}",
+            f"开票人：开票员{i % 10}",
+        ]
+        blocks = []
+        for row, text in enumerate(lines):
+            # 明细行的金额、税率、税额在同一行，便于按垂直位置匹配税额
+            in_detail = 8 <= row <= 10
+            y = 40 * 8 if in_detail else 40 * row
+            x = 100 + 200 * (row - 8) if in_detail else 100
+            box = [[x, y], [x + 180, y], [x + 180, y + 30], [x, y + 30]]
+            blocks.append((text, box, round(rng.uniform(0.85, 0.99), 3)))
+        results.append(blocks)
+    return results
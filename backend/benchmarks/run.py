@@ -0,0 +1,364 @@
+"""后端性能基准测试套件
+
+在模拟的钉钉加班、请假导出和模拟的发票OCR文本上，测量上传解析、分页、各类导出、
+请假合并、报表生成和发票解析的耗时。结果写入JSON文件，可以与保存的基线对比，
+找出变慢的用例。
+
+导出用例在文件已解析的状态下测量（与上传后再导出的实际使用一致），
+每次重复前删除导出产物和合并缓存，测量的是实际生成导出文件的耗时。
+
+用法（在 backend 目录下执行）:
+    python -m benchmarks.run --rows 1000 10000 50000 --repeat 3
+    python -m benchmarks.run --rows 200000 --repeat 1 --only upload export
+    python -m benchmarks.run --save-baseline                     # 保存为基线
+    python -m benchmarks.run --baseline benchmarks/baseline.json  # 与基线对比，有回归时退出码为1
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+# 基准测试按生产环境配置运行，不输出逐行调试日志
+os.environ.setdefault('ENVIRONMENT', 'production')
+os.environ.setdefault('LOG_ROW_SAMPLE_RATE', '0')
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCHMARK_DIR)
+# 运行时会切换工作目录，保证之后仍能导入 backend 下的模块
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.generators import (
+    generate_overtime_workbook, generate_leave_workbook, generate_invoice_ocr_results
+)
+
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, 'results')
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+
+# 用例分组，--only 按分组筛选
+GROUPS = ['upload', 'paginate', 'export', 'merge', 'report', 'invoice']
+# 报销明细报表的明细条数
+EXPENSE_ITEM_COUNTS = [50, 500]
+# 发票解析用例的发票张数
+INVOICE_COUNT = 200
+# 每页行数，与前端默认分页一致
+PAGE_SIZE = 50
+# 耗时增加超过该比例且超过最小差值时视为回归
+REGRESSION_THRESHOLD = 0.10
+REGRESSION_MIN_DELTA = 0.005
+
+
+class LocalUpload:
+    """模拟 FastAPI UploadFile 的本地文件，供 ExcelService.process_upload 读取"""
+
+    def __init__(self, path: str):
+        self.filename = os.path.basename(path)
+        self._file = open(path, 'rb')
+
+    async def read(self, size: int = -1) -> bytes:
+        return self._file.read(size)
+
+    def close(self):
+        self._file.close()
+
+
+class BenchmarkSuite:
+    """收集各用例的耗时"""
+
+    def __init__(self, repeat: int, groups: List[str]):
+        self.repeat = repeat
+        self.groups = groups
+        self.results: List[Dict[str, Any]] = []
+
+    def enabled(self, group: str) -> bool:
+        return group in self.groups
+
+    async def measure(self, name: str, rows: Optional[int], func: Callable[[], Any],
+                      setup: Optional[Callable[[], Any]] = None, repeat: Optional[int] = None):
+        """多次执行用例并记录耗时
+
+        Args:
+            name: 用例名称
+            rows: 数据规模（行数或条数）
+            func: 被测函数，返回值为协程时等待其完成
+            setup: 每次执行前调用的准备函数，不计入耗时
+            repeat: 重复次数，默认使用套件的重复次数
+        """
+        timings = []
+        for _ in range(repeat or self.repeat):
+            if setup is not None:
+                prepared = setup()
+                if inspect.isawaitable(prepared):
+                    await prepared
+            start = time.perf_counter()
+            result = func()
+            if inspect.isawaitable(result):
+                await result
+            timings.append(time.perf_counter() - start)
+
+        entry = {
+            'name': name,
+            'rows': rows,
+            'repeat': len(timings),
+            'median': statistics.median(timings),
+            'min': min(timings),
+            'max': max(timings),
+            'mean': statistics.mean(timings),
+        }
+        self.results.append(entry)
+        print(f"{name:<28}{rows if rows is not None else '-':>10}{entry['median']:>12.4f}{entry['min']:>12.4f}")
+
+
+def result_key(entry: Dict[str, Any]) -> str:
+    """用于与基线对比的用例键"""
+    return f"{entry['name']}@{entry['rows']}"
+
+
+async def bench_excel(suite: BenchmarkSuite, rows: int, workdir: str):
+    """上传、分页、导出和合并用例"""
+    from services.excel_service import excel_service as service
+    from services.artifact_service import artifact_service
+
+    overtime_path = generate_overtime_workbook(os.path.join(workdir, f"overtime_{rows}.xlsx"), rows)
+    leave_path = generate_leave_workbook(os.path.join(workdir, f"leave_{rows}.xlsx"), rows)
+    # 第二个请假文件与第一个有一半重叠，用于合并去重
+    leave_overlap_path = generate_leave_workbook(
+        os.path.join(workdir, f"leave_overlap_{rows}.xlsx"), rows, seed=8, id_offset=rows // 2
+    )
+
+    # 使用与接口相同的服务单例：另建实例会向保留策略重复注册上传目录和淘汰回调，
+    # 并与单例各自维护文件注册表和缓存，测得的也不是线上实际使用的对象
+    state: Dict[str, Any] = {}
+
+    async def upload(path: str, file_type: str) -> str:
+        upload_file = LocalUpload(path)
+        try:
+            preview = await service.process_upload(upload_file, file_type)
+        finally:
+            upload_file.close()
+        await service.wait_parsed([preview.file_id])
+        state['uploaded'] = preview.file_id
+        return preview.file_id
+
+    async def delete_uploaded():
+        # 删除上一次上传的文件，避免内容相同的文件直接复用已解析的数据
+        file_id = state.pop('uploaded', None)
+        if file_id is not None:
+            await service.delete_file(file_id)
+
+    # 上传：保存文件、生成预览并完成后台解析
+    for file_type, path in (('overtime', overtime_path), ('leave', leave_path)):
+        if suite.enabled('upload'):
+            await suite.measure(f"upload.{file_type}", rows, lambda: upload(path, file_type), setup=delete_uploaded)
+            await delete_uploaded()
+
+    overtime_id = await upload(overtime_path, 'overtime')
+    leave_id = await upload(leave_path, 'leave')
+    leave_overlap_id = await upload(leave_overlap_path, 'leave')
+
+    if suite.enabled('paginate'):
+        total_pages = max(1, rows // PAGE_SIZE)
+        pages = [1, max(1, total_pages // 2), total_pages]
+        first_page = await service.get_paginated_data(leave_id, 1, PAGE_SIZE)
+        sample_name = first_page.items[0].get('创建人') if first_page.items else None
+
+        async def paginate():
+            for page in pages:
+                await service.get_paginated_data(leave_id, page, PAGE_SIZE)
+
+        await suite.measure('paginate.pages', rows, paginate)
+        await suite.measure('paginate.filter_name', rows,
+                            lambda: service.get_paginated_data(leave_id, 1, PAGE_SIZE, name=sample_name))
+        await suite.measure('paginate.search', rows,
+                            lambda: service.get_paginated_data(leave_id, 1, PAGE_SIZE, keyword='事务'))
+        await suite.measure('paginate.sort', rows,
+                            lambda: service.get_paginated_data(leave_id, 1, PAGE_SIZE, sort='-开始时间'))
+
+    def drop_artifact(export_type: str, file_ids: List[str]):
+        """删除导出产物和合并缓存，使下一次导出重新生成"""
+        def setup():
+            path = artifact_service.get_path(service.get_artifact_key(export_type, file_ids))
+            if os.path.exists(path):
+                os.remove(path)
+            service.merge_cache.clear()
+        return setup
+
+    if suite.enabled('export'):
+        exports = [
+            ('overtime', [overtime_id], service.export_overtime),
+            ('leave', [leave_id], service.export_leave),
+            ('attendance', [overtime_id, leave_id], service.export_attendance),
+            ('merged_leave', [leave_id, leave_overlap_id], service.export_merged_leave),
+        ]
+        for export_type, file_ids, export in exports:
+            await suite.measure(f"export.{export_type}", rows,
+                                lambda: export(file_ids), setup=drop_artifact(export_type, file_ids))
+
+    if suite.enabled('merge'):
+        merge_ids = [leave_id, leave_overlap_id]
+        await suite.measure('merge.preview', rows,
+                            lambda: service.merge_leave_records(merge_ids), setup=service.merge_cache.clear)
+
+    # 释放本规模的数据，避免影响下一个规模的用例
+    for file_id in (overtime_id, leave_id, leave_overlap_id):
+        await service.delete_file(file_id)
+
+
+async def bench_reports(suite: BenchmarkSuite):
+    """报表生成用例"""
+    from services.report_service import ReportService
+
+    dates = [f"2024-03-{day:02d}" for day in range(1, 32, 2)]
+    await suite.measure('report.business_trip', len(dates),
+                        lambda: ReportService.generate_business_trip_report('张伟', '2024-03', dates))
+
+    for count in EXPENSE_ITEM_COUNTS:
+        items = [{
+            'date': f"2024-03-{i % 28 + 1:02d}",
+            'type': ['meal', 'taxi', 'highway', 'accommodation', 'office', 'other'][i % 6],
+            'reason': '出差',
+            'amount': round(10 + i * 1.5, 2),
+            'invoice_no': f"{24000000000000000000 + i}",
+            'remark': ''
+        } for i in range(count)]
+        await suite.measure('report.expense', count,
+                            lambda: ReportService.generate_expense_report('张伟', '2024/03', items))
+
+
+async def bench_invoices(suite: BenchmarkSuite):
+    """发票解析用例：OCR之后的文本解析（发票号码、金额、类型）"""
+    from services.invoice_service import InvoiceService
+
+    service = InvoiceService()
+    fixtures = generate_invoice_ocr_results(INVOICE_COUNT)
+
+    def parse_all():
+        for ocr_result in fixtures:
+            service._parse_invoice_data(ocr_result)
+
+    await suite.measure('invoice.parse', INVOICE_COUNT, parse_all)
+
+
+def compare_with_baseline(results: List[Dict[str, Any]], baseline: Dict[str, Any],
+                          threshold: float) -> List[str]:
+    """与基线对比并打印结果
+
+    Returns:
+        List[str]: 出现回归的用例键
+    """
+    baseline_results = {result_key(entry): entry for entry in baseline.get('results', [])}
+    regressions = []
+    print(f"\n与基线对比（{baseline.get('meta', {}).get('timestamp', '未知时间')}）:")
+    print(f"{'用例':<40}{'基线(秒)':>12}{'当前(秒)':>12}{'变化':>10}")
+    for entry in results:
+        key = result_key(entry)
+        base = baseline_results.get(key)
+        if base is None:
+            print(f"{key:<40}{'-':>12}{entry['median']:>12.4f}{'新增':>10}")
+            continue
+        change = entry['median'] / base['median'] - 1 if base['median'] > 0 else 0.0
+        regressed = change > threshold and entry['median'] - base['median'] > REGRESSION_MIN_DELTA
+        if regressed:
+            regressions.append(key)
+        flag = '  回归' if regressed else ''
+        print(f"{key:<40}{base['median']:>12.4f}{entry['median']:>12.4f}{change:>+10.1%}{flag}")
+    return regressions
+
+
+def get_git_commit() -> Optional[str]:
+    """获取当前代码的提交号"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARK_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+async def run_suite(args) -> List[Dict[str, Any]]:
+    suite = BenchmarkSuite(args.repeat, args.only)
+    print(f"{'用例':<28}{'规模':>10}{'中位数(秒)':>12}{'最小(秒)':>12}")
+    for rows in args.rows:
+        if any(suite.enabled(group) for group in ('upload', 'paginate', 'export', 'merge')):
+            await bench_excel(suite, rows, args.data_dir)
+    if suite.enabled('report'):
+        await bench_reports(suite)
+    if suite.enabled('invoice'):
+        await bench_invoices(suite)
+    return suite.results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="后端性能基准测试")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 50000],
+                        help="工作簿数据行数，可指定多个（1000 到 200000）")
+    parser.add_argument('--repeat', type=int, default=3, help="每个用例重复次数")
+    parser.add_argument('--only', nargs='+', choices=GROUPS, default=GROUPS, help="只运行指定分组的用例")
+    parser.add_argument('--output', default=None, help="结果JSON文件路径，默认写入 benchmarks/results/")
+    parser.add_argument('--baseline', default=None, help="用于对比的基线JSON文件")
+    parser.add_argument('--save-baseline', action='store_true', help="将本次结果保存为 benchmarks/baseline.json")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help="耗时增加超过该比例视为回归，默认0.10")
+    parser.add_argument('--workdir', default=None, help="服务运行和生成工作簿的目录，默认使用临时目录")
+    args = parser.parse_args()
+
+    timestamp = datetime.now()
+    output = os.path.abspath(args.output or os.path.join(
+        RESULTS_DIR, f"bench-{timestamp.strftime('%Y%m%d-%H%M%S')}.json"))
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+
+    # 服务使用相对路径保存上传文件、导出产物和设置，切换到独立目录运行，不影响本地数据
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix='backend_bench_'))
+    args.data_dir = os.path.join(workdir, 'workbooks')
+    os.makedirs(args.data_dir, exist_ok=True)
+    os.chdir(workdir)
+    # 放宽保留策略的配额，避免大文件用例中途被清理
+    os.makedirs('data', exist_ok=True)
+    with open(os.path.join('data', 'system_settings.json'), 'w', encoding='utf-8') as f:
+        json.dump({'max_files': 100000, 'max_storage_mb': 1024 * 1024}, f)
+
+    results = asyncio.run(run_suite(args))
+
+    report = {
+        'meta': {
+            'timestamp': timestamp.isoformat(timespec='seconds'),
+            'commit': get_git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'rows': args.rows,
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已写入: {output}")
+
+    if args.save_baseline:
+        with open(DEFAULT_BASELINE, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"已保存为基线: {DEFAULT_BASELINE}")
+
+    if baseline_path:
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} 个用例出现回归: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+import os
+import queue
+import atexit
+import logging
+import itertools
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional
+
+
+def _env_value(name: str, default: str) -> str:
+    """读取环境变量，去掉 .env 文件中值后面的行内注释"""
+    return os.getenv(name, default).split("#", 1)[0].strip()
+
+
+# 日志配置，与 .env 中的同名变量对应
+LOG_LEVEL = _env_value("LOG_LEVEL", "INFO").upper()
+LOG_FILE = _env_value("LOG_FILE", "app.log")
+LOG_MAX_SIZE = int(_env_value("LOG_MAX_SIZE", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(_env_value("LOG_BACKUP_COUNT", "5"))
+# 按模块设置日志级别，如 "services.excel_service=DEBUG,api.holiday=WARNING"
+LOG_LEVELS = _env_value("LOG_LEVELS", "")
+# 逐行日志的采样率：每 N 条输出 1 条，0 表示关闭。生产环境默认关闭，逐行日志没有任何开销
+LOG_ROW_SAMPLE_RATE = int(_env_value(
+    "LOG_ROW_SAMPLE_RATE",
+    "0" if os.getenv("ENVIRONMENT", "development") == "production" else "100"
+))
+# 逐行日志的日志器名称后缀
+ROW_LOGGER_SUFFIX = "rows"
+
+LOG_FORMAT = '%(asctime)s - %(process)d - %(name)s - %(levelname)s - %(message)s'
+
+_listener: Optional[QueueListener] = None
+_setup_lock = threading.Lock()
+
+
+class SamplingFilter(logging.Filter):
+    """按固定比例采样的日志过滤器，每 rate 条日志放行 1 条"""
+
+    def __init__(self, rate: int):
+        super().__init__()
+        self.rate = max(1, rate)
+        self._counter = itertools.count()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # itertools.count 的 next 在 CPython 中是原子操作，多线程下无需加锁
+        return next(self._counter) % self.rate == 0
+
+
+def parse_module_levels(spec: str) -> Dict[str, int]:
+    """解析按模块设置的日志级别
+
+    Args:
+        spec: 形如 "services.excel_service=DEBUG,api.holiday=WARNING" 的配置
+
+    Returns:
+        Dict[str, int]: 日志器名称 -> 日志级别
+    """
+    levels = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        name, level = item.split("=", 1)
+        level_value = logging.getLevelName(level.strip().upper())
+        if isinstance(level_value, int):
+            levels[name.strip()] = level_value
+    return levels
+
+
+def setup_logging():
+    """初始化日志系统
+
+    业务代码只把日志记录放入内存队列，由后台线程的 QueueListener 负责格式化并写入
+    控制台和滚动日志文件，事件循环不再被日志I/O阻塞。每个进程只初始化一次，
+    gunicorn 的每个 worker 各自拥有一个后台写日志线程。
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+
+        formatter = logging.Formatter(LOG_FORMAT)
+        handlers = [logging.StreamHandler()]
+        if LOG_FILE:
+            handlers.append(RotatingFileHandler(
+                LOG_FILE, maxBytes=LOG_MAX_SIZE, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+            ))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(QueueHandler(log_queue))
+        root.setLevel(LOG_LEVEL)
+
+        for name, level in parse_module_levels(LOG_LEVELS).items():
+            logging.getLogger(name).setLevel(level)
+
+        _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """停止后台写日志线程，并写出队列中剩余的日志"""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    """获取模块日志器"""
+    return logging.getLogger(name)
+
+
+def get_row_logger(name: str) -> logging.Logger:
+    """获取逐行日志器，用于每条记录、每个文本块级别的调试日志
+
+    逐行日志器是模块日志器的子日志器（如 services.excel_service.rows），按
+    LOG_ROW_SAMPLE_RATE 采样。采样率为 0 时日志器被禁用，调用方可以用
+    isEnabledFor 跳过整段逐行日志的参数准备。
+    """
+    logger = logging.getLogger(f"{name}.{ROW_LOGGER_SUFFIX}")
+    if not getattr(logger, "_row_configured", False):
+        if LOG_ROW_SAMPLE_RATE > 0:
+            # LOG_LEVELS 中单独设置过级别的逐行日志器保留其级别
+            if logger.level == logging.NOTSET:
+                logger.setLevel(logging.DEBUG)
+            logger.addFilter(SamplingFilter(LOG_ROW_SAMPLE_RATE))
+        else:
+            logger.disabled = True
+        logger._row_configured = True
+    return logger
@@ -0,0 +1,288 @@
+import time
+import asyncio
+import bisect
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 请求耗时直方图的桶（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# 响应大小直方图的桶（字节）
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+# 事件循环延迟直方图的桶（秒）
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+# 导出耗时直方图的桶（秒）
+EXPORT_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+# 事件循环延迟的检测间隔（秒）
+LOOP_LAG_INTERVAL = 0.5
+
+
+def _escape(value: str) -> str:
+    """转义标签值"""
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    """格式化标签为 {a="1",b="2"} 形式"""
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    """格式化样本值"""
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """指标基类"""
+
+    metric_type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        """将标签字典转换为按标签名顺序排列的元组"""
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        """输出 Prometheus 文本格式"""
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.metric_type}']
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """单调递增计数器"""
+
+    metric_type = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        """增加计数"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in items]
+
+
+class Gauge(Metric):
+    """可增可减的瞬时值，也可以在输出时通过函数计算"""
+
+    metric_type = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels):
+        """设置值"""
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        """增加值"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        """减少值"""
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float]):
+        """设置输出时计算值的函数（仅用于无标签的指标）"""
+        self._function = function
+
+    def _samples(self) -> List[str]:
+        if self._function is not None:
+            try:
+                value = self._function()
+            except Exception as e:
+                logger.error("计算指标 %s 失败: %s", self.name, e)
+                return []
+            return [f'{self.name} {_format_value(value)}']
+        with self._lock:
+            items = list(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in items]
+
+
+class Histogram(Metric):
+    """直方图，按桶统计观测值的分布"""
+
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 标签 -> (各桶计数, 总和, 总数)，桶计数不累计，输出时再累加
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels):
+        """记录一次观测值"""
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0, 0)
+            counts[index] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), total, count) for key, (counts, total, count) in self._values.items()]
+        lines = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, ('le', _format_value(bound)))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    """进程内指标注册表
+
+    gunicorn 多进程部署时每个 worker 各自维护一份指标
+    """
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        """注册指标"""
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """输出所有指标的 Prometheus 文本格式"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# 创建单例实例
+registry = MetricsRegistry()
+
+# HTTP 请求指标
+HTTP_REQUESTS = registry.counter(
+    'http_requests_total', '按路由和状态码统计的请求数', ['method', 'route', 'status'])
+HTTP_REQUEST_DURATION = registry.histogram(
+    'http_request_duration_seconds', '按路由统计的请求耗时', ['method', 'route'], LATENCY_BUCKETS)
+HTTP_RESPONSE_SIZE = registry.histogram(
+    'http_response_size_bytes', '按路由统计的响应体大小', ['method', 'route'], SIZE_BUCKETS)
+HTTP_IN_FLIGHT = registry.gauge(
+    'http_requests_in_flight', '正在处理的请求数')
+
+# 事件循环指标
+EVENT_LOOP_LAG = registry.histogram(
+    'event_loop_lag_seconds', '事件循环调度延迟', (), LAG_BUCKETS)
+
+# 导出任务指标
+EXPORT_DURATION = registry.histogram(
+    'export_duration_seconds', '按导出类型统计的导出耗时', ['type'], EXPORT_BUCKETS)
+
+
+class MetricsMiddleware:
+    """记录每个请求的路由、状态码、耗时和响应大小的ASGI中间件
+
+    路由使用匹配到的路由模板（如 /api/data/{file_id}），避免按文件ID产生大量序列
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+        response_size = 0
+
+        async def send_wrapper(message):
+            nonlocal status_code, response_size
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            elif message['type'] == 'http.response.body':
+                response_size += len(message.get('body', b''))
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = scope.get('route')
+            route_path = getattr(route, 'path', None) or 'unmatched'
+            method = scope.get('method', '')
+            HTTP_REQUESTS.inc(method=method, route=route_path, status=str(status_code))
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, method=method, route=route_path)
+            HTTP_RESPONSE_SIZE.observe(response_size, method=method, route=route_path)
+
+
+async def monitor_event_loop_lag(interval: float = LOOP_LAG_INTERVAL):
+    """定期检测事件循环的调度延迟：实际唤醒时间超出预期的部分即为延迟"""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, loop.time() - expected))
+
+
+class export_timer:
+    """记录导出耗时的上下文管理器
+
+    用法:
+        with export_timer('attendance'):
+            ...
+    """
+
+    def __init__(self, export_type: str):
+        self.export_type = export_type
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        EXPORT_DURATION.observe(time.perf_counter() - self.start, type=self.export_type)
+        return False
@@ -0,0 +1,262 @@
+import os
+import re
+import sys
+import time
+import hmac
+import asyncio
+import threading
+from collections import Counter, deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Tuple
+from core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 触发剖析的请求头，值需要与 PROFILE_TOKEN 一致；未设置 PROFILE_TOKEN 时不能通过请求头触发
+PROFILE_HEADER = "x-profile-token"
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+# 慢请求阈值（秒），耗时超过阈值的请求自动保存剖析结果，0 表示关闭
+PROFILE_SLOW_THRESHOLD = float(os.getenv("PROFILE_SLOW_THRESHOLD") or "0")
+# 采样间隔（秒）
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL") or "0.01")
+# 剖析结果目录和保留策略
+PROFILE_DIR = os.getenv("PROFILE_DIR", "data/profiles")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES") or "50")
+PROFILE_MAX_AGE_DAYS = int(os.getenv("PROFILE_MAX_AGE_DAYS") or "7")
+# 采样缓冲区最多保留的时长（秒），超过该时长的请求只保留最近部分的采样
+PROFILE_WINDOW = 300.0
+# 每个调用栈最多记录的帧数
+MAX_STACK_DEPTH = 128
+# 需要采样的线程名前缀：事件循环所在的主线程、默认线程池（解析文件、同步接口）和OCR执行器
+PROFILE_THREAD_PREFIXES = ("MainThread", "asyncio", "ThreadPoolExecutor", "AnyIO worker", "ocr")
+# 剖析结果文件名只允许这些字符，防止下载接口被用于读取任意文件
+PROFILE_NAME_PATTERN = re.compile(r"^[\w.-]+\.folded$")
+
+
+class StackSampler:
+    """挂钟时间采样器
+
+    有请求需要剖析时，后台线程按固定间隔通过 sys._current_frames() 抓取事件循环线程
+    和执行器线程的调用栈，保存在限定时长的缓冲区中；请求结束后取出其时间范围内的采样。
+    采样按挂钟时间进行，等待I/O、锁和执行器的时间也会体现在结果中。
+    ProcessPoolExecutor 中的解析进程不在本进程内，无法采样。
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL, window: float = PROFILE_WINDOW):
+        self.interval = interval
+        self.window = window
+        # (采样时间, 线程名, 调用栈的代码对象元组)，调用栈从最外层到最内层
+        self._samples: Deque[Tuple[float, str, tuple]] = deque()
+        self._active = 0
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def acquire(self):
+        """开始一个需要采样的请求"""
+        with self._condition:
+            self._active += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def release(self):
+        """结束一个需要采样的请求"""
+        with self._condition:
+            self._active -= 1
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while True:
+            with self._condition:
+                while self._active <= 0:
+                    # 没有请求需要采样时清空缓冲区并等待
+                    self._samples.clear()
+                    self._condition.wait()
+            now = time.perf_counter()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            samples = []
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                name = names.get(ident, "")
+                if not name.startswith(PROFILE_THREAD_PREFIXES):
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                stack.reverse()
+                samples.append((now, name, tuple(stack)))
+            with self._condition:
+                self._samples.extend(samples)
+                while self._samples and self._samples[0][0] < now - self.window:
+                    self._samples.popleft()
+            time.sleep(self.interval)
+
+    def snapshot(self, start: float, end: float) -> List[Tuple[float, str, tuple]]:
+        """获取时间范围内的采样，需要在 release 之前调用"""
+        with self._condition:
+            return [sample for sample in self._samples if start <= sample[0] <= end]
+
+    @staticmethod
+    def fold(samples: List[Tuple[float, str, tuple]]) -> Counter:
+        """按折叠后的调用栈对采样计数
+
+        Returns:
+            Counter: "线程;外层函数;...;内层函数" -> 采样次数
+        """
+        labels: Dict[object, str] = {}
+        folded = Counter()
+        for _, thread_name, stack in samples:
+            parts = [thread_name]
+            for code in stack:
+                label = labels.get(code)
+                if label is None:
+                    label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                    label = labels[code] = label.replace(";", ":")
+                parts.append(label)
+            folded[";".join(parts)] += 1
+        return folded
+
+
+class RequestProfiler:
+    """请求级剖析：保存、清理和列出剖析结果"""
+
+    def __init__(self, profile_dir: str = PROFILE_DIR):
+        self.profile_dir = profile_dir
+        self.sampler = StackSampler()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """是否配置了请求头触发或慢请求阈值"""
+        return bool(PROFILE_TOKEN) or PROFILE_SLOW_THRESHOLD > 0
+
+    def is_authorized(self, token: Optional[str]) -> bool:
+        """校验请求头中的剖析令牌
+
+        按UTF-8字节比较：hmac.compare_digest 不接受含非ASCII字符的字符串，
+        无法编码的令牌（如包含孤立代理字符）视为未授权
+        """
+        if not PROFILE_TOKEN or not token:
+            return False
+        try:
+            return hmac.compare_digest(token.encode("utf-8"), PROFILE_TOKEN.encode("utf-8"))
+        except UnicodeEncodeError:
+            return False
+
+    def save(self, method: str, route: str, samples: List[Tuple[float, str, tuple]],
+             duration: float, reason: str) -> Optional[str]:
+        """保存请求的剖析结果为折叠调用栈文件（可直接用于 flamegraph.pl、speedscope）
+
+        Args:
+            method: 请求方法
+            route: 路由模板
+            samples: 请求期间的采样
+            duration: 请求耗时（秒）
+            reason: 触发原因，manual 或 slow
+
+        Returns:
+            Optional[str]: 剖析结果文件名，没有采样时返回None
+        """
+        folded = StackSampler.fold(samples)
+        if not folded:
+            return None
+
+        duration_ms = int(duration * 1000)
+        route_part = re.sub(r"[^\w-]+", "_", route).strip("_") or "root"
+        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        name = f"{timestamp}-{reason}-{method}-{route_part}-{duration_ms}ms.folded"
+
+        with self._lock:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            path = os.path.join(self.profile_dir, name)
+            with open(path, "w", encoding="utf-8") as f:
+                for stack, count in folded.most_common():
+                    f.write(f"{stack} {count}\n")
+            self._enforce_retention()
+        logger.info("已保存 %s %s 的剖析结果（耗时 %sms，%s 个采样）: %s",
+                    method, route, duration_ms, sum(folded.values()), name)
+        return name
+
+    def _enforce_retention(self):
+        """删除过期的剖析结果，并只保留最新的 PROFILE_MAX_FILES 个"""
+        profiles = self.list_profiles()
+        expire_before = time.time() - PROFILE_MAX_AGE_DAYS * 86400
+        for index, profile in enumerate(profiles):
+            if index >= PROFILE_MAX_FILES or profile["created"] < expire_before:
+                try:
+                    os.remove(os.path.join(self.profile_dir, profile["name"]))
+                except OSError as e:
+                    logger.warning("删除剖析结果 %s 失败: %s", profile["name"], e)
+
+    def list_profiles(self) -> List[Dict[str, object]]:
+        """列出剖析结果，最新的在前"""
+        if not os.path.isdir(self.profile_dir):
+            return []
+        profiles = []
+        for entry in os.scandir(self.profile_dir):
+            if entry.is_file() and PROFILE_NAME_PATTERN.match(entry.name):
+                stat = entry.stat()
+                profiles.append({"name": entry.name, "size": stat.st_size, "created": stat.st_mtime})
+        profiles.sort(key=lambda profile: profile["created"], reverse=True)
+        return profiles
+
+    def get_path(self, name: str) -> Optional[str]:
+        """获取剖析结果的路径，文件名不合法或不存在时返回None"""
+        if not PROFILE_NAME_PATTERN.match(name):
+            return None
+        path = os.path.join(self.profile_dir, name)
+        return path if os.path.isfile(path) else None
+
+
+# 创建单例实例
+request_profiler = RequestProfiler()
+
+
+class ProfilingMiddleware:
+    """按需剖析请求的ASGI中间件
+
+    请求头 X-Profile-Token 与 PROFILE_TOKEN 一致时总是保存剖析结果；
+    设置了 PROFILE_SLOW_THRESHOLD 时，所有请求期间都进行采样，耗时超过阈值的请求保存剖析结果。
+    两者都未配置时不做任何处理。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not request_profiler.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        token = None
+        for key, value in scope.get("headers", []):
+            if key.decode("latin-1") == PROFILE_HEADER:
+                token = value.decode("latin-1")
+                break
+        forced = request_profiler.is_authorized(token)
+        if not forced and PROFILE_SLOW_THRESHOLD <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        sampler = request_profiler.sampler
+        sampler.acquire()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            end = time.perf_counter()
+            samples = None
+            if forced or end - start >= PROFILE_SLOW_THRESHOLD:
+                samples = sampler.snapshot(start, end)
+            sampler.release()
+            if samples:
+                route = getattr(scope.get("route"), "path", None) or scope.get("path", "")
+                reason = "manual" if forced else "slow"
+                # 折叠调用栈和写文件放到线程池中，不占用事件循环
+                loop = asyncio.get_running_loop()
+                loop.run_in_executor(
+                    None, request_profiler.save, scope.get("method", ""), route, samples, end - start, reason
+                )
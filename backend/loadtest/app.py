@@ -0,0 +1,11 @@
+"""使用OCR替身的应用入口，供压测时以 gunicorn 多进程方式启动
+
+用法（在 backend 目录下执行）:
+    LOADTEST_OCR_LATENCY=0.8 gunicorn loadtest.app:app -w 4 -k uvicorn.workers.UvicornWorker
+"""
+from main import app
+from loadtest.ocr_stub import install_ocr_stub
+
+install_ocr_stub()
+
+__all__ = ['app']
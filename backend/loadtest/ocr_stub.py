@@ -0,0 +1,38 @@
+"""确定性的OCR替身
+
+压测时用预先生成的模拟发票文本块代替 PaddleOCR 识别，按上传内容的哈希选择固定的结果，
+并在OCR执行器线程中等待指定时长模拟识别耗时。文件保存、执行器排队和发票文本解析仍走真实流程。
+"""
+import os
+import time
+import hashlib
+
+from benchmarks.generators import generate_invoice_ocr_results
+
+# 模拟的单张发票识别耗时（秒）
+OCR_STUB_LATENCY = float(os.getenv("LOADTEST_OCR_LATENCY") or "0.8")
+# 预先生成的模拟发票数量
+FIXTURE_COUNT = 50
+
+
+def install_ocr_stub(latency: float = OCR_STUB_LATENCY):
+    """用确定性的替身替换 InvoiceService 的OCR识别
+
+    Args:
+        latency: 模拟的单张发票识别耗时（秒）
+    """
+    import services.invoice_service as invoice_module
+
+    fixtures = generate_invoice_ocr_results(FIXTURE_COUNT)
+
+    def recognize_text(self, image_path: str):
+        with open(image_path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).digest()
+        # 不持有GIL的等待，与OCR推理期间事件循环仍可运行的情况一致
+        time.sleep(latency)
+        return fixtures[int.from_bytes(digest[:4], 'big') % len(fixtures)]
+
+    # 替身不需要模型和图像处理依赖
+    invoice_module.PADDLE_OCR_AVAILABLE = True
+    invoice_module.CV2_AVAILABLE = False
+    invoice_module.InvoiceService._recognize_text_with_paddle = recognize_text
@@ -0,0 +1,391 @@
+"""月末高峰压测
+
+模拟月末全公司集中上传考勤文件和发票的流量：多个虚拟用户并发执行上传、分页、导出、
+请假合并、报表生成和发票识别流程，统计每个路由的吞吐量、p50/p95/p99 延迟和错误率。
+发票识别使用确定性的OCR替身（见 loadtest/ocr_stub.py），结果可重复。
+
+三种运行方式:
+    # 进程内直接驱动ASGI应用（单进程，快速检查）
+    python -m loadtest.run --users 20 --duration 60
+    # 启动 gunicorn 多进程后压测，用于比较 worker 数和执行器大小
+    python -m loadtest.run --workers 4 --parse-workers 2 --ocr-workers 1 --users 40 --duration 120
+    # 压测已经运行的服务（需以 loadtest.app:app 启动才会使用OCR替身）
+    python -m loadtest.run --url http://127.0.0.1:8000 --users 40
+
+在 backend 目录下执行。
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 运行时会切换工作目录，保证之后仍能导入 backend 下的模块
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.generators import generate_overtime_workbook, generate_leave_workbook
+
+XLSX_MEDIA_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+# 各流程的默认权重：月末以考勤文件处理和发票报销为主
+DEFAULT_MIX = {'attendance': 4, 'merge': 1, 'report': 2, 'invoice': 4}
+# 分页流程中每个文件浏览的页数
+BROWSE_PAGES = 3
+PAGE_SIZE = 50
+# 等待 gunicorn 启动的最长时间（秒）
+SERVER_START_TIMEOUT = 60
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """最近秩法计算百分位数"""
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class RouteStats:
+    """单个路由的请求统计"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.statuses: Counter = Counter()
+        self.errors = 0
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+        return {
+            'count': count,
+            'errors': self.errors,
+            'error_rate': self.errors / count if count else 0.0,
+            'throughput': count / elapsed if elapsed > 0 else 0.0,
+            'p50': percentile(latencies, 0.50),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+            'max': latencies[-1] if latencies else 0.0,
+            'statuses': {str(status): n for status, n in sorted(self.statuses.items(), key=lambda x: str(x[0]))},
+        }
+
+
+class LoadTest:
+    """虚拟用户流程和请求统计"""
+
+    def __init__(self, client: httpx.AsyncClient, workbooks: Dict[str, List[bytes]], mix: Dict[str, int], seed: int):
+        self.client = client
+        self.workbooks = workbooks
+        self.mix = mix
+        self.seed = seed
+        self.stats: Dict[str, RouteStats] = {}
+
+    async def request(self, route: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        """发送请求并按路由记录耗时和结果
+
+        HTTP错误状态、连接异常以及 success 为 false 的业务响应都计为错误
+        """
+        stats = self.stats.setdefault(route, RouteStats())
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+            await response.aread()
+        except Exception as e:
+            stats.latencies.append(time.perf_counter() - start)
+            stats.statuses[type(e).__name__] += 1
+            stats.errors += 1
+            return None
+        stats.latencies.append(time.perf_counter() - start)
+        stats.statuses[response.status_code] += 1
+
+        failed = response.status_code >= 400
+        if not failed and response.headers.get('content-type', '').startswith('application/json'):
+            try:
+                failed = response.json().get('success') is False
+            except Exception:
+                failed = True
+        if failed:
+            stats.errors += 1
+            return None
+        return response
+
+    async def upload_workbook(self, file_type: str, index: int) -> Optional[str]:
+        """上传一个工作簿，返回文件ID"""
+        content = self.workbooks[file_type][index % len(self.workbooks[file_type])]
+        response = await self.request(
+            'POST /api/upload', 'POST', '/api/upload', params={'type': file_type},
+            files={'file': (f"{file_type}_{index}.xlsx", content, XLSX_MEDIA_TYPE)}
+        )
+        if response is None:
+            return None
+        return response.json()['data']['file_id']
+
+    async def browse(self, file_id: str):
+        """浏览前几页数据"""
+        for page in range(1, BROWSE_PAGES + 1):
+            await self.request('GET /api/data/{file_id}', 'GET', f"/api/data/{file_id}",
+                               params={'page': page, 'size': PAGE_SIZE})
+
+    async def attendance_flow(self, rng: random.Random):
+        """上传加班和请假记录，浏览后导出考勤统计和明细"""
+        index = rng.randrange(1 << 16)
+        overtime_id = await self.upload_workbook('overtime', index)
+        leave_id = await self.upload_workbook('leave', index)
+        file_ids = [file_id for file_id in (overtime_id, leave_id) if file_id]
+        for file_id in file_ids:
+            await self.browse(file_id)
+        if not file_ids:
+            return
+        await self.request('POST /api/export/attendance', 'POST', '/api/export/attendance',
+                           json={'file_ids': file_ids})
+        if overtime_id:
+            await self.request('POST /api/export/overtime', 'POST', '/api/export/overtime',
+                               json={'file_ids': [overtime_id]})
+        if leave_id:
+            await self.request('POST /api/export/leave', 'POST', '/api/export/leave',
+                               json={'file_ids': [leave_id]})
+
+    async def merge_flow(self, rng: random.Random):
+        """上传两个请假记录文件，预览合并结果后导出"""
+        index = rng.randrange(1 << 16)
+        file_ids = [await self.upload_workbook('leave', index), await self.upload_workbook('leave', index + 1)]
+        if not all(file_ids):
+            return
+        await self.request('POST /api/merge/leave', 'POST', '/api/merge/leave', json={'file_ids': file_ids})
+        await self.request('POST /api/export/merged-leave', 'POST', '/api/export/merged-leave',
+                           json={'file_ids': file_ids})
+
+    async def report_flow(self, rng: random.Random):
+        """生成出差报表和报销明细报表"""
+        dates = sorted({f"2024-03-{rng.randint(1, 31):02d}" for _ in range(rng.randint(3, 12))})
+        await self.request('POST /api/report/generate', 'POST', '/api/report/generate',
+                           json={'name': '张伟', 'month': '2024-03', 'dates': dates})
+        items = [{
+            'date': f"2024-03-{i % 28 + 1:02d}",
+            'type': rng.choice(['meal', 'taxi', 'highway', 'accommodation', 'office', 'other']),
+            'reason': '出差',
+            'amount': round(rng.uniform(10, 2000), 2),
+            'invoice_no': f"{24000000000000000000 + rng.randrange(10 ** 12)}",
+            'remark': ''
+        } for i in range(rng.randint(5, 40))]
+        await self.request('POST /api/report/expense', 'POST', '/api/report/expense',
+                           json={'name': '张伟', 'month': '2024/03', 'expense_items': items})
+
+    async def invoice_flow(self, rng: random.Random):
+        """上传一张发票图片进行识别"""
+        # 图片内容只用于选择OCR替身的识别结果
+        content = f"loadtest-invoice-{rng.randrange(1 << 30)}".encode() + bytes(rng.randrange(256) for _ in range(2048))
+        await self.request('POST /api/invoice/upload', 'POST', '/api/invoice/upload',
+                           files={'file': ('invoice.jpg', content, 'image/jpeg')}, data={'type': 'invoice'})
+
+    async def user_loop(self, user_id: int, deadline: float, iterations: Optional[int]):
+        """单个虚拟用户：按权重随机选择流程，直到时间结束或完成指定轮数"""
+        rng = random.Random(self.seed + user_id)
+        flows = {
+            'attendance': self.attendance_flow,
+            'merge': self.merge_flow,
+            'report': self.report_flow,
+            'invoice': self.invoice_flow,
+        }
+        names = [name for name in flows if self.mix.get(name, 0) > 0]
+        weights = [self.mix[name] for name in names]
+        completed = 0
+        while time.perf_counter() < deadline and (iterations is None or completed < iterations):
+            flow = rng.choices(names, weights)[0]
+            await flows[flow](rng)
+            completed += 1
+
+
+def generate_workbooks(rows: int, distinct: int, workdir: str) -> Dict[str, List[bytes]]:
+    """生成内容各不相同的加班和请假工作簿，避免所有上传都命中重复文件复用"""
+    workbooks: Dict[str, List[bytes]] = {'overtime': [], 'leave': []}
+    for i in range(distinct):
+        paths = {
+            'overtime': generate_overtime_workbook(os.path.join(workdir, f"overtime_{i}.xlsx"), rows, seed=100 + i),
+            'leave': generate_leave_workbook(os.path.join(workdir, f"leave_{i}.xlsx"), rows, seed=200 + i,
+                                             id_offset=i * rows // 2),
+        }
+        for file_type, path in paths.items():
+            with open(path, 'rb') as f:
+                workbooks[file_type].append(f.read())
+    return workbooks
+
+
+def prepare_workdir(workdir: str):
+    """准备服务运行目录，放宽保留策略的配额，避免压测中途清理文件"""
+    os.makedirs(os.path.join(workdir, 'data'), exist_ok=True)
+    with open(os.path.join(workdir, 'data', 'system_settings.json'), 'w', encoding='utf-8') as f:
+        json.dump({'max_files': 100000, 'max_storage_mb': 1024 * 1024}, f)
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args, workdir: str, env: Dict[str, str]) -> Tuple[subprocess.Popen, str]:
+    """在独立目录中以 gunicorn 多进程方式启动使用OCR替身的应用"""
+    port = get_free_port()
+    command = [
+        sys.executable, '-m', 'gunicorn', 'loadtest.app:app',
+        '-w', str(args.workers), '-k', 'uvicorn.workers.UvicornWorker',
+        '--bind', f"127.0.0.1:{port}", '--pythonpath', BACKEND_DIR, '--timeout', '300',
+    ]
+    process = subprocess.Popen(command, cwd=workdir, env={**os.environ, **env})
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + SERVER_START_TIMEOUT
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn 启动失败，退出码 {process.returncode}")
+        try:
+            if httpx.get(f"{url}/health", timeout=1).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("等待 gunicorn 启动超时")
+
+
+def print_report(summary: Dict[str, Dict[str, Any]], total: Dict[str, Any]):
+    """打印每个路由的统计结果"""
+    print(f"\n{'路由':<34}{'请求数':>8}{'错误率':>9}{'吞吐(次/秒)':>13}"
+          f"{'p50(秒)':>10}{'p95(秒)':>10}{'p99(秒)':>10}{'最大(秒)':>10}")
+    for route, item in sorted(summary.items()) + [('总计', total)]:
+        print(f"{route:<34}{item['count']:>8}{item['error_rate']:>9.1%}{item['throughput']:>13.2f}"
+              f"{item['p50']:>10.3f}{item['p95']:>10.3f}{item['p99']:>10.3f}{item['max']:>10.3f}")
+
+
+async def run_load(args, base_url: Optional[str], workbooks: Dict[str, List[bytes]]) -> Dict[str, RouteStats]:
+    if base_url:
+        transport = None
+    else:
+        # 进程内模式：应用在当前目录（压测工作目录）中运行
+        from loadtest.app import app
+        transport = httpx.ASGITransport(app=app)
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(transport=transport, base_url=base_url or 'http://loadtest',
+                                 timeout=args.timeout, limits=limits) as client:
+        test = LoadTest(client, workbooks, args.mix, args.seed)
+        deadline = time.perf_counter() + args.duration
+        await asyncio.gather(*(
+            test.user_loop(user_id, deadline, args.iterations) for user_id in range(args.users)
+        ))
+    return test.stats
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    """解析流程权重，如 attendance=4,merge=1,report=2,invoice=4"""
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        if name.strip() not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"未知流程: {name}")
+        mix[name.strip()] = int(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="月末高峰压测")
+    parser.add_argument('--users', type=int, default=20, help="并发虚拟用户数")
+    parser.add_argument('--duration', type=float, default=60, help="压测时长（秒）")
+    parser.add_argument('--iterations', type=int, default=None, help="每个用户执行的流程数，达到后提前结束")
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help="流程权重，如 attendance=4,merge=1,report=2,invoice=4")
+    parser.add_argument('--rows', type=int, default=5000, help="每个工作簿的数据行数")
+    parser.add_argument('--distinct-files', type=int, default=8, help="内容不同的工作簿数量")
+    parser.add_argument('--ocr-latency', type=float, default=None, help="OCR替身的单张识别耗时（秒）")
+    parser.add_argument('--url', default=None, help="压测已运行的服务地址")
+    parser.add_argument('--workers', type=int, default=None, help="启动 gunicorn 的 worker 数")
+    parser.add_argument('--parse-workers', type=int, default=None, help="每个 worker 解析文件的进程数")
+    parser.add_argument('--ocr-workers', type=int, default=None, help="每个 worker 的OCR执行器线程数")
+    parser.add_argument('--timeout', type=float, default=300, help="单个请求的超时时间（秒）")
+    parser.add_argument('--seed', type=int, default=1, help="随机种子")
+    parser.add_argument('--output', default=None, help="结果JSON文件路径")
+    parser.add_argument('--workdir', default=None, help="服务运行和生成工作簿的目录，默认使用临时目录")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix='backend_loadtest_'))
+    prepare_workdir(workdir)
+
+    # 执行器大小和OCR替身耗时通过环境变量传给应用，进程内模式在导入应用之前设置
+    env = {}
+    if args.parse_workers:
+        env['PARSE_WORKERS'] = str(args.parse_workers)
+    if args.ocr_workers:
+        env['OCR_WORKERS'] = str(args.ocr_workers)
+    if args.ocr_latency is not None:
+        env['LOADTEST_OCR_LATENCY'] = str(args.ocr_latency)
+    env.setdefault('ENVIRONMENT', 'production')
+
+    print(f"生成 {args.distinct_files} 组 {args.rows} 行的工作簿...")
+    workbooks = generate_workbooks(args.rows, args.distinct_files, os.path.join(workdir, 'workbooks'))
+
+    server = None
+    base_url = args.url
+    if args.workers and not base_url:
+        server, base_url = start_server(args, workdir, env)
+        print(f"已启动 gunicorn（{args.workers} 个 worker）: {base_url}")
+    elif not base_url:
+        os.environ.update(env)
+        os.chdir(workdir)
+
+    mode = base_url or '进程内ASGI'
+    print(f"开始压测: {args.users} 个并发用户，时长 {args.duration} 秒，目标 {mode}")
+    start = time.perf_counter()
+    try:
+        stats = asyncio.run(run_load(args, base_url, workbooks))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+        elif not args.url:
+            from services.excel_reader import shutdown_parse_pool
+            shutdown_parse_pool()
+    elapsed = time.perf_counter() - start
+
+    summary = {route: item.summary(elapsed) for route, item in stats.items()}
+    total = RouteStats()
+    for item in stats.values():
+        total.latencies.extend(item.latencies)
+        total.statuses.update(item.statuses)
+        total.errors += item.errors
+    total_summary = total.summary(elapsed)
+    print_report(summary, total_summary)
+
+    if output:
+        report = {
+            'meta': {
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'target': mode,
+                'users': args.users,
+                'duration': elapsed,
+                'workers': args.workers,
+                'parse_workers': args.parse_workers,
+                'ocr_workers': args.ocr_workers,
+                'rows': args.rows,
+                'mix': args.mix,
+            },
+            'routes': summary,
+            'total': total_summary,
+        }
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入: {output}")
+
+
+if __name__ == '__main__':
+    main()
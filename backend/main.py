@@ -1,24 +1,26 @@
 # -*- coding: utf-8 -*-
 import os
-import logging
+import asyncio
 from datetime import datetime
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
-from api import report, routes, settings, invoice
-
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('app.log'),
-        logging.StreamHandler()
-    ]
-)
-logger = logging.getLogger(__name__)
+from core.logger import setup_logging, shutdown_logging, get_logger
+
+# 配置日志，需要在导入业务模块之前完成，使导入时的提示也写入日志队列
+setup_logging()
+
+from api import report, routes, settings, invoice, profiling
+from core.metrics import registry, MetricsMiddleware, monitor_event_loop_lag
+from core.profiling import ProfilingMiddleware
+from services.excel_service import excel_service
+from services.excel_reader import warm_parse_pool, shutdown_parse_pool
+from services.invoice_service import invoice_service
+from services.response_cache import response_cache
+
+logger = get_logger(__name__)
 
 # 获取环境变量
 ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
@@ -60,8 +62,29 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE"],
     allow_headers=["*"],
+    expose_headers=["Content-Disposition", "X-Dropped-Duplicates"],
 )
 
+# 请求指标（路由、状态码、耗时、响应大小）
+app.add_middleware(MetricsMiddleware)
+
+# 按需剖析：带剖析令牌的请求或超过慢请求阈值的请求保存采样结果
+app.add_middleware(ProfilingMiddleware)
+
+# 服务指标，在 /metrics 被采集时计算
+registry.gauge('excel_file_cache_entries', '文件缓存中的DataFrame数').set_function(
+    lambda: len(excel_service.file_cache))
+registry.gauge('excel_file_cache_bytes', '文件缓存中DataFrame占用的内存字节数').set_function(
+    excel_service.get_file_cache_bytes)
+registry.gauge('excel_registered_files', '已注册的上传文件数').set_function(
+    lambda: len(excel_service.files))
+registry.gauge('excel_parse_tasks', '未完成的后台解析任务数').set_function(
+    lambda: sum(1 for task in excel_service.parse_tasks.values() if not task.done()))
+registry.gauge('response_cache_bytes', 'JSON响应缓存占用的字节数').set_function(
+    lambda: response_cache.total_bytes)
+registry.gauge('ocr_queue_depth', '排队中和执行中的发票识别任务数').set_function(
+    lambda: invoice_service.pending)
+
 # 静态文件服务
 if os.path.exists("static"):
     app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -87,6 +110,31 @@ async def root():
         "health": "/health"
     }
 
+# 指标端点，每个 worker 进程返回各自的指标
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus 指标端点"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.on_event("startup")
+async def startup():
+    """启动时开始检测事件循环延迟，并预热解析文件的进程池"""
+    app.state.loop_lag_task = asyncio.create_task(monitor_event_loop_lag())
+    # 在开始接收请求前启动全部解析子进程，等待期间不阻塞事件循环
+    try:
+        pids = await asyncio.gather(*(asyncio.wrap_future(future) for future in warm_parse_pool()))
+        logger.info("解析进程池预热完成，子进程数: %s", len(set(pids)))
+    except Exception as e:
+        logger.warning("解析进程池预热失败，将在首次解析时启动: %s", e)
+
+@app.on_event("shutdown")
+async def shutdown():
+    """关闭时停止后台任务，释放解析文件的进程池并写出剩余日志"""
+    app.state.loop_lag_task.cancel()
+    shutdown_parse_pool()
+    invoice_service.executor.shutdown(wait=False)
+    shutdown_logging()
+
 # 全局异常处理
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -105,6 +153,7 @@ app.include_router(routes.router, prefix="/api", tags=["Excel处理"])
 app.include_router(report.router, prefix="/api/report", tags=["报表生成"])
 app.include_router(settings.router, prefix="/api/settings", tags=["系统设置"])
 app.include_router(invoice.router, prefix="/api/invoice", tags=["发票处理"])
+app.include_router(profiling.router, prefix="/api/profiles", tags=["性能剖析"])
 
 if __name__ == "__main__":
     import uvicorn
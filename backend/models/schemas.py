@@ -23,6 +23,7 @@ class ExcelPreview(BaseModel):
     headers: List[ColumnHeader]
     sample_data: List[Dict[str, Any]]
     total_rows: int
+    total_rows_estimated: bool = Field(default=False, description="total_rows 是否为根据工作表尺寸估算的行数，可能与分页总数不同")
     file_id: Optional[str] = None
 
 class PaginatedData(BaseModel):
@@ -45,11 +46,17 @@ class ExportRequest(BaseModel):
 class SystemSettings(BaseModel):
     """系统设置模型"""
     max_files: int = Field(default=100, description="最大文件数量，超过此数量将清理旧文件")
+    max_storage_mb: int = Field(default=1024, description="上传文件和导出文件最大占用空间（MB），超过将清理旧文件")
     system_name: str = Field(default="Encan考勤系统", description="系统名称")
     theme_color: str = Field(default="#4CAF50", description="系统主题色")
+    excel_engine: str = Field(default="auto", description="Excel读取引擎：auto、calamine 或 openpyxl")
+    record_columns: Optional[Dict[str, Dict[str, List[str]]]] = Field(default=None, description="加班/请假记录的自定义列映射，未设置的字段使用默认列名")
 
 class UpdateSystemSettingsRequest(BaseModel):
     """更新系统设置请求模型"""
     max_files: Optional[int] = None
+    max_storage_mb: Optional[int] = None
     system_name: Optional[str] = None
     theme_color: Optional[str] = None
+    excel_engine: Optional[str] = None
+    record_columns: Optional[Dict[str, Dict[str, List[str]]]] = None
@@ -0,0 +1,118 @@
+import os
+import uuid
+import hashlib
+from typing import List, Optional, Dict, Any
+from services.retention_service import retention_manager
+from core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 导出逻辑版本号，导出结果的格式或计算方式变化时需要递增，使旧的缓存产物失效
+EXPORT_VERSION = "4"
+
+
+class ArtifactService:
+    """导出产物缓存服务
+
+    导出文件按内容寻址存储：缓存键由导出类型、排序后的文件ID、文件内容哈希
+    以及导出逻辑版本号共同决定。相同输入的重复导出直接复用已有产物，
+    并发导出时每个请求先写入唯一的临时文件，再原子替换为最终产物，互不覆盖。
+    """
+
+    def __init__(self, artifact_dir: str = "uploads/artifacts"):
+        """初始化导出产物缓存服务
+
+        Args:
+            artifact_dir: 产物存储目录
+        """
+        self.artifact_dir = artifact_dir
+        self.ensure_artifact_dir()
+        # 产物元数据：产物路径 -> 导出时产生的附加信息（如去除的重复行数）
+        self.metadata: Dict[str, Dict[str, Any]] = {}
+        # 产物与上传文件共享数量和空间配额
+        retention_manager.add_directory(self.artifact_dir)
+        retention_manager.add_evict_callback(self.on_file_evicted)
+
+    def ensure_artifact_dir(self):
+        """确保产物目录存在"""
+        os.makedirs(self.artifact_dir, exist_ok=True)
+
+    def build_key(self, export_type: str, file_ids: List[str], file_hashes: List[str]) -> str:
+        """生成导出产物的缓存键
+
+        Args:
+            export_type: 导出类型，如 overtime、leave、attendance
+            file_ids: 参与导出的文件ID列表
+            file_hashes: 与 file_ids 一一对应的文件内容哈希
+
+        Returns:
+            str: 缓存键（十六进制摘要）
+        """
+        # 文件ID排序后再参与计算，保证选择顺序不同的相同文件集得到相同的键
+        pairs = sorted(zip(file_ids, file_hashes))
+        digest = hashlib.sha256()
+        digest.update(f"{export_type}\n{EXPORT_VERSION}\n".encode("utf-8"))
+        for file_id, file_hash in pairs:
+            digest.update(f"{file_id}:{file_hash}\n".encode("utf-8"))
+        return digest.hexdigest()
+
+    def get_path(self, key: str) -> str:
+        """获取缓存键对应的产物路径"""
+        return os.path.join(self.artifact_dir, f"{key}.xlsx")
+
+    def lookup(self, key: str) -> Optional[str]:
+        """查找已存在的产物
+
+        Returns:
+            Optional[str]: 产物路径，不存在时返回None
+        """
+        path = self.get_path(key)
+        if os.path.isfile(path):
+            return path
+        return None
+
+    def new_temp_path(self, key: str) -> str:
+        """为一次导出生成唯一的临时文件路径"""
+        self.ensure_artifact_dir()
+        return os.path.join(self.artifact_dir, f"{key}.{uuid.uuid4().hex}.tmp.xlsx")
+
+    def commit(self, key: str, temp_path: str, metadata: Optional[Dict[str, Any]] = None) -> str:
+        """将临时文件原子替换为最终产物
+
+        相同键的产物内容一致，并发提交时后写入者覆盖先写入者不会产生不完整文件。
+
+        Args:
+            key: 缓存键
+            temp_path: 临时文件路径
+            metadata: 随产物保存的附加信息
+
+        Returns:
+            str: 最终产物路径
+        """
+        path = self.get_path(key)
+        os.replace(temp_path, path)
+        if metadata is not None:
+            self.metadata[path] = metadata
+        retention_manager.register(path)
+        retention_manager.request_enforce()
+        return path
+
+    def get_metadata(self, path: str) -> Dict[str, Any]:
+        """获取产物的附加信息，没有时返回空字典"""
+        return self.metadata.get(path, {})
+
+    def on_file_evicted(self, path: str):
+        """产物被保留策略清理后移除其元数据"""
+        self.metadata.pop(path, None)
+
+    def discard(self, temp_path: str):
+        """删除未提交的临时文件"""
+        try:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        except Exception as e:
+            logger.warning("删除临时产物 %s 失败: %s", temp_path, e)
+
+
+# 创建单例实例
+artifact_service = ArtifactService()
@@ -0,0 +1,131 @@
+import os
+import multiprocessing
+import pandas as pd
+import openpyxl
+from typing import List, Any, Optional
+from concurrent.futures import Future, ProcessPoolExecutor
+from core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 并行解析文件的进程数，可通过环境变量 PARSE_WORKERS 调整
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS") or min(4, os.cpu_count() or 1))
+
+# 并行解析文件的进程池，首次使用时创建。
+# 读取函数放在本模块中，子进程只需导入本模块，不会创建服务单例、注册保留策略等
+_parse_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    """获取并行解析文件的进程池
+    
+    上传后的完整解析和导出时未缓存文件的读取都在此进程池中执行，不占用Web进程的GIL
+    """
+    global _parse_pool
+    if _parse_pool is None:
+        # 使用spawn方式启动子进程：fork会复制已启动的写日志线程所用的队列，
+        # 子进程的日志写入无人读取的队列副本；spawn的子进程只导入本模块，不继承这些状态
+        _parse_pool = ProcessPoolExecutor(
+            max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_parse_worker
+        )
+    return _parse_pool
+
+
+def _init_parse_worker():
+    """子进程启动时预先导入读取引擎，首次解析不再承担导入耗时"""
+    import pandas.io.excel._openpyxl  # noqa: F401
+    try:
+        import pandas.io.excel._calamine  # noqa: F401
+        import python_calamine  # noqa: F401
+    except ImportError:
+        pass
+
+
+def _parse_worker_pid() -> int:
+    """预热任务，返回执行任务的子进程号"""
+    return os.getpid()
+
+
+def warm_parse_pool() -> List[Future]:
+    """预热进程池，启动全部子进程
+    
+    spawn方式启动子进程并导入pandas需要数秒，若推迟到首次上传，
+    期间到达的请求都要排队等待；每提交一个任务且没有空闲子进程时进程池会启动一个新的子进程，
+    提交与进程数相同的任务即可启动全部子进程
+    """
+    pool = get_parse_pool()
+    return [pool.submit(_parse_worker_pid) for _ in range(PARSE_WORKERS)]
+
+
+def shutdown_parse_pool():
+    """关闭并行解析文件的进程池"""
+    global _parse_pool
+    if _parse_pool is not None:
+        _parse_pool.shutdown(wait=False, cancel_futures=True)
+        _parse_pool = None
+
+
+def read_excel_file(file_path: str, engines: List[str], **kwargs) -> pd.DataFrame:
+    """按优先级依次尝试读取引擎读取Excel文件，前一个引擎失败时使用下一个
+    
+    定义为模块级函数，以便在进程池中执行
+    """
+    for i, engine in enumerate(engines):
+        try:
+            return pd.read_excel(file_path, engine=engine, **kwargs)
+        except Exception as e:
+            if i == len(engines) - 1:
+                raise
+            logger.warning("使用 %s 引擎读取 %s 失败，尝试下一个引擎: %s", engine, file_path, e)
+
+
+def read_header_row(file_path: str) -> List[Any]:
+    """使用openpyxl只读模式读取第一个工作表的表头行"""
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        row_iter = workbook.worksheets[0].iter_rows(min_row=1, max_row=1, values_only=True)
+        return list(next(row_iter, ()))
+    finally:
+        workbook.close()
+
+
+def project_columns(df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """只保留 columns 中存在的列，按 columns 的顺序排列
+
+    一个需要的列都没有时返回原数据，由调用方根据实际的列名报告错误
+    """
+    existing = [col for col in columns if col in df.columns]
+    return df.loc[:, existing] if existing else df
+
+
+def read_excel_file_with_header(file_path: str, engines: List[str],
+                                columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """读取Excel文件，并使用第一行作为列名
+
+    Args:
+        file_path: 文件路径
+        engines: 按优先级排列的读取引擎
+        columns: 只保留这些列（按表头名称），None表示读取所有列。先用只读模式读取表头行
+            确定列位置，再通过 usecols 只为需要的列构建数据，宽表的内存占用只与需要的列有关。
+            读取引擎仍会解析工作表的全部单元格，表头无法读取（如.xls）时读取全部列后再筛选
+    """
+    usecols = None
+    if columns is not None:
+        try:
+            header = read_header_row(file_path)
+            wanted = set(columns)
+            usecols = [i for i, name in enumerate(header) if name is not None and str(name) in wanted] or None
+        except Exception as e:
+            logger.warning("读取 %s 表头失败，将读取所有列: %s", file_path, e)
+
+    # 读取Excel文件，不使用第一行作为表头
+    if usecols is None:
+        df = read_excel_file(file_path, engines, header=None)
+    else:
+        df = read_excel_file(file_path, engines, header=None, usecols=usecols)
+
+    # 使用第一行作为列名
+    df.columns = df.iloc[0]
+    df = df.iloc[1:].reset_index(drop=True)
+    return df if columns is None else project_columns(df, columns)
@@ -1,19 +1,82 @@
 import os
 import uuid
+import hashlib
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Any, Optional, Tuple
-from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Tuple, Iterator
+from datetime import datetime, timedelta, date
 from models.schemas import ExcelPreview, PaginatedData
 from chinese_calendar import is_workday
 from services.settings_service import settings_service
+from services.artifact_service import artifact_service
+from services.retention_service import retention_manager
+from services.response_cache import response_cache
+from services.file_index import FileIndex, InvalidSortError
+from services.excel_reader import read_excel_file, read_excel_file_with_header, project_columns, get_parse_pool
+from services.records import (
+    normalize_records, get_column_mapping, get_mapping_digest, get_mapping_columns,
+    aggregate_daily_hours, merge_daily_aggregates
+)
 import math
 import calendar
-import json
-import traceback
-import copy
+import asyncio
+import orjson
+import importlib.metadata
+import openpyxl
+import xlsxwriter
+from core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 尝试导入calamine读取引擎（基于Rust，读取速度远快于openpyxl）
+try:
+    import python_calamine
+    CALAMINE_AVAILABLE = True
+except ImportError:
+    CALAMINE_AVAILABLE = False
+    logger.info("python-calamine 未安装，Excel读取将使用openpyxl引擎")
+
+# 可选的Excel读取引擎设置
+EXCEL_ENGINES = ['auto', 'calamine', 'openpyxl']
+# 合并请假记录预览中返回的记录条数
+MERGE_SAMPLE_SIZE = 100
+# 最多缓存的合并结果数
+MERGE_CACHE_SIZE = 8
+# 加班记录导出保留的列
+OVERTIME_EXPORT_COLUMNS = ['加班人', '开始时间', '结束时间', '时长', '加班原因']
+# 请假记录导出保留的列
+LEAVE_EXPORT_COLUMNS = ['请假类型', '开始时间', '结束时间', '时长', '请假事由', '创建人']
+# 合并请假记录时可作为去重键的数据ID列
+LEAVE_ID_COLUMNS = ['数据ID', 'id', 'ID']
+# 上传预览中返回的记录条数
+PREVIEW_ROWS = 10
+# 分页数据按此行数分块转换为原生类型
+PAGE_CHUNK_ROWS = 1000
+# 上传文件分块写入的大小
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def build_workday_bitmap(year: int) -> np.ndarray:
+    """计算某年每天是否为工作日（包含调休）的位图，日历不支持的年份视为全年无工作日"""
+    first_day = date(year, 1, 1)
+    days = (date(year + 1, 1, 1) - first_day).days
+    try:
+        return np.array([is_workday(first_day + timedelta(days=i)) for i in range(days)], dtype=bool)
+    except (ValueError, NotImplementedError):
+        return np.zeros(days, dtype=bool)
+
 
 class ExcelService:
+    # 导出类型对应的下载文件名
+    EXPORT_NAMES = {
+        'overtime': '加班记录',
+        'leave': '请假记录',
+        'attendance': '考勤记录',
+        'merged_leave': '合并请假记录'
+    }
+    # 基于归一化记录计算的导出类型
+    RECORD_EXPORTS = {'attendance'}
+
     def __init__(self):
         """初始化Excel服务类
         
@@ -24,56 +87,312 @@ class ExcelService:
         
         # 确保上传目录存在
         os.makedirs(self.upload_dir, exist_ok=True)
-        print(f"已确保上传目录存在: {os.path.abspath(self.upload_dir)}")
+        logger.debug("已确保上传目录存在: %s", os.path.abspath(self.upload_dir))
         
         # 初始化文件映射和缓存
         self.files: Dict[str, Dict[str, Any]] = {}  # 存储文件ID和文件信息的映射
         self.file_cache: Dict[str, pd.DataFrame] = {}
+        # 分页索引：文件ID -> 表头信息、上传预览和按 PAGE_CHUNK_ROWS 分块转换为原生类型的全部行
+        self.page_cache: Dict[str, Dict[str, Any]] = {}
+        # 二级索引：文件ID -> 用于筛选、排序和搜索的索引
+        self.file_indexes: Dict[str, FileIndex] = {}
+        # 归一化记录：文件ID -> 包含 name/start/end/hours/kind 的紧凑记录
+        self.record_cache: Dict[str, pd.DataFrame] = {}
+        # 每日汇总：文件ID -> 人员×日期的加班和请假小时数（长表）
+        self.aggregate_cache: Dict[str, pd.DataFrame] = {}
+        # 合并请假记录缓存：文件集合的缓存键 -> 合并去重结果，按加入顺序淘汰
+        self.merge_cache: Dict[str, Dict[str, Any]] = {}
+        # 工作日位图：年份 -> 当年每天是否为工作日
+        self.workday_bitmaps: Dict[int, np.ndarray] = {}
+        # 生成工作日位图所用的节假日数据版本，考勤导出的产物缓存键包含此版本
+        self.calendar_version = self._get_calendar_version()
+        # 后台解析任务：文件ID -> 完整解析文件的任务
+        self.parse_tasks: Dict[str, asyncio.Task] = {}
+        # DataFrame内存占用：文件ID -> (计算时的DataFrame, 字节数)，避免每次采集指标都重新计算
+        self.frame_sizes: Dict[str, Tuple[pd.DataFrame, int]] = {}
+        # 已上传文件内容：内容哈希 -> 磁盘路径及引用该文件的文件ID集合
+        self.blobs: Dict[str, Dict[str, Any]] = {}
+        
+        # 上传目录纳入保留策略管理，文件被清理时同步清理相关缓存
+        retention_manager.add_directory(self.upload_dir)
+        retention_manager.add_evict_callback(self.on_file_evicted)
 
     def ensure_upload_dir(self):
         """确保上传目录存在"""
         os.makedirs(self.upload_dir, exist_ok=True)
+
+    def get_reader_engines(self) -> List[str]:
+        """根据系统设置获取按优先级排列的Excel读取引擎
         
-    def check_and_clean_files(self):
-        """检查文件数量，如果超过最大值则清理旧文件"""
-        try:
-            # 获取最大文件数量设置
-            max_files = settings_service.get_max_files()
+        calamine不可用或读取失败时回退到openpyxl
+        """
+        engine = settings_service.get_excel_engine()
+        if engine == 'openpyxl' or not CALAMINE_AVAILABLE:
+            return ['openpyxl']
+        return ['calamine', 'openpyxl']
+
+    def read_excel(self, file_path: str, **kwargs) -> pd.DataFrame:
+        """使用配置的引擎读取Excel文件
+        
+        Args:
+            file_path: 文件路径
+            **kwargs: 传递给 pd.read_excel 的其他参数
             
-            # 获取上传目录中的所有文件
-            files = [f for f in os.listdir(self.upload_dir) if os.path.isfile(os.path.join(self.upload_dir, f))]
+        Returns:
+            pd.DataFrame: 读取的数据
+        """
+        return read_excel_file(file_path, self.get_reader_engines(), **kwargs)
+
+    def read_excel_with_header(self, file_path: str) -> pd.DataFrame:
+        """读取Excel文件，并使用第一行作为列名"""
+        return read_excel_file_with_header(file_path, self.get_reader_engines())
+
+    async def load_dataframes(self, file_ids: List[str], columns: Optional[List[str]] = None) -> Dict[str, pd.DataFrame]:
+        """获取多个文件的数据
+        
+        已缓存的文件直接返回，未缓存的文件在进程池中并行解析，
+        按完成顺序写入缓存，总耗时取决于最慢的文件而不是所有文件耗时之和。
+        不存在或读取失败的文件不包含在结果中
+        
+        Args:
+            file_ids: 文件ID列表
+            columns: 只返回这些列，None表示返回所有列。已缓存的文件在合并前先筛选列；
+                未缓存的文件只读取这些列，结果不完整因此不写入缓存
             
-            # 如果文件数量超过最大值，清理旧文件
-            if len(files) > max_files:
-                print(f"文件数量({len(files)})超过最大值({max_files})，开始清理旧文件")
-                
-                # 获取文件的创建时间
-                file_times = []
-                for file in files:
-                    file_path = os.path.join(self.upload_dir, file)
-                    # 获取文件的创建时间或修改时间
-                    ctime = os.path.getctime(file_path)
-                    file_times.append((file, ctime))
-                
-                # 按创建时间排序
-                file_times.sort(key=lambda x: x[1])
-                
-                # 计算需要删除的文件数量
-                files_to_delete = len(files) - max_files
-                
-                # 删除最旧的文件
-                for i in range(files_to_delete):
-                    file_to_delete = file_times[i][0]
-                    file_path = os.path.join(self.upload_dir, file_to_delete)
-                    try:
-                        os.remove(file_path)
-                        print(f"已删除旧文件: {file_to_delete}")
-                    except Exception as e:
-                        print(f"删除文件 {file_to_delete} 失败: {str(e)}")
-                
-                print(f"文件清理完成，已删除 {files_to_delete} 个文件")
+        Returns:
+            Dict[str, pd.DataFrame]: 文件ID -> 使用第一行作为列名的DataFrame
+        """
+        frames: Dict[str, pd.DataFrame] = {}
+        pending: Dict[str, str] = {}
+        for file_id in file_ids:
+            if file_id in self.file_cache:
+                df = self.file_cache[file_id]
+                frames[file_id] = df if columns is None else project_columns(df, columns)
+            elif file_id not in self.files:
+                logger.warning("文件ID %s 不存在于files映射中", file_id)
+            elif not os.path.exists(self.files[file_id]['path']):
+                logger.warning("文件 %s 不存在", self.files[file_id]['path'])
+            else:
+                pending[file_id] = self.files[file_id]['path']
+        
+        if not pending:
+            return frames
+        
+        # 只有一个文件时在线程中解析，避免进程间传输数据的开销
+        loop = asyncio.get_running_loop()
+        executor = get_parse_pool() if len(pending) > 1 else None
+        engines = self.get_reader_engines()
+        
+        async def parse(file_id: str, file_path: str) -> Tuple[str, pd.DataFrame]:
+            df = await loop.run_in_executor(executor, read_excel_file_with_header, file_path, engines, columns)
+            return file_id, df
+        
+        tasks = [parse(file_id, file_path) for file_id, file_path in pending.items()]
+        for future in asyncio.as_completed(tasks):
+            try:
+                file_id, df = await future
+            except Exception as e:
+                logger.error("读取文件失败: %s", e)
+                continue
+            logger.info("成功读取文件 %s，行数: %s", pending[file_id], len(df))
+            if columns is None and file_id in self.files:
+                self.file_cache[file_id] = df
+            frames[file_id] = df
+        
+        return frames
+
+    def get_page_headers(self, file_id: str, df: pd.DataFrame) -> List[Dict[str, Any]]:
+        """获取文件的表头信息，表头和列类型只在首次访问时推断一次"""
+        index = self.page_cache.setdefault(file_id, {})
+        if 'headers' not in index:
+            index['headers'] = self.process_headers(df)
+        return index['headers']
+
+    def build_page_chunks(self, df: pd.DataFrame) -> List[List[Dict[str, Any]]]:
+        """将全部行按 PAGE_CHUNK_ROWS 分块转换为原生类型，在上传解析时于线程池中执行"""
+        return [
+            self.convert_df_to_native_types(df.iloc[start:start + PAGE_CHUNK_ROWS])
+            for start in range(0, len(df), PAGE_CHUNK_ROWS)
+        ]
+
+    def get_page_rows(self, file_id: str, df: pd.DataFrame, positions: np.ndarray) -> List[Dict[str, Any]]:
+        """获取指定行号的原生类型记录
+        
+        上传解析时已分块转换全部行，任意页的请求都只需按行号从分块中取出；
+        没有分块时（例如后台解析失败后重新读取的文件）只转换请求的行
+        
+        Args:
+            file_id: 文件ID
+            df: 文件对应的DataFrame
+            positions: 行号
+            
+        Returns:
+            List[Dict[str, Any]]: 原生类型记录
+        """
+        chunks = self.page_cache.get(file_id, {}).get('chunks')
+        if chunks is None:
+            return self.convert_df_to_native_types(df.iloc[positions])
+        return [chunks[pos // PAGE_CHUNK_ROWS][pos % PAGE_CHUNK_ROWS] for pos in positions]
+
+    def get_file_index(self, file_id: str, df: pd.DataFrame) -> FileIndex:
+        """获取文件的二级索引，不存在时根据DataFrame构建"""
+        if file_id not in self.file_indexes:
+            self.file_indexes[file_id] = FileIndex(df)
+        return self.file_indexes[file_id]
+
+    def get_record_batch(self, file_id: str) -> pd.DataFrame:
+        """获取文件归一化后的记录，通常在上传解析时已生成，结果按文件缓存供各类导出复用
+
+        Returns:
+            pd.DataFrame: 包含 name、start、end、hours、kind 五列的紧凑记录
+        """
+        if file_id not in self.record_cache:
+            mapping = self.get_column_mapping()
+            df = self.file_cache.get(file_id)
+            if df is None:
+                # 文件未缓存时只读取列映射涉及的列，不写入文件缓存
+                df = read_excel_file_with_header(
+                    self.files[file_id]['path'], self.get_reader_engines(), get_mapping_columns(mapping)
+                )
+            self.record_cache[file_id] = normalize_records(df, mapping)
+        return self.record_cache[file_id]
+
+    def get_daily_aggregates(self, file_id: str) -> pd.DataFrame:
+        """获取文件的每日汇总（人员×日期的加班和请假小时数），通常在上传解析时已生成"""
+        if file_id not in self.aggregate_cache:
+            self.aggregate_cache[file_id] = aggregate_daily_hours(self.get_record_batch(file_id), self.get_workday_bitmap)
+        return self.aggregate_cache[file_id]
+
+    def get_column_mapping(self) -> Dict[str, Dict[str, List[str]]]:
+        """获取合并了系统设置的记录列映射"""
+        return get_column_mapping(settings_service.get_record_columns())
+
+    def clear_record_cache(self):
+        """列映射变化后清空所有归一化记录，下次使用时按新映射重新生成"""
+        self.record_cache.clear()
+        self.aggregate_cache.clear()
+
+    def on_calendar_updated(self):
+        """chinese-calendar 更新后清空工作日位图和每日汇总，之后的考勤导出使用新的缓存键"""
+        self.calendar_version = self._get_calendar_version()
+        self.workday_bitmaps.clear()
+        self.aggregate_cache.clear()
+
+    @staticmethod
+    def _get_calendar_version() -> str:
+        """获取已安装的 chinese-calendar 版本"""
+        try:
+            return importlib.metadata.version("chinese-calendar")
+        except importlib.metadata.PackageNotFoundError:
+            return "unknown"
+
+    def get_file_cache_bytes(self) -> int:
+        """统计文件缓存中DataFrame占用的内存字节数
+
+        每个文件的占用只在其DataFrame变化时重新计算；内容相同的文件共享同一个DataFrame，只计算一次
+        """
+        total = 0
+        counted = set()
+        for file_id, df in list(self.file_cache.items()):
+            entry = self.frame_sizes.get(file_id)
+            if entry is None or entry[0] is not df:
+                entry = self.frame_sizes[file_id] = (df, int(df.memory_usage(index=True, deep=True).sum()))
+            if id(df) not in counted:
+                counted.add(id(df))
+                total += entry[1]
+        return total
+
+    def get_file_hash(self, file_id: str) -> str:
+        """获取文件内容的SHA-256哈希
+        
+        上传时已计算的哈希直接返回，否则读取文件计算后缓存到文件映射中
+        
+        Args:
+            file_id: 文件ID
+            
+        Returns:
+            str: 十六进制哈希值，文件不存在时返回空字符串
+        """
+        file_info = self.files.get(file_id)
+        if not file_info:
+            return ''
+        if not file_info.get('hash'):
+            file_path = file_info['path']
+            if not os.path.exists(file_path):
+                return ''
+            digest = hashlib.sha256()
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+            file_info['hash'] = digest.hexdigest()
+        return file_info['hash']
+
+    def get_artifact_key(self, export_type: str, file_ids: List[str]) -> str:
+        """根据导出类型和文件集合生成导出产物缓存键"""
+        valid_ids = [file_id for file_id in file_ids if file_id in self.files]
+        file_hashes = [self.get_file_hash(file_id) for file_id in valid_ids]
+        key_type = export_type
+        if export_type in self.RECORD_EXPORTS:
+            # 基于归一化记录的导出结果还取决于列映射和节假日数据
+            key_type = (f"{export_type}:{get_mapping_digest(self.get_column_mapping())}"
+                        f":calendar-{self.calendar_version}")
+        return artifact_service.build_key(key_type, valid_ids, file_hashes)
+
+    def get_export_filename(self, export_type: str) -> str:
+        """生成导出文件的下载文件名，格式为 当前年月日+导出名称.xlsx"""
+        year_month_day = datetime.now().strftime('%Y%m%d')
+        return f"{year_month_day}{self.EXPORT_NAMES.get(export_type, '导出记录')}.xlsx"
+        
+    def check_and_clean_files(self):
+        """检查文件数量和占用空间，超过配额时立即清理最旧的文件"""
+        try:
+            retention_manager.enforce()
         except Exception as e:
-            print(f"检查和清理文件时出错: {str(e)}")
+            logger.error("检查和清理文件时出错: %s", e)
+
+    def on_file_evicted(self, path: str):
+        """文件被保留策略清理后，清理引用该文件的所有文件ID的缓存"""
+        for file_hash, blob in list(self.blobs.items()):
+            if blob['path'] == path:
+                for ref in list(blob['refs']):
+                    self._drop_file_caches(ref)
+                del self.blobs[file_hash]
+
+    def _release_file(self, file_id: str):
+        """释放文件ID对磁盘文件的引用并清理其映射和缓存
+        
+        内容相同的文件共享磁盘文件，最后一个引用释放时才删除物理文件
+        """
+        file_path = self.files[file_id]['path']
+        file_hash = self.files[file_id].get('hash')
+        blob = self.blobs.get(file_hash)
+        if blob:
+            blob['refs'].discard(file_id)
+        if not blob or not blob['refs']:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            retention_manager.unregister(file_path)
+            self.blobs.pop(file_hash, None)
+        
+        # 清理缓存
+        self._drop_file_caches(file_id)
+
+    def _drop_file_caches(self, file_id: str):
+        """清理文件ID的映射和所有相关缓存"""
+        self.file_cache.pop(file_id, None)
+        self.frame_sizes.pop(file_id, None)
+        self.page_cache.pop(file_id, None)
+        self.file_indexes.pop(file_id, None)
+        self.record_cache.pop(file_id, None)
+        self.aggregate_cache.pop(file_id, None)
+        response_cache.invalidate_tag(f"file:{file_id}")
+        # 包含该文件的合并结果全部失效
+        for merge_key, entry in list(self.merge_cache.items()):
+            if file_id in entry['file_ids']:
+                del self.merge_cache[merge_key]
+        self.files.pop(file_id, None)
+        # 后台解析完成后会检查文件是否仍存在，这里只移除任务记录
+        self.parse_tasks.pop(file_id, None)
             
     def process_headers(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
         """处理表头信息
@@ -117,7 +436,7 @@ class ExcelService:
                     'width': suggested_width
                 })
             except Exception as e:
-                print(f"处理列 {col} 时出错: {str(e)}")
+                logger.warning("处理列 %s 时出错: %s", col, e)
                 # 如果处理出错，添加一个基本的列信息
                 headers.append({
                     'key': str(col),
@@ -131,6 +450,9 @@ class ExcelService:
     async def process_upload(self, file, file_type: str) -> ExcelPreview:
         """处理上传的Excel文件并返回预览数据
         
+        文件按块写入磁盘并同时计算SHA-256，预览只解析前几行，
+        完整解析和索引构建在后台任务中完成
+        
         Args:
             file: 上传的文件对象
             file_type: 文件类型，'overtime' 或 'leave'
@@ -138,51 +460,312 @@ class ExcelService:
         Returns:
             ExcelPreview: 文件预览数据
         """
-        # 检查并清理文件
-        self.check_and_clean_files()
-        
         # 生成唯一文件ID
         file_id = str(uuid.uuid4())
         file_path = os.path.join(self.upload_dir, f"{file_id}.xlsx")
         
-        # 保存文件
-        content = await file.read()
+        # 分块保存文件，同时计算内容哈希
+        digest = hashlib.sha256()
         with open(file_path, "wb") as f:
-            f.write(content)
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                f.write(chunk)
+        
+        file_hash = digest.hexdigest()
+        
+        # 内容相同的文件已上传过时，直接复用已解析的数据
+        duplicate = self._reuse_uploaded_blob(file_id, file_hash, file.filename, file_type)
+        if duplicate is not None:
+            os.remove(file_path)
+            return duplicate
+        
+        blob = self.blobs.get(file_hash)
+        if blob is not None and os.path.exists(blob['path']):
+            # 内容相同的文件仍在生成预览（如完整解析中），共享其磁盘文件和引用计数，
+            # 不能用新的记录覆盖，否则原文件的引用丢失，其磁盘文件不会被正确释放
+            os.remove(file_path)
+            file_path = blob['path']
+            blob['refs'].add(file_id)
+        else:
+            self.blobs[file_hash] = {'path': file_path, 'refs': {file_id}}
+            # 登记到保留策略索引
+            retention_manager.register(file_path)
         
         # 存储文件映射
         self.files[file_id] = {
             'path': file_path,
             'name': file.filename,
-            'type': file_type
+            'type': file_type,
+            'hash': file_hash,
+            'status': 'parsing'
         }
         
-        # 读取Excel文件，不使用第一行作为表头
-        df = pd.read_excel(file_path, header=None)
-        
-        # 使用第一行作为列名
-        df.columns = df.iloc[0]
-        df = df.iloc[1:].reset_index(drop=True)
-        
-        # 存入缓存
-        self.file_cache[file_id] = df
+        # 在后台检查配额
+        retention_manager.request_enforce()
         
-        # 处理表头信息
-        headers = self.process_headers(df)
+        # 只读模式逐行读取前几行生成预览
+        try:
+            preview_df, total_rows = self.read_excel_preview(file_path, PREVIEW_ROWS)
+            # 工作表尺寸可能包含空行或格式行，后台解析完成后更正为实际行数
+            total_rows_estimated = True
+        except Exception as e:
+            # 只读模式无法处理的文件（如.xls）直接完整解析
+            logger.warning("只读模式读取预览失败，改为完整解析: %s", e)
+            try:
+                await self._parse_file(file_id)
+                if file_id not in self.file_cache:
+                    raise ValueError(f"文件 {file.filename} 在解析期间已被清理")
+            except Exception:
+                # 无法解析的文件不保留登记和磁盘文件，将解析错误返回给调用方
+                if file_id in self.files:
+                    self._release_file(file_id)
+                raise
+            df = self.file_cache[file_id]
+            preview_df, total_rows = df.head(PREVIEW_ROWS), len(df)
+            total_rows_estimated = False
+        
+        # 处理表头信息，结果保存到分页索引中供后续分页请求复用
+        headers = self.process_headers(preview_df)
+        page_index = self.page_cache.setdefault(file_id, {})
+        page_index['headers'] = headers
+        
+        # 将预览数据转换为Python原生类型，同时保存供重复上传时直接返回
+        sample_data = self.convert_df_to_native_types(preview_df)
+        page_index['preview'] = {
+            'sample_data': sample_data,
+            'total_rows': total_rows,
+            'total_rows_estimated': total_rows_estimated
+        }
         
-        # 将DataFrame转换为Python原生类型（只取前10行）
-        sample_data = self.convert_df_to_native_types(df.head(10))
+        # 完整解析和索引构建在后台完成
+        if self.files[file_id]['status'] == 'parsing':
+            self.parse_tasks[file_id] = asyncio.create_task(self._parse_in_background(file_id))
         
         # 生成预览数据
         preview = ExcelPreview(
             headers=headers,
             sample_data=sample_data,
-            total_rows=len(df),
+            total_rows=total_rows,
+            total_rows_estimated=total_rows_estimated,
             file_id=file_id
         )
         
         return preview
 
+    def _reuse_uploaded_blob(self, file_id: str, file_hash: str, filename: str,
+                             file_type: str) -> Optional[ExcelPreview]:
+        """内容相同的文件已存在时，将新文件ID映射到已有的文件和解析结果
+        
+        新文件ID与已有文件共享磁盘文件和缓存中的同一份数据对象，
+        磁盘文件按引用计数，最后一个引用删除时才删除物理文件
+        
+        Args:
+            file_id: 新文件ID
+            file_hash: 文件内容哈希
+            filename: 上传的文件名
+            file_type: 文件类型
+            
+        Returns:
+            Optional[ExcelPreview]: 复用成功时返回预览数据，否则返回None
+        """
+        blob = self.blobs.get(file_hash)
+        if not blob or not os.path.exists(blob['path']):
+            return None
+        
+        source_id = next((ref for ref in blob['refs'] if ref in self.files), None)
+        if source_id is None:
+            return None
+        page_index = self.page_cache.get(source_id)
+        if not page_index or 'preview' not in page_index:
+            return None
+        
+        logger.info("文件内容与 %s 相同，复用已解析的数据", source_id)
+        source_info = self.files[source_id]
+        self.files[file_id] = {
+            'path': blob['path'],
+            'name': filename,
+            'type': file_type,
+            'hash': file_hash,
+            'status': source_info['status']
+        }
+        blob['refs'].add(file_id)
+        
+        # 共享同一份数据对象，不产生额外内存
+        self.page_cache[file_id] = page_index
+        if source_id in self.file_cache:
+            self.file_cache[file_id] = self.file_cache[source_id]
+        if source_id in self.frame_sizes:
+            self.frame_sizes[file_id] = self.frame_sizes[source_id]
+        if source_id in self.file_indexes:
+            self.file_indexes[file_id] = self.file_indexes[source_id]
+        if source_id in self.record_cache:
+            self.record_cache[file_id] = self.record_cache[source_id]
+        if source_id in self.aggregate_cache:
+            self.aggregate_cache[file_id] = self.aggregate_cache[source_id]
+        if source_id in self.parse_tasks:
+            self.parse_tasks[file_id] = self.parse_tasks[source_id]
+        
+        return ExcelPreview(
+            headers=page_index['headers'],
+            sample_data=page_index['preview']['sample_data'],
+            total_rows=page_index['preview']['total_rows'],
+            total_rows_estimated=page_index['preview']['total_rows_estimated'],
+            file_id=file_id
+        )
+
+    def read_excel_preview(self, file_path: str, rows: int) -> Tuple[pd.DataFrame, int]:
+        """使用openpyxl只读模式读取Excel文件的前几行
+        
+        Args:
+            file_path: 文件路径
+            rows: 读取的数据行数（不含表头）
+            
+        Returns:
+            Tuple[pd.DataFrame, int]: 预览数据和根据工作表尺寸估算的数据总行数
+        """
+        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            worksheet = workbook.worksheets[0]
+            row_iter = worksheet.iter_rows(values_only=True)
+            header = list(next(row_iter, ()))
+            
+            sample_rows = []
+            for values in row_iter:
+                if len(sample_rows) >= rows:
+                    break
+                values = list(values)
+                # 只读模式下各行长度可能不一致，按表头补齐或截断
+                values = (values + [None] * len(header))[:len(header)]
+                if all(value is None for value in values):
+                    continue
+                sample_rows.append(values)
+            
+            max_row = worksheet.max_row
+            total_rows = max_row - 1 if max_row else len(sample_rows)
+        finally:
+            workbook.close()
+        
+        return pd.DataFrame(sample_rows, columns=header, dtype=object), total_rows
+
+    async def _parse_file(self, file_id: str):
+        """完整解析文件并构建缓存和索引
+        
+        读取Excel在进程池中执行，构建索引和归一化记录在线程池中执行；
+        工作线程只返回结果，写入文件映射和缓存都在事件循环中完成，
+        不会与删除文件、复用重复文件同时修改共享状态。解析失败时标记文件状态并抛出异常
+        """
+        file_info = self.files.get(file_id)
+        if not file_info:
+            return
+        file_hash = file_info.get('hash')
+        try:
+            loop = asyncio.get_running_loop()
+            df = await loop.run_in_executor(
+                get_parse_pool(), read_excel_file_with_header, file_info['path'], self.get_reader_engines()
+            )
+            calendar_version = self.calendar_version
+            result = await loop.run_in_executor(
+                None, self._index_file, df, self.get_column_mapping(), dict(self.workday_bitmaps)
+            )
+        except Exception as e:
+            logger.error("解析文件 %s 失败: %s", file_id, e)
+            for ref in self._get_blob_refs(file_id, file_hash):
+                self.files[ref]['status'] = 'error'
+                self.files[ref]['error'] = str(e)
+            raise
+        
+        # 解析期间节假日数据更新时，按旧数据计算的位图和每日汇总作废，之后按需重新计算
+        calendar_current = calendar_version == self.calendar_version
+        if calendar_current:
+            for year, bitmap in result['bitmaps'].items():
+                self.workday_bitmaps.setdefault(year, bitmap)
+        
+        # 解析结果同时提供给内容相同的所有文件ID，解析期间文件可能已被删除
+        for ref in self._get_blob_refs(file_id, file_hash):
+            self.file_cache[ref] = result['df']
+            self.file_indexes[ref] = result['index']
+            self.record_cache[ref] = result['records']
+            if calendar_current:
+                self.aggregate_cache[ref] = result['aggregates']
+            page_index = self.page_cache.setdefault(ref, {})
+            # 预览的表头由只读模式读取的前几行推断，列类型可能与完整数据不同，以完整数据为准
+            page_index['headers'] = result['headers']
+            page_index['chunks'] = result['chunks']
+            # 预览中根据工作表尺寸估算的总行数更正为实际行数
+            if 'preview' in page_index:
+                page_index['preview']['total_rows'] = len(result['df'])
+                page_index['preview']['total_rows_estimated'] = False
+            self.files[ref]['status'] = 'ready'
+
+    def _index_file(self, df: pd.DataFrame, column_mapping: Dict[str, Dict[str, List[str]]],
+                    workday_bitmaps: Dict[int, np.ndarray]) -> Dict[str, Any]:
+        """根据完整解析的数据构建索引、归一化记录、每日汇总和分页数据，在线程池中执行
+        
+        Args:
+            df: 完整解析的数据
+            column_mapping: 记录列映射
+            workday_bitmaps: 已缓存的工作日位图的副本，缺少的年份在本线程中计算并随结果返回
+        
+        Returns:
+            Dict[str, Any]: 包含 df、index、records、aggregates、bitmaps、headers、chunks 的解析结果
+        """
+        new_bitmaps: Dict[int, np.ndarray] = {}
+        
+        def get_workday_bitmap(year: int) -> np.ndarray:
+            bitmap = workday_bitmaps.get(year)
+            if bitmap is None:
+                bitmap = new_bitmaps.get(year)
+            if bitmap is None:
+                bitmap = new_bitmaps[year] = build_workday_bitmap(year)
+            return bitmap
+        
+        # 上传时一次性生成归一化记录，导出时不再重复判断文件类型和解析时长
+        records = normalize_records(df, column_mapping)
+        return {
+            'df': df,
+            'index': FileIndex(df),
+            'records': records,
+            # 每日汇总随文件保存，考勤导出只需合并各文件的汇总
+            'aggregates': aggregate_daily_hours(records, get_workday_bitmap),
+            'bitmaps': new_bitmaps,
+            'headers': self.process_headers(df),
+            # 分页数据预先分块转换为原生类型，分页请求不再在事件循环中转换
+            'chunks': self.build_page_chunks(df)
+        }
+
+    def _get_blob_refs(self, file_id: str, file_hash: Optional[str]) -> List[str]:
+        """获取与指定文件内容相同且仍存在的所有文件ID"""
+        blob = self.blobs.get(file_hash)
+        refs = blob['refs'] if blob else {file_id}
+        return [ref for ref in refs if ref in self.files]
+
+    async def _parse_in_background(self, file_id: str):
+        """在后台完整解析文件"""
+        task = self.parse_tasks.get(file_id)
+        try:
+            await self._parse_file(file_id)
+        except Exception:
+            # 错误已记录在文件状态中，获取数据时返回给调用方
+            pass
+        finally:
+            # 同时移除共享此任务的重复文件的任务记录
+            for ref, ref_task in list(self.parse_tasks.items()):
+                if ref_task is task:
+                    del self.parse_tasks[ref]
+
+    async def wait_parsed(self, file_ids: List[str]):
+        """等待指定文件的后台解析完成"""
+        for file_id in file_ids:
+            task = self.parse_tasks.get(file_id)
+            if task is not None:
+                try:
+                    await task
+                except Exception as e:
+                    logger.error("等待文件 %s 解析时出错: %s", file_id, e)
+
     def clean_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """清洗数据"""
         # 删除完全为空的行
@@ -228,7 +811,7 @@ class ExcelService:
             raise ValueError("文件不存在")
         
         file_path = self.files[file_id]['path']
-        df = pd.read_excel(file_path)
+        df = self.read_excel(file_path)
         
         # 数据清洗
         df = self.clean_data(df)
@@ -272,7 +855,18 @@ class ExcelService:
             "processed_file": output_path
         }
 
-    async def get_paginated_data(self, file_id: str, page: int, size: int) -> PaginatedData:
+    async def get_paginated_data(
+        self,
+        file_id: str,
+        page: int,
+        size: int,
+        name: Optional[str] = None,
+        leave_type: Optional[str] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        keyword: Optional[str] = None,
+        sort: Optional[str] = None
+    ) -> PaginatedData:
         """
         获取Excel文件的分页数据
         
@@ -280,6 +874,12 @@ class ExcelService:
         - file_id: 文件ID
         - page: 页码，从1开始
         - size: 每页数量
+        - name: 按创建人/加班人筛选，多个姓名用逗号分隔
+        - leave_type: 按请假类型筛选，多个类型用逗号分隔
+        - start_date: 开始时间不早于该日期
+        - end_date: 开始时间不晚于该日期
+        - keyword: 全文搜索关键字
+        - sort: 排序列，多个列用逗号分隔，列名前加 - 表示降序
         
         返回:
         - PaginatedData: 分页后的数据
@@ -293,45 +893,51 @@ class ExcelService:
             file_path = self.files[file_id]['path']
             if not os.path.exists(file_path):
                 # 如果文件不存在，清理缓存
-                if file_id in self.file_cache:
-                    del self.file_cache[file_id]
-                if file_id in self.files:
-                    del self.files[file_id]
+                self._drop_file_caches(file_id)
                 raise ValueError(f"文件 {file_path} 不存在")
 
+            # 等待后台解析完成
+            await self.wait_parsed([file_id])
+
             # 如果数据不在缓存中，则读取文件
             if file_id not in self.file_cache:
                 try:
-                    # 读取Excel文件，不使用第一行作为表头
-                    df = pd.read_excel(file_path, header=None)
-                    # 使用第一行作为列名
-                    df.columns = df.iloc[0]
-                    df = df.iloc[1:].reset_index(drop=True)
+                    df = self.read_excel_with_header(file_path)
                     self.file_cache[file_id] = df
                 except Exception as e:
                     raise ValueError(f"读取文件失败: {str(e)}")
             else:
                 df = self.file_cache[file_id]
 
+            # 获取预先计算的表头
+            headers = self.get_page_headers(file_id, df)
+
+            # 有筛选、排序或搜索条件时，通过二级索引得到满足条件的行号
+            row_ids = None
+            if any([name, leave_type, start_date, end_date, keyword, sort]):
+                row_ids = self.get_file_index(file_id, df).query(
+                    name=name,
+                    leave_type=leave_type,
+                    start_date=start_date,
+                    end_date=end_date,
+                    keyword=keyword,
+                    sort=sort
+                )
+
             # 计算分页信息
-            total = len(df)
+            total = len(df) if row_ids is None else len(row_ids)
             total_pages = math.ceil(total / size)
             
-            # 验证页码是否有效
-            if page < 1 or page > total_pages:
-                raise ValueError(f"页码 {page} 无效，总页数为 {total_pages}")
-            
-            start_idx = (page - 1) * size
+            # 超出总页数时返回空页，而不是视为错误
+            start_idx = min((page - 1) * size, total)
             end_idx = min(start_idx + size, total)
 
             # 获取当前页的数据
-            page_data = df.iloc[start_idx:end_idx]
-            
-            # 将DataFrame数据转换为Python原生类型
-            items = self.convert_df_to_native_types(page_data)
-
-            # 处理表头信息
-            headers = self.process_headers(df)
+            if row_ids is None:
+                positions = np.arange(start_idx, end_idx)
+            else:
+                positions = row_ids[start_idx:end_idx]
+            items = self.get_page_rows(file_id, df, positions)
 
             return PaginatedData(
                 items=items,
@@ -341,6 +947,8 @@ class ExcelService:
                 total_pages=total_pages,
                 headers=headers
             )
+        except InvalidSortError:
+            raise
         except Exception as e:
             raise ValueError(str(e))
 
@@ -360,15 +968,7 @@ class ExcelService:
             raise ValueError(f"文件 {file_id} 不存在")
         
         try:
-            # 删除物理文件
-            os.remove(file_path)
-            
-            # 清理缓存
-            if file_id in self.file_cache:
-                del self.file_cache[file_id]
-            if file_id in self.files:
-                del self.files[file_id]
-                
+            self._release_file(file_id)
         except Exception as e:
             raise Exception(f"删除文件失败: {str(e)}")
 
@@ -383,64 +983,51 @@ class ExcelService:
         - str: 导出文件的路径
         """
         try:
-            # 读取并合并所有加班记录
-            dfs = []
-            for file_id in file_ids:
-                if file_id not in self.file_cache:
-                    if file_id not in self.files:
-                        print(f"文件ID {file_id} 不存在于files映射中")
-                        continue
-                    file_path = self.files[file_id]['path']
-                    if not os.path.exists(file_path):
-                        print(f"文件 {file_path} 不存在")
-                        continue
-                    try:
-                        df = pd.read_excel(file_path)
-                        print(f"成功读取文件 {file_path}")
-                        print(f"列名: {df.columns.tolist()}")
-                        dfs.append(df)
-                    except Exception as e:
-                        print(f"读取文件 {file_path} 失败: {str(e)}")
-                else:
-                    df = self.file_cache[file_id]
-                    print(f"从缓存中获取文件 {file_id}")
-                    print(f"列名: {df.columns.tolist()}")
-                    dfs.append(df)
+            # 相同输入的导出直接复用已有产物
+            artifact_key = self.get_artifact_key('overtime', file_ids)
+            await self.wait_parsed(file_ids)
+            cached_file = artifact_service.lookup(artifact_key)
+            if cached_file:
+                logger.info("复用已有导出产物: %s", cached_file)
+                return cached_file
+            
+            # 读取并合并所有加班记录，只保留导出需要的列，未缓存的文件并行解析
+            frames = await self.load_dataframes(file_ids, columns=OVERTIME_EXPORT_COLUMNS)
+            dfs = [frames[file_id] for file_id in file_ids if file_id in frames]
             
             if not dfs:
                 raise ValueError("没有找到可导出的加班记录")
             
             # 合并所有数据
             merged_df = pd.concat(dfs, ignore_index=True)
-            print(f"合并后的列名: {merged_df.columns.tolist()}")
+            logger.debug("合并后的列名: %s", merged_df.columns.tolist())
             
             # 只保留需要的列
-            required_columns = ['加班人', '开始时间', '结束时间', '时长', '加班原因']
+            required_columns = OVERTIME_EXPORT_COLUMNS
             # 检查所需列是否存在，如果不存在则跳过
             existing_columns = [col for col in required_columns if col in merged_df.columns]
             if not existing_columns:
                 raise ValueError(f"未找到所需的列名。当前列名: {merged_df.columns.tolist()}")
             
-            print(f"找到的列: {existing_columns}")
+            logger.debug("找到的列: %s", existing_columns)
             merged_df = merged_df[existing_columns]
             
-            # 生成当前年月日的文件名
-            current_date = datetime.now()
-            year_month_day = current_date.strftime('%Y%m%d')
-            
-            # 确保上传目录存在
-            self.ensure_upload_dir()
-            
-            export_file = os.path.join(self.upload_dir, f"{year_month_day}加班记录.xlsx")
-            print(f"准备导出到文件: {export_file}")
+            # 先写入唯一的临时文件，完成后原子替换为最终产物
+            temp_file = artifact_service.new_temp_path(artifact_key)
+            logger.debug("准备导出到文件: %s", temp_file)
             
             # 导出到Excel
-            merged_df.to_excel(export_file, index=False)
-            print(f"成功导出到文件: {export_file}")
+            try:
+                merged_df.to_excel(temp_file, index=False)
+            except Exception:
+                artifact_service.discard(temp_file)
+                raise
+            export_file = artifact_service.commit(artifact_key, temp_file)
+            logger.info("成功导出到文件: %s", export_file)
             
             return export_file
         except Exception as e:
-            print(f"导出加班记录时发生错误: {str(e)}")
+            logger.error("导出加班记录时发生错误: %s", e)
             raise ValueError(f"导出加班记录失败: {str(e)}")
 
     async def export_leave(self, file_ids: List[str]) -> str:
@@ -454,64 +1041,51 @@ class ExcelService:
         - str: 导出文件的路径
         """
         try:
-            # 读取并合并所有请假记录
-            dfs = []
-            for file_id in file_ids:
-                if file_id not in self.file_cache:
-                    if file_id not in self.files:
-                        print(f"文件ID {file_id} 不存在于files映射中")
-                        continue
-                    file_path = self.files[file_id]['path']
-                    if not os.path.exists(file_path):
-                        print(f"文件 {file_path} 不存在")
-                        continue
-                    try:
-                        df = pd.read_excel(file_path)
-                        print(f"成功读取文件 {file_path}")
-                        print(f"列名: {df.columns.tolist()}")
-                        dfs.append(df)
-                    except Exception as e:
-                        print(f"读取文件 {file_path} 失败: {str(e)}")
-                else:
-                    df = self.file_cache[file_id]
-                    print(f"从缓存中获取文件 {file_id}")
-                    print(f"列名: {df.columns.tolist()}")
-                    dfs.append(df)
+            # 相同输入的导出直接复用已有产物
+            artifact_key = self.get_artifact_key('leave', file_ids)
+            await self.wait_parsed(file_ids)
+            cached_file = artifact_service.lookup(artifact_key)
+            if cached_file:
+                logger.info("复用已有导出产物: %s", cached_file)
+                return cached_file
+            
+            # 读取并合并所有请假记录，只保留导出需要的列，未缓存的文件并行解析
+            frames = await self.load_dataframes(file_ids, columns=LEAVE_EXPORT_COLUMNS)
+            dfs = [frames[file_id] for file_id in file_ids if file_id in frames]
             
             if not dfs:
                 raise ValueError("没有找到可导出的请假记录")
             
             # 合并所有数据
             merged_df = pd.concat(dfs, ignore_index=True)
-            print(f"合并后的列名: {merged_df.columns.tolist()}")
+            logger.debug("合并后的列名: %s", merged_df.columns.tolist())
             
             # 只保留需要的列
-            required_columns = ['请假类型', '开始时间', '结束时间', '时长', '请假事由', '创建人']
+            required_columns = LEAVE_EXPORT_COLUMNS
             # 检查所需列是否存在，如果不存在则跳过
             existing_columns = [col for col in required_columns if col in merged_df.columns]
             if not existing_columns:
                 raise ValueError(f"未找到所需的列名。当前列名: {merged_df.columns.tolist()}")
             
-            print(f"找到的列: {existing_columns}")
+            logger.debug("找到的列: %s", existing_columns)
             merged_df = merged_df[existing_columns]
             
-            # 生成当前年月日的文件名
-            current_date = datetime.now()
-            year_month_day = current_date.strftime('%Y%m%d')
-            
-            # 确保上传目录存在
-            self.ensure_upload_dir()
-            
-            export_file = os.path.join(self.upload_dir, f"{year_month_day}请假记录.xlsx")
-            print(f"准备导出到文件: {export_file}")
+            # 先写入唯一的临时文件，完成后原子替换为最终产物
+            temp_file = artifact_service.new_temp_path(artifact_key)
+            logger.debug("准备导出到文件: %s", temp_file)
             
             # 导出到Excel
-            merged_df.to_excel(export_file, index=False)
-            print(f"成功导出到文件: {export_file}")
+            try:
+                merged_df.to_excel(temp_file, index=False)
+            except Exception:
+                artifact_service.discard(temp_file)
+                raise
+            export_file = artifact_service.commit(artifact_key, temp_file)
+            logger.info("成功导出到文件: %s", export_file)
             
             return export_file
         except Exception as e:
-            print(f"导出请假记录时发生错误: {str(e)}")
+            logger.error("导出请假记录时发生错误: %s", e)
             raise ValueError(f"导出请假记录失败: {str(e)}")
 
     async def export_attendance(self, file_ids: List[str]) -> str:
@@ -558,381 +1132,190 @@ class ExcelService:
                             
                         return full_days
 
-            print(f"开始处理考勤记录导出，文件ID列表: {file_ids}")
+            logger.info("开始处理考勤记录导出，文件ID列表: %s", file_ids)
             
-            # 创建一个列表存储所有开始时间
-            all_start_times = []
+            # 相同输入的导出直接复用已有产物
+            artifact_key = self.get_artifact_key('attendance', file_ids)
+            cached_file = artifact_service.lookup(artifact_key)
+            if cached_file:
+                logger.info("复用已有导出产物: %s", cached_file)
+                return cached_file
             
-            # 首先遍历所有文件，收集开始时间
+            # 等待后台解析完成
+            await self.wait_parsed(file_ids)
+            
+            # 尚未生成每日汇总的文件先并行解析
+            await self.load_dataframes([file_id for file_id in file_ids if file_id not in self.aggregate_cache])
+            
+            # 合并所选文件在上传时预先计算的每日汇总，导出耗时与原始行数无关
+            partials = []
             for file_id in file_ids:
                 if file_id not in self.files:
-                    print(f"文件ID {file_id} 不存在")
+                    logger.warning("文件ID %s 不存在", file_id)
                     continue
-                    
-                file_info = self.files[file_id]
-                print(f"处理文件: {file_info['name']}")
-                
                 try:
-                    # 从缓存或文件系统读取数据
-                    if file_id in self.file_cache:
-                        df = self.file_cache[file_id]
-                    else:
-                        df = pd.read_excel(file_info['path'])
-                        self.file_cache[file_id] = df
-                    
-                    # 确定文件类型
-                    file_type = 'unknown'
-                    if any(col in df.columns for col in ['加班人', '加班时长']):
-                        file_type = 'overtime'
-                    elif any(col in df.columns for col in ['创建人', '请假时长', '请假类型']):
-                        file_type = 'leave'
-                    
-                    # 收集开始时间
-                    if '开始时间' in df.columns:
-                        # 提取日期部分（去掉上午/下午）
-                        start_times = df['开始时间'].apply(lambda x: str(x).split()[0] if pd.notna(x) else None)
-                        start_times = pd.to_datetime(start_times, errors='coerce')
-                        all_start_times.extend(start_times.dropna())
-                
+                    partials.append(self.get_daily_aggregates(file_id))
                 except Exception as e:
-                    print(f"处理文件出错: {str(e)}")
+                    logger.error("处理文件出错: %s", e)
                     continue
+            daily = merge_daily_aggregates(partials)
             
-            if not all_start_times:
+            if daily.empty:
                 raise ValueError("没有找到有效的开始时间")
             
-            # 将所有开始时间转换为pandas的时间序列
-            time_series = pd.Series(all_start_times)
-            
-            # 获取出现最多的年月
-            year_month_counts = time_series.dt.to_period('M').value_counts()
-            if len(year_month_counts) == 0:
-                raise ValueError("无法确定考勤统计月份")
-            
-            # 获取最常见的年月
-            most_common_year_month = year_month_counts.index[0]
-            target_year = most_common_year_month.year
-            target_month = most_common_year_month.month
-            
-            # 获取目标月份的天数
-            days_in_month = calendar.monthrange(target_year, target_month)[1]
-            
-            print(f"确定统计年月为: {target_year}年{target_month}月，共{days_in_month}天")
-            
-            # 创建一个空的DataFrame，列为日期
-            columns = ['姓名'] + [str(i) for i in range(1, days_in_month + 1)] + \
-                     ['加班时长', '调/请假', '总时长', '总时长(天)']
-            result_df = pd.DataFrame(columns=columns)
-            
-            # 初始化一个字典来存储每个人的数据
-            person_data = {}
-            
-            # 处理每个文件
-            for file_id in file_ids:
-                if file_id not in self.files:
-                    print(f"文件ID {file_id} 不存在")
-                    continue
-                    
-                file_info = self.files[file_id]
-                print(f"处理文件: {file_info['name']}")
+            # 格式化数字：如果是整数就显示整数，如果是小数就保留一位小数
+            def format_number(value):
+                if value == 0:
+                    return 0
+                # 先将值转换为float再判断是否为整数
+                float_value = float(value)
+                return int(value) if float_value.is_integer() else round(value, 1)
+            
+            # 按月份先后生成每个月的统计表
+            dates = daily['date'].dt
+            daily['net'] = daily['overtime'].astype(np.float64) - daily['leave'].astype(np.float64)
+            daily['day'] = dates.day
+            month_sheets = []
+            for (target_year, target_month), month_df in daily.groupby([dates.year, dates.month], sort=True):
+                target_year, target_month = int(target_year), int(target_month)
+                # 获取目标月份的天数
+                days_in_month = calendar.monthrange(target_year, target_month)[1]
+                logger.debug("生成 %s年%s月 统计表，共%s天", target_year, target_month, days_in_month)
                 
-                try:
-                    # 从缓存或文件系统读取数据
-                    if file_id in self.file_cache:
-                        df = self.file_cache[file_id]
-                    else:
-                        df = pd.read_excel(file_info['path'])
-                        self.file_cache[file_id] = df
+                columns = ['姓名'] + [str(i) for i in range(1, days_in_month + 1)] + \
+                         ['加班时长', '调/请假', '总时长', '总时长(天)']
+                
+                # 人员 × 日期 的净小时数（加班减请假）
+                matrix = month_df.pivot_table(index='name', columns='day', values='net', aggfunc='sum',
+                                              sort=False, observed=True)
+                totals = month_df.groupby('name', sort=False, observed=True)[['overtime', 'leave']].sum()
+                
+                # 处理每个人的数据
+                rows = []
+                for name, day_values in matrix.iterrows():
+                    row = {'姓名': name}
+                    # 填充每一天的数据
+                    for day in range(1, days_in_month + 1):
+                        value = day_values.get(day, 0)
+                        row[str(day)] = format_number(value) if pd.notna(value) and value != 0 else ''
                     
-                    print(f"数据行数: {len(df)}")
-                    print(f"文件列名: {df.columns.tolist()}")
+                    # 计算总时长
+                    overtime_hours = float(totals.at[name, 'overtime'])
+                    leave_hours = -float(totals.at[name, 'leave'])
+                    total_hours = overtime_hours + leave_hours
                     
-                    # 确定文件类型
-                    file_type = 'unknown'
-                    if any(col in df.columns for col in ['加班人', '加班时长']):
-                        file_type = 'overtime'
-                    elif any(col in df.columns for col in ['创建人', '请假时长', '请假类型']):
-                        file_type = 'leave'
-                    print(f"文件类型: {file_type}")
+                    # 应用数字格式化
+                    row['加班时长'] = format_number(overtime_hours)
+                    row['调/请假'] = format_number(leave_hours)
+                    row['总时长'] = format_number(total_hours)
                     
-                    # 处理数据
-                    if file_type == 'overtime':
-                        print("处理加班记录...")
-                        for _, row in df.iterrows():
-                            name = row.get('加班人', row.get('姓名', '未知'))
-                            try:
-                                # 打印原始时间字符串以便调试
-                                start_time_str = str(row.get('开始时间', ''))
-                                print(f"处理 {name} 的加班记录，原始开始时间: {start_time_str}")
-                                
-                                # 尝试多种日期格式解析
-                                try:
-                                    start_time = pd.to_datetime(start_time_str, format='%Y-%m-%d %H:%M:%S')
-                                except:
-                                    try:
-                                        start_time = pd.to_datetime(start_time_str, format='%Y/%m/%d %H:%M:%S')
-                                    except:
-                                        try:
-                                            start_time = pd.to_datetime(start_time_str)
-                                        except:
-                                            print(f"无法解析时间格式: {start_time_str}")
-                                            continue
-                                
-                                # 获取时长
-                                duration_str = str(row.get('时长', '0'))
-                                try:
-                                    if '小时' in duration_str:
-                                        duration = float(duration_str.replace('小时', ''))
-                                    elif '天' in duration_str:
-                                        duration = float(duration_str.replace('天', '')) * 8
-                                    else:
-                                        duration = float(duration_str)
-                                except:
-                                    print(f"无法解析时长: {duration_str}")
-                                    continue
-                                
-                                if pd.isna(start_time):
-                                    print(f"开始时间为空: {start_time_str}")
-                                    continue
-                                    
-                                day = str(start_time.day)
-                                print(f"解析成功 - 日期: {day}, 时长: {duration}")
-                                
-                                # 初始化该员工的数据
-                                if name not in person_data:
-                                    person_data[name] = {
-                                        '姓名': name,
-                                        '加班时长': 0,
-                                        '调/请假': 0,
-                                        '总时长': 0,
-                                        '总时长(天)': 0
-                                    }
-                                
-                                # 更新加班记录
-                                if day not in person_data[name]:
-                                    person_data[name][day] = 0
-                                person_data[name][day] = int(person_data[name][day] + duration)
-                                person_data[name]['加班时长'] += duration
-                                
-                            except Exception as e:
-                                print(f"处理加班记录出错: {str(e)}")
-                                continue
-                            
-                    elif file_type == 'leave':
-                        print("处理请假记录...")
-                        for _, row in df.iterrows():
-                            name = row.get('创建人', row.get('姓名', '未知'))
-                            try:
-                                # 提取日期部分
-                                start_time_str = str(row.get('开始时间', ''))
-                                end_time_str = str(row.get('结束时间', ''))
-                                duration_str = str(row.get('时长', '0'))
-
-                                print(f"处理 {name} 的请假记录: {start_time_str} 到 {end_time_str}, 时长: {duration_str}")
-
-                                # 解析时长
-                                if '小时' in duration_str:
-                                    duration = float(duration_str.replace('小时', ''))
-                                elif '天' in duration_str:
-                                    duration = float(duration_str.replace('天', '')) * 8
-                                else:
-                                    try:
-                                        duration = float(duration_str)
-                                    except:
-                                        print(f"无法解析时长: {duration_str}")
-                                        continue
-
-                                # 获取开始和结束日期
-                                start_date = pd.to_datetime(start_time_str.split()[0]).date()
-                                end_date = pd.to_datetime(end_time_str.split()[0]).date()
-                                
-                                print(f"请假时间段: {start_date} 到 {end_date}")
-                                
-                                # 初始化该员工的数据
-                                if name not in person_data:
-                                    person_data[name] = {
-                                        '姓名': name,
-                                        '加班时长': 0,
-                                        '调/请假': 0,
-                                        '总时长': 0,
-                                        '总时长(天)': 0
-                                    }
-
-                                # 如果总时长小于等于8小时，只记录在开始日期
-                                if duration <= 8:
-                                    if start_date.year == target_year and start_date.month == target_month:
-                                        date_str = start_date.strftime('%Y-%m-%d')
-                                        # 先判断是否是工作日
-                                        if self.is_workday(date_str):
-                                            day = str(start_date.day)
-                                            if day not in person_data[name]:
-                                                person_data[name][day] = 0
-                                            person_data[name][day] = -duration
-                                            person_data[name]['调/请假'] -= duration
-                                            person_data[name]['总时长'] -= duration
-                                else:
-                                    # 对于多天请假，计算工作日天数并平均分配时长
-                                    workdays_count = 0
-                                    workdays = []
-                                    current_date = start_date
-                                    
-                                    # 先统计工作日数量和收集工作日
-                                    while current_date <= end_date:
-                                        if current_date.year == target_year and current_date.month == target_month:
-                                            date_str = current_date.strftime('%Y-%m-%d')
-                                            if self.is_workday(date_str):
-                                                workdays_count += 1
-                                                workdays.append(current_date)
-                                        current_date += timedelta(days=1)
-                                    
-                                    # 如果有工作日，则记录请假时间
-                                    if workdays_count > 0:
-                                        # 每个工作日记录8小时
-                                        for work_date in workdays:
-                                            day = str(work_date.day)
-                                            if day not in person_data[name]:
-                                                person_data[name][day] = 0
-                                            person_data[name][day] = -8
-                                            person_data[name]['调/请假'] -= 8
-                                            person_data[name]['总时长'] -= 8
-
-                                # 更新总时长(天)
-                                person_data[name]['总时长(天)'] = calculate_days(person_data[name]['总时长'])
-                                
-                            except Exception as e:
-                                print(f"处理请假记录时发生错误: {str(e)}")
-                                continue
-                
-                except Exception as e:
-                    print(f"处理文件出错: {str(e)}")
-                    continue
-            
-            # 处理每个人的数据
-            rows = []
-            for name, data in person_data.items():
-                row = {'姓名': name}
-                # 填充每一天的数据
-                for day in range(1, days_in_month + 1):
-                    day_str = str(day)
-                    row[day_str] = data.get(day_str, '') if data.get(day_str, 0) != 0 else ''
-                
-                # 计算总时长
-                total_hours = data['加班时长'] + data['调/请假']
-                
-                # 格式化数字：如果是整数就显示整数，如果是小数就保留一位小数
-                def format_number(value):
-                    if value == 0:
-                        return 0
-                    # 先将值转换为float再判断是否为整数
-                    float_value = float(value)
-                    return int(value) if float_value.is_integer() else round(value, 1)
-                
-                # 应用数字格式化
-                row['加班时长'] = format_number(data['加班时长'])
-                row['调/请假'] = format_number(data['调/请假'])
-                row['总时长'] = format_number(total_hours)
-                
-                # 计算总时长(天)
-                days_value = calculate_days(total_hours)
-                row['总时长(天)'] = format_number(float(days_value))
+                    # 计算总时长(天)
+                    days_value = calculate_days(total_hours)
+                    row['总时长(天)'] = format_number(float(days_value))
+                    
+                    rows.append(row)
                 
-                rows.append(row)
+                result_df = pd.DataFrame(rows, columns=columns)
+                month_sheets.append((target_year, target_month, days_in_month, columns, result_df))
             
-            result_df = pd.DataFrame(rows, columns=columns)
+            # 导出到Excel，先写入唯一的临时文件，完成后原子替换为最终产物
+            temp_file = artifact_service.new_temp_path(artifact_key)
             
-            # 导出到Excel
-            self.ensure_upload_dir()
-            # 生成当前年月日的文件名
-            current_date = datetime.now()
-            year_month_day = current_date.strftime('%Y%m%d')
-            output_file = os.path.join(self.upload_dir, f'{year_month_day}考勤记录.xlsx')
-            
-            # 使用xlsxwriter引擎以支持更多格式设置
-            with pd.ExcelWriter(output_file, engine='xlsxwriter') as writer:
-                # 写入数据，但从第2行开始，为表头留出空间
-                result_df.to_excel(writer, sheet_name='Sheet1', index=False, startrow=1, header=False)
-                
-                # 获取workbook和worksheet对象
-                workbook = writer.book
-                worksheet = writer.sheets['Sheet1']
-                
-                # 设置列宽
-                worksheet.set_column('A:A', 15)  # 姓名列
-                worksheet.set_column(1, days_in_month, 4)  # 日期列宽度从8改为4
-                worksheet.set_column(days_in_month + 1, days_in_month + 4, 10)  # 统计列
-                
-                # 设置统一的表头格式（浅蓝背景，深色文字）
-                header_format = workbook.add_format({
-                    'bold': True,
-                    'align': 'center',
-                    'valign': 'vcenter',
-                    'bg_color': '#BDD7EE',  # 浅蓝色背景
-                    'font_color': '#000000',  # 黑色文字
-                    'border': 1
-                })
-                
-                # 设置单元格格式（无背景色）
-                cell_format = workbook.add_format({
-                    'align': 'center',
-                    'valign': 'vcenter',
-                    'border': 1,
-                    'num_format': '#,##0;-#,##0;0;@'  # 整数不显示小数点，0显示为0，文本保持原样
-                })
-                
-                # 设置小数格式（用于显示小数的单元格）
-                decimal_format = workbook.add_format({
-                    'align': 'center',
-                    'valign': 'vcenter',
-                    'border': 1,
-                    'num_format': '#,##0.0;-#,##0.0;0;@'  # 小数保留一位，0显示为0，文本保持原样
-                })
-                
-                # 合并单元格并写入标题（年月）
-                title = f"{target_year}年{target_month}月加班统计表（小时）"
-                
-                # 写入并合并姓名列表头
-                worksheet.merge_range(0, 0, 1, 0, '姓名', header_format)
-                
-                # 写入年月标题到日期区域
-                worksheet.merge_range(0, 1, 0, days_in_month, title, header_format)
-                
-                # 写入日期数字（1-31）
-                for col in range(1, days_in_month + 1):
-                    worksheet.write(1, col, str(col), header_format)
-                
-                # 写入并合并最后四个统计列的表头
-                stat_headers = ['加班时长', '调/请假', '总时长', '总时长(天)']
-                for idx, header in enumerate(stat_headers):
-                    col = days_in_month + 1 + idx
-                    worksheet.merge_range(0, col, 1, col, header, header_format)
-                
-                # 写入数据（根据数值类型使用不同的格式）
-                for row in range(2, len(result_df) + 2):  # 从第3行开始写数据
-                    for col in range(len(columns)):
-                        value = result_df.iloc[row-2][columns[col]]
-                        if value != '':  # 只有非空值才进行格式化
-                            try:
-                                if isinstance(value, (int, float)):
-                                    # 判断是否为整数
-                                    float_value = float(value)
-                                    if float_value.is_integer():
-                                        worksheet.write(row, col, int(value), cell_format)
-                                    else:
-                                        worksheet.write(row, col, round(float(value), 1), decimal_format)
-                                else:
-                                    worksheet.write(row, col, value, cell_format)
-                            except:
-                                worksheet.write(row, col, value, cell_format)
-                        else:
-                            worksheet.write(row, col, value, cell_format)
+            # 使用xlsxwriter引擎以支持更多格式设置，每个月一个工作表
+            try:
+                with pd.ExcelWriter(temp_file, engine='xlsxwriter') as writer:
+                    for target_year, target_month, days_in_month, columns, result_df in month_sheets:
+                        self._write_attendance_sheet(
+                            writer, f"{target_year}年{target_month}月", result_df, columns,
+                            days_in_month, target_year, target_month
+                        )
+            except Exception:
+                artifact_service.discard(temp_file)
+                raise
+            output_file = artifact_service.commit(artifact_key, temp_file)
             
-            print(f"考勤统计表导出完成: {output_file}")
+            logger.info("考勤统计表导出完成: %s，共 %s 个月", output_file, len(month_sheets))
             return output_file
             
         except Exception as e:
-            print(f"导出考勤记录时发生错误: {str(e)}")
+            logger.error("导出考勤记录时发生错误: %s", e)
             raise ValueError(f"导出考勤记录失败: {str(e)}")
 
+    def _write_attendance_sheet(self, writer: pd.ExcelWriter, sheet_name: str, result_df: pd.DataFrame,
+                                columns: List[str], days_in_month: int, target_year: int, target_month: int):
+        """将某个月的考勤统计结果写入工作簿中带格式的工作表"""
+        # 获取workbook对象并创建工作表，表头和数据都由下方按行顺序写入
+        workbook = writer.book
+        worksheet = workbook.add_worksheet(sheet_name)
+
+        # 设置列宽
+        worksheet.set_column('A:A', 15)  # 姓名列
+        worksheet.set_column(1, days_in_month, 4)  # 日期列宽度从8改为4
+        worksheet.set_column(days_in_month + 1, days_in_month + 4, 10)  # 统计列
+
+        # 设置统一的表头格式（浅蓝背景，深色文字）
+        header_format = workbook.add_format({
+            'bold': True,
+            'align': 'center',
+            'valign': 'vcenter',
+            'bg_color': '#BDD7EE',  # 浅蓝色背景
+            'font_color': '#000000',  # 黑色文字
+            'border': 1
+        })
+
+        # 设置单元格格式（无背景色）
+        cell_format = workbook.add_format({
+            'align': 'center',
+            'valign': 'vcenter',
+            'border': 1,
+            'num_format': '#,##0;-#,##0;0;@'  # 整数不显示小数点，0显示为0，文本保持原样
+        })
+
+        # 设置小数格式（用于显示小数的单元格）
+        decimal_format = workbook.add_format({
+            'align': 'center',
+            'valign': 'vcenter',
+            'border': 1,
+            'num_format': '#,##0.0;-#,##0.0;0;@'  # 小数保留一位，0显示为0，文本保持原样
+        })
+
+        # 合并单元格并写入标题（年月）
+        title = f"{target_year}年{target_month}月加班统计表（小时）"
+
+        # 写入并合并姓名列表头
+        worksheet.merge_range(0, 0, 1, 0, '姓名', header_format)
+
+        # 写入年月标题到日期区域
+        worksheet.merge_range(0, 1, 0, days_in_month, title, header_format)
+
+        # 写入日期数字（1-31）
+        for col in range(1, days_in_month + 1):
+            worksheet.write(1, col, str(col), header_format)
+
+        # 写入并合并最后四个统计列的表头
+        stat_headers = ['加班时长', '调/请假', '总时长', '总时长(天)']
+        for idx, header in enumerate(stat_headers):
+            col = days_in_month + 1 + idx
+            worksheet.merge_range(0, col, 1, col, header, header_format)
+
+        # 写入数据（根据数值类型使用不同的格式），逐行从元组取值并整行写入，行号严格递增
+        for row, values in enumerate(result_df.itertuples(index=False, name=None), start=2):  # 从第3行开始写数据
+            values = list(values)
+            decimal_cols = []
+            for col, value in enumerate(values):
+                # 只有数值才进行格式化，整数不显示小数点，小数保留一位
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    float_value = float(value)
+                    if float_value.is_integer():
+                        values[col] = int(float_value)
+                    else:
+                        values[col] = round(float_value, 1)
+                        decimal_cols.append(col)
+            worksheet.write_row(row, 0, values, cell_format)
+            # 同一行内覆盖写入小数单元格的格式
+            for col in decimal_cols:
+                worksheet.write_number(row, col, values[col], decimal_format)
+
     def is_workday(self, date_str: str) -> bool:
         """
         判断是否为工作日（包含调休）
@@ -949,346 +1332,329 @@ class ExcelService:
         except ValueError:
             return False
 
-    async def merge_leave_records(self, file_ids: List[str]) -> Dict[str, Any]:
-        """合并请假记录
-        
-        将多个请假记录文件合并为一个，并去重
-        
-        Args:
-            file_ids: 请假记录文件ID列表
-            
-        Returns:
-            Dict[str, Any]: 合并后的数据，包含表头和预览数据
+    def get_workday_bitmap(self, year: int) -> np.ndarray:
+        """获取某年每天是否为工作日（包含调休）的位图，按年缓存
+
+        日历不支持的年份视为全年无工作日
         """
-        print(f"开始合并请假记录，文件ID: {file_ids}")
-        
-        # 检查文件ID是否存在
+        if year not in self.workday_bitmaps:
+            self.workday_bitmaps[year] = build_workday_bitmap(year)
+        return self.workday_bitmaps[year]
+
+    def _validate_leave_files(self, file_ids: List[str]):
+        """检查文件是否存在且均为请假记录"""
         for file_id in file_ids:
             if file_id not in self.files:
+                logger.error("文件ID %s 不存在", file_id)
                 raise ValueError(f"文件ID {file_id} 不存在")
             
             # 检查文件类型是否为请假记录
             if self.files[file_id]['type'] != 'leave':
+                logger.error("文件ID %s 不是请假记录类型，而是 %s", file_id, self.files[file_id]['type'])
                 raise ValueError(f"文件ID {file_id} 不是请假记录类型")
+
+    def get_merge_key(self, file_ids: List[str]) -> str:
+        """生成合并结果的缓存键"""
+        return self.get_artifact_key('merge', file_ids)
+
+    async def get_merged_leave(self, file_ids: List[str]) -> Dict[str, Any]:
+        """读取、合并并去重多个请假记录文件，结果按文件集合缓存
         
-        # 读取所有请假记录文件
-        all_data = []
+        缓存键由排序后的文件ID及其内容哈希决定，合并预览、NDJSON流和合并导出共享同一份结果，
+        任一文件被删除或清理时相关的缓存项失效
         
-        for file_id in file_ids:
-            print(f"处理文件ID: {file_id}")
-            if file_id in self.file_cache:
-                # 从缓存中获取DataFrame
-                df = self.file_cache[file_id].copy()
-                print(f"从缓存获取DataFrame，列数: {len(df.columns)}, 行数: {len(df)}")
-            else:
-                # 重新读取文件
-                file_path = self.files[file_id]['path']
-                print(f"从文件读取DataFrame: {file_path}")
-                df = pd.read_excel(file_path, header=None)
-                
-                # 使用第一行作为列名
-                df.columns = df.iloc[0]
-                df = df.iloc[1:].reset_index(drop=True)
-                print(f"处理后DataFrame，列数: {len(df.columns)}, 行数: {len(df)}")
-                
-                # 存入缓存
-                self.file_cache[file_id] = df
+        Args:
+            file_ids: 请假记录文件ID列表
             
+        Returns:
+            Dict[str, Any]: 合并结果，包含：
+                - df: 合并去重后的数据（保留所有列）
+                - output_columns: 合并导出保留的列
+                - dropped: 去除的重复行数
+                - file_ids: 参与合并的文件ID集合
+        """
+        self._validate_leave_files(file_ids)
+        
+        merge_key = self.get_merge_key(file_ids)
+        entry = self.merge_cache.get(merge_key)
+        if entry is not None:
+            logger.info("复用已缓存的合并结果，文件ID: %s", file_ids)
+            return entry
+        
+        logger.info("开始合并请假记录，文件ID: %s", file_ids)
+        
+        # 等待后台解析完成
+        await self.wait_parsed(file_ids)
+        
+        # 读取所有请假记录文件，未缓存的文件并行解析
+        frames = await self.load_dataframes(file_ids)
+        all_data = []
+        for file_id in file_ids:
+            if file_id not in frames:
+                raise ValueError(f"无法读取文件 {self.files[file_id]['path']}")
+            df = frames[file_id]
+            if len(df) == 0:
+                logger.warning("文件 %s 没有数据行", self.files[file_id]['path'])
+                continue
             all_data.append(df)
         
-        # 合并所有数据
-        if all_data:
-            print(f"合并 {len(all_data)} 个DataFrame")
-            merged_df = pd.concat(all_data, ignore_index=True)
-            print(f"合并后DataFrame，列数: {len(merged_df.columns)}, 行数: {len(merged_df)}")
-            
-            # 清洗数据
-            merged_df = self.clean_data(merged_df)
-            print(f"清洗后DataFrame，列数: {len(merged_df.columns)}, 行数: {len(merged_df)}")
-            
-            # 对合并后的数据进行去重
-            merged_df = merged_df.drop_duplicates()
-            print(f"去重后DataFrame，列数: {len(merged_df.columns)}, 行数: {len(merged_df)}")
-            
-            # 重置索引
-            merged_df = merged_df.reset_index(drop=True)
-            
-            # 处理表头信息
-            print("处理表头信息")
-            headers = self.process_headers(merged_df)
-            print(f"处理表头完成，共 {len(headers)} 个列")
-            
-            # 将 DataFrame 转换为可序列化的记录列表
-            print("开始转换DataFrame为原生类型")
-            try:
-                sample_data = self.convert_df_to_native_types(merged_df)
-                print(f"转换完成，共 {len(sample_data)} 条记录")
-            except Exception as e:
-                print(f"转换过程中出错: {str(e)}")
-                import traceback
-                print(traceback.format_exc())
-                raise
-            
-            # 确保所有值都是Python原生类型
-            result = {
-                "headers": [],
-                "sample_data": sample_data,
-                "total_rows": len(sample_data)
-            }
-            
-            # 确保headers中的所有值都是Python原生类型
-            for header in headers:
-                header_dict = {}
-                for key, value in header.items():
-                    # 确保所有值都是基本Python类型
-                    if isinstance(value, (int, float, str, bool)) or value is None:
-                        header_dict[key] = value
-                    else:
-                        # 其他所有类型转为字符串
-                        header_dict[key] = str(value)
-                result["headers"].append(header_dict)
+        if not all_data:
+            logger.error("没有有效的数据可以合并")
+            raise ValueError("无法合并请假记录，数据为空")
+        
+        output_columns, key_columns = self._get_merged_leave_columns(all_data)
+        logger.debug("合并导出将保留以下列: %s，使用 %s 进行去重", output_columns, key_columns)
+        
+        parts, total_count = self._dedup_leave_frames(all_data, key_columns)
+        merged_df = pd.concat(parts, ignore_index=True) if parts else all_data[0].iloc[0:0]
+        dropped_count = total_count - len(merged_df)
+        logger.info("去重前行数: %s, 去重后行数: %s, 共删除了 %s 行重复数据", total_count, len(merged_df), dropped_count)
+        
+        entry = {
+            'df': merged_df,
+            'output_columns': output_columns,
+            'dropped': dropped_count,
+            'file_ids': set(file_ids)
+        }
+        # 只保留最近的若干个合并结果
+        self.merge_cache[merge_key] = entry
+        while len(self.merge_cache) > MERGE_CACHE_SIZE:
+            self.merge_cache.pop(next(iter(self.merge_cache)))
+        return entry
+
+    def _dedup_leave_frames(self, frames: List[pd.DataFrame], key_columns: List[str]) -> Tuple[List[pd.DataFrame], int]:
+        """逐个文件按去重键去除重复行
+        
+        每行去重键统一转为字符串后计算64位哈希，与已保留行的哈希集合比较，
+        内存占用只与去重后的行数有关，不需要先合并所有文件
+        
+        Returns:
+            Tuple[List[pd.DataFrame], int]: 各文件保留的行和去重前的非空行数
+        """
+        seen = np.array([], dtype=np.uint64)
+        parts = []
+        total_count = 0
+        for df in frames:
+            # 删除完全为空的行，缺失的去重键列视为空值
+            part = df.dropna(how='all')
+            if part.empty:
+                continue
+            total_count += len(part)
+            
+            hashes = pd.util.hash_pandas_object(
+                part.reindex(columns=key_columns).astype(str), index=False
+            ).to_numpy(dtype=np.uint64)
+            keep = ~pd.Series(hashes).duplicated().to_numpy()
+            keep &= ~np.isin(hashes, seen)
+            seen = np.union1d(seen, hashes[keep])
+            parts.append(part[keep])
+        return parts, total_count
+
+    async def merge_leave_records(self, file_ids: List[str], sample_size: int = MERGE_SAMPLE_SIZE) -> Dict[str, Any]:
+        """合并请假记录
+        
+        将多个请假记录文件合并为一个，并去重。响应中只包含前 sample_size 条记录作为预览，
+        完整数据可通过 stream_merged_leave_records 以NDJSON流的形式获取
+        
+        Args:
+            file_ids: 请假记录文件ID列表
+            sample_size: 预览记录条数
             
-            # 验证数据是否可序列化
-            try:
-                import json
-                # 尝试将结果序列化为JSON字符串，以确保不包含无法序列化的对象
-                json.dumps(result)
-                print("结果数据可序列化，有效")
-            except Exception as e:
-                print(f"结果数据序列化失败: {str(e)}")
-                # 如果序列化失败，再次尝试强制转换
-                import copy
-                safe_result = copy.deepcopy(result)
-                
-                def make_serializable(obj):
-                    """简单函数，将对象转换成可序列化的格式"""
-                    if isinstance(obj, dict):
-                        return {k: make_serializable(v) for k, v in obj.items()}
-                    elif isinstance(obj, list):
-                        return [make_serializable(item) for item in obj]
-                    elif isinstance(obj, (int, float, str, bool)) or obj is None:
-                        return obj
-                    else:
-                        # 所有复杂类型都转换为字符串
-                        return str(obj)
-                
-                result = make_serializable(safe_result)
-                print("数据已强制转换为可序列化形式")
+        Returns:
+            Dict[str, Any]: 合并后的数据，包含表头、预览数据和总行数
+        """
+        merged_df = (await self.get_merged_leave(file_ids))['df']
+        
+        # 处理表头信息，表头中的值均为基本类型
+        headers = self.process_headers(merged_df)
+        
+        # 只转换预览部分，转换结果已全部为Python原生类型
+        sample_data = self.convert_df_to_native_types(merged_df.head(sample_size))
+        
+        return {
+            "headers": headers,
+            "sample_data": sample_data,
+            "total_rows": len(merged_df)
+        }
+
+    async def stream_merged_leave_records(self, file_ids: List[str], chunk_size: int = 1000) -> Iterator[bytes]:
+        """以NDJSON流的形式返回合并后的请假记录
+        
+        合并在返回生成器之前完成，因此文件不存在等错误会在响应开始前抛出。
+        第一行为表头和总行数，之后每行一条记录，按 chunk_size 分块转换和输出
+        
+        Args:
+            file_ids: 请假记录文件ID列表
+            chunk_size: 每块转换的记录条数
             
-            return result
-        else:
-            raise ValueError("无法合并请假记录，数据为空")
+        Returns:
+            Iterator[bytes]: NDJSON数据块生成器
+        """
+        merged_df = (await self.get_merged_leave(file_ids))['df']
+        headers = self.process_headers(merged_df)
+        
+        def generate() -> Iterator[bytes]:
+            yield orjson.dumps({"headers": headers, "total_rows": len(merged_df)}) + b"\n"
+            for start in range(0, len(merged_df), chunk_size):
+                records = self.convert_df_to_native_types(merged_df.iloc[start:start + chunk_size])
+                yield b"".join(orjson.dumps(record) + b"\n" for record in records)
+        
+        return generate()
     
     async def export_merged_leave(self, file_ids: List[str]) -> str:
         """导出合并后的请假记录
         
+        复用合并预览缓存的去重结果，只保留需要的列后直接写入导出表。
+        被去除的重复行数保存在产物元数据中
+        
         Args:
             file_ids: 请假记录文件ID列表
             
         Returns:
             str: 导出的Excel文件路径
         """
-        print(f"开始合并并导出请假记录，文件ID: {file_ids}")
+        logger.info("开始合并并导出请假记录，文件ID: %s", file_ids)
+        self._validate_leave_files(file_ids)
         
-        # 检查文件ID是否存在
-        for file_id in file_ids:
-            if file_id not in self.files:
-                print(f"错误: 文件ID {file_id} 不存在")
-                raise ValueError(f"文件ID {file_id} 不存在")
-            
-            # 检查文件类型是否为请假记录
-            if self.files[file_id]['type'] != 'leave':
-                print(f"错误: 文件ID {file_id} 不是请假记录类型，而是 {self.files[file_id]['type']}")
-                raise ValueError(f"文件ID {file_id} 不是请假记录类型")
+        # 相同输入的导出直接复用已有产物
+        artifact_key = self.get_artifact_key('merged_leave', file_ids)
+        cached_file = artifact_service.lookup(artifact_key)
+        if cached_file:
+            logger.info("复用已有导出产物: %s", cached_file)
+            return cached_file
         
-        # 读取所有请假记录文件
-        all_data = []
+        # 与合并预览共享同一份合并结果
+        entry = await self.get_merged_leave(file_ids)
         
-        for file_id in file_ids:
-            print(f"处理文件ID: {file_id}")
-            file_path = self.files[file_id]['path']
-            print(f"文件路径: {file_path}")
-            
-            if not os.path.exists(file_path):
-                print(f"错误: 文件不存在于磁盘: {file_path}")
-                raise ValueError(f"文件 {file_path} 不存在于磁盘")
-            
-            try:
-                if file_id in self.file_cache:
-                    # 从缓存中获取DataFrame
-                    df = self.file_cache[file_id].copy()
-                    print(f"从缓存获取DataFrame，列数: {len(df.columns)}, 行数: {len(df)}")
-                else:
-                    # 重新读取文件
-                    print(f"从文件读取DataFrame: {file_path}")
-                    try:
-                        df = pd.read_excel(file_path, header=None)
-                        print(f"成功读取文件, 原始形状: {df.shape}")
-                        
-                        if len(df) == 0:
-                            print(f"警告: 文件 {file_path} 没有数据行")
-                            continue
-                            
-                        # 使用第一行作为列名
-                        df.columns = df.iloc[0]
-                        df = df.iloc[1:].reset_index(drop=True)
-                        print(f"处理后DataFrame，列数: {len(df.columns)}, 行数: {len(df)}")
-                        print(f"列名: {df.columns.tolist()}")
-                        
-                        # 存入缓存
-                        self.file_cache[file_id] = df
-                    except Exception as e:
-                        print(f"读取文件时出错: {str(e)}")
-                        import traceback
-                        print(traceback.format_exc())
-                        raise ValueError(f"无法读取文件 {file_path}: {str(e)}")
-                
-                all_data.append(df)
-            except Exception as e:
-                print(f"处理文件ID {file_id} 时出错: {str(e)}")
-                raise
+        # 先写入唯一的临时文件，完成后原子替换为最终产物
+        temp_path = artifact_service.new_temp_path(artifact_key)
+        logger.debug("将导出到文件: %s", temp_path)
         
-        # 合并所有数据
-        if not all_data:
-            print("错误: 没有有效的数据可以合并")
-            raise ValueError("无法合并请假记录，数据为空")
+        try:
+            self._write_merged_leave(temp_path, entry['df'], entry['output_columns'])
+            output_path = artifact_service.commit(artifact_key, temp_path, {'dropped_duplicates': entry['dropped']})
+            logger.info("成功导出到文件: %s", output_path)
             
-        print(f"合并 {len(all_data)} 个DataFrame")
-        merged_df = pd.concat(all_data, ignore_index=True)
-        print(f"合并后DataFrame，列数: {len(merged_df.columns)}, 行数: {len(merged_df)}")
-        print(f"合并后列名: {merged_df.columns.tolist()}")
-        
-        # 清洗数据 - 删除完全为空的行
-        merged_df = merged_df.dropna(how='all')
-        print(f"删除空行后，行数: {len(merged_df)}")
+            return output_path
+        except Exception as e:
+            artifact_service.discard(temp_path)
+            logger.exception("导出合并请假记录时出错: %s", e)
+            raise ValueError(f"导出合并请假记录失败: {str(e)}")
+
+    def _get_merged_leave_columns(self, frames: List[pd.DataFrame]) -> Tuple[List[str], List[str]]:
+        """根据所有文件的列确定合并导出保留的列和去重键列
         
-        # 列出当前所有的列
-        print(f"当前所有列: {merged_df.columns.tolist()}")
+        Returns:
+            Tuple[List[str], List[str]]: 保留的列和去重键列
+        """
+        # 按出现顺序收集所有文件的列
+        all_columns = []
+        for df in frames:
+            for col in df.columns:
+                if col not in all_columns:
+                    all_columns.append(col)
         
         # 确定要保留的列
-        required_columns = ['请假类型', '开始时间', '结束时间', '时长', '请假事由', '创建人']
+        required_columns = LEAVE_EXPORT_COLUMNS
+        output_columns = [col for col in required_columns if col in all_columns]
         
-        # 检查所需列是否存在
-        available_columns = [col for col in required_columns if col in merged_df.columns]
+        # 首先检查是否有数据ID列
+        id_column = next((col for col in LEAVE_ID_COLUMNS if col in all_columns), None)
         
-        if available_columns:
+        if output_columns:
             # 如果有数据ID列，确保它也被保留
-            if '数据ID' in merged_df.columns or 'id' in merged_df.columns or 'ID' in merged_df.columns:
-                id_column = None
-                for possible_id in ['数据ID', 'id', 'ID']:
-                    if possible_id in merged_df.columns:
-                        id_column = possible_id
-                        break
-                
-                if id_column and id_column not in available_columns:
-                    available_columns.append(id_column)
-                    print(f"添加ID列 '{id_column}' 到保留列表")
-            
-            print(f"将保留以下列: {available_columns}")
-            merged_df = merged_df[available_columns]
+            if id_column and id_column not in output_columns:
+                output_columns.append(id_column)
         else:
-            print(f"警告: 未找到任何所需的列 {required_columns}，将保留所有列")
-        
-        # 确定用于去重的列
-        duplicate_check_columns = []
-        
-        # 首先检查是否有数据ID列
-        id_column = None
-        for possible_id in ['数据ID', 'id', 'ID']:
-            if possible_id in merged_df.columns:
-                id_column = possible_id
-                break
+            logger.warning("未找到任何所需的列 %s，将保留所有列", required_columns)
+            output_columns = all_columns
         
         if id_column:
             # 使用数据ID列进行去重
-            duplicate_check_columns = [id_column]
-            print(f"将使用数据ID列 '{id_column}' 进行去重")
+            key_columns = [id_column]
         else:
             # 如果没有数据ID列，则使用开始时间、结束时间、创建人进行去重
-            for col in ['创建人', '开始时间', '结束时间']:
-                if col in merged_df.columns:
-                    duplicate_check_columns.append(col)
-            
-            if len(duplicate_check_columns) > 0:
-                print(f"未找到数据ID列，将使用 {duplicate_check_columns} 进行去重")
-            else:
+            key_columns = [col for col in ['创建人', '开始时间', '结束时间'] if col in output_columns]
+            if not key_columns:
                 # 如果必要的列也不存在，则使用所有列进行去重
-                print("未找到数据ID列或必要的去重列，将使用所有列进行去重")
-                duplicate_check_columns = merged_df.columns.tolist()
-        
-        # 去重前行数
-        before_count = len(merged_df)
-        
-        # 对合并后的数据进行去重
-        merged_df = merged_df.drop_duplicates(subset=duplicate_check_columns)
-        
-        # 去重后行数
-        after_count = len(merged_df)
-        print(f"去重前行数: {before_count}, 去重后行数: {after_count}, 共删除了 {before_count - after_count} 行重复数据")
-        
-        # 重置索引
-        merged_df = merged_df.reset_index(drop=True)
+                key_columns = output_columns
         
-        # 生成输出文件名
-        today = datetime.now().strftime('%Y%m%d')
-        output_path = os.path.join(self.upload_dir, f"{today}合并请假记录.xlsx")
-        print(f"将导出到文件: {output_path}")
-        
-        # 导出到Excel文件
+        return output_columns, key_columns
+
+    def _write_merged_leave(self, output_path: str, merged_df: pd.DataFrame, output_columns: List[str]):
+        """将合并后的请假记录的指定列逐行写入Excel文件"""
+        workbook = xlsxwriter.Workbook(output_path, {'constant_memory': True})
         try:
-            # 导出到Excel
-            merged_df.to_excel(output_path, index=False)
-            print(f"成功导出到文件: {output_path}")
-            
-            return output_path
-        except Exception as e:
-            print(f"导出合并请假记录时出错: {str(e)}")
-            import traceback
-            print(traceback.format_exc())
-            raise ValueError(f"导出合并请假记录失败: {str(e)}")
+            worksheet = workbook.add_worksheet('Sheet1')
+            header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center'})
+            datetime_format = workbook.add_format({'num_format': 'yyyy-mm-dd hh:mm:ss'})
+            worksheet.write_row(0, 0, [str(col) for col in output_columns], header_format)
+            
+            row_index = 1
+            for values in merged_df.reindex(columns=output_columns).itertuples(index=False, name=None):
+                for col, value in enumerate(values):
+                    if value is None or (isinstance(value, float) and math.isnan(value)) or value is pd.NaT:
+                        continue
+                    if isinstance(value, (datetime, pd.Timestamp)):
+                        worksheet.write_datetime(row_index, col, value, datetime_format)
+                    else:
+                        worksheet.write(row_index, col, self._to_native_value(value))
+                row_index += 1
+        finally:
+            workbook.close()
 
     def convert_df_to_native_types(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
         """
         将Pandas DataFrame转换为Python原生类型，处理numpy特殊类型和NaN值
         
+        按列进行向量化转换：每列只计算一次空值掩码，日期列一次性格式化，
+        数值列整体转换为Python原生类型，最后按行组装记录
+        
         Args:
             df: Pandas DataFrame对象
             
         Returns:
             List[Dict[str, Any]]: 包含Python原生类型的记录列表
         """
-        print("开始转换DataFrame到原生类型")
-        
-        # 直接使用to_dict转换，在后续处理中处理NaN
-        records = []
-        
-        # 将日期类型转换为字符串
-        df_copy = df.copy()
-        for col in df_copy.columns:
-            if pd.api.types.is_datetime64_any_dtype(df_copy[col]):
-                df_copy[col] = df_copy[col].dt.strftime('%Y-%m-%d %H:%M:%S')
-        
-        # 直接转换为Python字典
-        for record in df_copy.to_dict('records'):
-            # 简单的类型转换
-            clean_record = {}
-            for key, val in record.items():
-                try:
-                    # 处理NaN值
-                    if pd.isna(val):
-                        clean_record[key] = None
-                    # 处理其他类型
-                    elif isinstance(val, (int, float, bool, str)):
-                        clean_record[key] = val
-                    else:
-                        # 其他类型转为字符串
-                        clean_record[key] = str(val)
-                except:
-                    # 处理任何异常情况
-                    clean_record[key] = str(val) if val is not None else None
+        keys = [str(col) for col in df.columns]
+        columns = []
+        
+        for i in range(len(df.columns)):
+            series = df.iloc[:, i]
+            null_mask = series.isna().to_numpy()
+            
+            if pd.api.types.is_datetime64_any_dtype(series):
+                # 日期列一次性格式化为字符串
+                values = series.dt.strftime('%Y-%m-%d %H:%M:%S').tolist()
+            elif pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+                # 数值列整体转换为Python原生类型
+                values = series.tolist()
+            else:
+                values = series.tolist()
+                # 只有包含非基本类型的列才需要逐个转换
+                inferred = pd.api.types.infer_dtype(series, skipna=True)
+                if inferred not in ('string', 'integer', 'floating', 'boolean', 'mixed-integer-float', 'empty'):
+                    values = [self._to_native_value(val) for val in values]
+            
+            # 空值统一转换为None
+            if null_mask.any():
+                for row in np.flatnonzero(null_mask):
+                    values[row] = None
             
-            records.append(clean_record)
+            columns.append(values)
         
-        print(f"转换完成，共处理{len(records)}条记录")
-        return records
+        return [dict(zip(keys, row)) for row in zip(*columns)] if columns else [{} for _ in range(len(df))]
+
+    @staticmethod
+    def _to_native_value(val: Any) -> Any:
+        """将单个值转换为可JSON序列化的Python原生类型"""
+        if val is None or isinstance(val, (bool, int, float, str)):
+            return val
+        if isinstance(val, np.generic):
+            return val.item()
+        # 其他类型转为字符串
+        return str(val)
+
 
+# 创建单例实例，各路由共享同一份文件映射和缓存
+excel_service = ExcelService()
@@ -0,0 +1,208 @@
+import numpy as np
+import pandas as pd
+from datetime import date
+from typing import List, Dict, Optional, Tuple
+
+
+class InvalidSortError(ValueError):
+    """排序参数中的列不存在"""
+
+
+class FileIndex:
+    """上传文件的二级索引
+
+    在上传时对DataFrame构建一次，之后的筛选、排序和搜索都在索引上完成：
+    - 人员索引：姓名 -> 行号数组
+    - 请假类型索引：请假类型 -> 行号数组
+    - 日期索引：按开始日期排序的日期数组及对应行号，按日期范围查询时二分查找
+    - 搜索文本：每行所有单元格拼接后的小写文本
+    """
+
+    # 人员姓名列，按优先级查找
+    NAME_COLUMNS = ['创建人', '加班人', '姓名']
+    # 日期列
+    DATE_COLUMN = '开始时间'
+    # 请假类型列
+    LEAVE_TYPE_COLUMN = '请假类型'
+
+    def __init__(self, df: pd.DataFrame):
+        """根据DataFrame构建索引
+
+        Args:
+            df: 已使用第一行作为列名的DataFrame
+        """
+        self.row_count = len(df)
+        self.columns = [str(col) for col in df.columns]
+        self._df = df
+        # 排序用的列排名缓存：列名 -> 每行的排名
+        self._sort_ranks: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+        # 人员索引
+        self.name_column = next((col for col in self.NAME_COLUMNS if col in df.columns), None)
+        self.names = self._build_value_index(df[self.name_column]) if self.name_column else {}
+
+        # 请假类型索引
+        if self.LEAVE_TYPE_COLUMN in df.columns:
+            self.leave_types = self._build_value_index(df[self.LEAVE_TYPE_COLUMN])
+        else:
+            self.leave_types = {}
+
+        # 日期索引：去掉空值后按日期排序
+        if self.DATE_COLUMN in df.columns:
+            day_values = self._parse_days(df[self.DATE_COLUMN])
+            valid_rows = np.flatnonzero(~np.isnat(day_values))
+            order = np.argsort(day_values[valid_rows], kind='stable')
+            self.date_rows = valid_rows[order]
+            self.date_values = day_values[self.date_rows]
+            self._day_values = day_values
+        else:
+            self.date_rows = np.array([], dtype=np.int64)
+            self.date_values = np.array([], dtype='datetime64[D]')
+            self._day_values = None
+
+        # 搜索文本：每行所有单元格以分隔符拼接并转小写
+        if len(df.columns) > 0:
+            text = df.astype(str).where(df.notna(), '')
+            joined = text.iloc[:, 0]
+            for i in range(1, len(text.columns)):
+                joined = joined + '\x1f' + text.iloc[:, i]
+            self.search_text = joined.str.lower().reset_index(drop=True)
+        else:
+            self.search_text = pd.Series([''] * self.row_count)
+
+    @staticmethod
+    def _build_value_index(series: pd.Series) -> Dict[str, np.ndarray]:
+        """构建 值 -> 行号数组 的索引，空值不参与索引"""
+        values = series.reset_index(drop=True)
+        values = values[values.notna()].astype(str).str.strip()
+        return {
+            key: np.asarray(rows, dtype=np.int64)
+            for key, rows in values.groupby(values, sort=False).indices.items()
+        }
+
+    @staticmethod
+    def _parse_days(series: pd.Series) -> np.ndarray:
+        """将开始时间列解析为按天精度的日期数组
+
+        钉钉导出的时间可能是 "2024-01-05 09:00" 或 "2024-01-05 上午" 等格式，
+        只取第一个空格之前的日期部分进行解析
+        """
+        date_part = series.reset_index(drop=True).astype(str).str.split().str[0]
+        parsed = pd.to_datetime(
+            date_part.where(series.reset_index(drop=True).notna()),
+            errors='coerce',
+            format='mixed'
+        )
+        return parsed.values.astype('datetime64[D]')
+
+    def _get_sort_rank(self, column: str) -> Tuple[np.ndarray, np.ndarray]:
+        """获取某一列每行的排名和空值掩码，用于排序，结果按列缓存
+
+        空值的排名为最大值，升序时排在最后
+        """
+        if column not in self._sort_ranks:
+            if column not in self.columns:
+                raise InvalidSortError(f"排序列 {column} 不存在")
+            if column == self.DATE_COLUMN and self._day_values is not None:
+                # 日期列按解析后的日期排序，空值排在最后
+                days = self._day_values.astype('int64')
+                nulls = np.isnat(self._day_values)
+                rank = np.where(nulls, np.iinfo(np.int64).max, days)
+            else:
+                series = self._df.iloc[:, self.columns.index(column)].reset_index(drop=True)
+                nulls = series.isna().to_numpy()
+                numeric = pd.to_numeric(series, errors='coerce')
+                if numeric.notna().sum() == series.notna().sum():
+                    # 纯数字列按数值排序
+                    rank = numeric.fillna(np.inf).to_numpy(dtype=np.float64)
+                else:
+                    codes, _ = pd.factorize(series.astype(str), sort=True)
+                    rank = np.where(nulls, np.iinfo(np.int64).max, codes)
+            self._sort_ranks[column] = (rank, nulls)
+        return self._sort_ranks[column]
+
+    def query(
+        self,
+        name: Optional[str] = None,
+        leave_type: Optional[str] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        keyword: Optional[str] = None,
+        sort: Optional[str] = None
+    ) -> np.ndarray:
+        """按条件查询行号
+
+        Args:
+            name: 人员姓名（精确匹配创建人/加班人/姓名列），多个姓名用逗号分隔
+            leave_type: 请假类型，多个类型用逗号分隔
+            start_date: 开始日期下限（包含）
+            end_date: 开始日期上限（包含）
+            keyword: 在所有列中进行不区分大小写的文本搜索
+            sort: 排序列，多个列用逗号分隔，列名前加 - 表示降序
+
+        Returns:
+            np.ndarray: 满足条件的行号，按排序条件排列
+        """
+        mask = np.ones(self.row_count, dtype=bool)
+
+        if name:
+            mask &= self._lookup_mask(self.names, name)
+
+        if leave_type:
+            mask &= self._lookup_mask(self.leave_types, leave_type)
+
+        if start_date or end_date:
+            left = 0
+            right = len(self.date_values)
+            if start_date:
+                left = np.searchsorted(self.date_values, np.datetime64(start_date, 'D'), side='left')
+            if end_date:
+                right = np.searchsorted(self.date_values, np.datetime64(end_date, 'D'), side='right')
+            date_mask = np.zeros(self.row_count, dtype=bool)
+            date_mask[self.date_rows[left:right]] = True
+            mask &= date_mask
+
+        if keyword:
+            candidates = np.flatnonzero(mask)
+            matched = self.search_text.iloc[candidates].str.contains(keyword.lower(), regex=False).to_numpy()
+            mask = np.zeros(self.row_count, dtype=bool)
+            mask[candidates[matched]] = True
+
+        rows = np.flatnonzero(mask)
+
+        if sort:
+            rows = self._sort_rows(rows, sort)
+
+        return rows
+
+    def _lookup_mask(self, index: Dict[str, np.ndarray], values: str) -> np.ndarray:
+        """根据值索引生成行掩码"""
+        mask = np.zeros(self.row_count, dtype=bool)
+        for value in values.split(','):
+            rows = index.get(value.strip())
+            if rows is not None:
+                mask[rows] = True
+        return mask
+
+    def _sort_rows(self, rows: np.ndarray, sort: str) -> np.ndarray:
+        """按排序条件对行号排序"""
+        keys: List[np.ndarray] = []
+        for item in sort.split(','):
+            item = item.strip()
+            if not item:
+                continue
+            descending = item.startswith('-')
+            column = item.lstrip('-+')
+            rank, nulls = self._get_sort_rank(column)
+            rank, nulls = rank[rows], nulls[rows]
+            if descending:
+                # 只对非空值取反，空值在降序时同样排在最后
+                rank = np.where(nulls, rank, -rank)
+            keys.append(rank)
+
+        if not keys:
+            return rows
+
+        # np.lexsort 以最后一个键作为主排序键
+        order = np.lexsort(keys[::-1])
+        return rows[order]
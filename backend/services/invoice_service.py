@@ -1,8 +1,17 @@
 import os
 import uuid
+import asyncio
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, Optional, List, Tuple
 import re
+import logging
+from core.logger import get_logger, get_row_logger
+
+logger = get_logger(__name__)
+# 每个文本块、每个候选金额的调试日志，按采样率输出
+row_logger = get_row_logger(__name__)
 
 # 尝试导入PaddleOCR依赖
 try:
@@ -10,7 +19,7 @@ try:
     PADDLE_OCR_AVAILABLE = True
 except ImportError:
     PADDLE_OCR_AVAILABLE = False
-    print("警告: PaddleOCR 未安装，请执行 'pip install paddlepaddle paddleocr' 安装")
+    logger.warning("PaddleOCR 未安装，请执行 'pip install paddlepaddle paddleocr' 安装")
 
 # 尝试导入PDF处理依赖
 try:
@@ -18,7 +27,7 @@ try:
     PDF_SUPPORT = True
 except ImportError:
     PDF_SUPPORT = False
-    print("警告: pdf2image 未安装，PDF处理功能将不可用")
+    logger.warning("pdf2image 未安装，PDF处理功能将不可用")
 
 # 尝试导入图像处理依赖
 try:
@@ -26,7 +35,11 @@ try:
     CV2_AVAILABLE = True
 except ImportError:
     CV2_AVAILABLE = False
-    print("警告: opencv-python 未安装，图像预处理功能将不可用")
+    logger.warning("opencv-python 未安装，图像预处理功能将不可用")
+
+# OCR执行器的线程数，可通过环境变量 OCR_WORKERS 调整
+OCR_WORKERS = int(os.getenv("OCR_WORKERS") or 1)
+
 
 class InvoiceService:
     """发票识别服务 - 使用PaddleOCR实现"""
@@ -85,31 +98,59 @@ class InvoiceService:
         """初始化发票识别服务"""
         self.temp_dir = "uploads/temp"
         self.ensure_temp_dir()
-        self.ocr_engine = None
+        # OCR引擎不是线程安全的，每个执行器线程使用各自的引擎实例
+        self._engines = threading.local()
+        # 识别任务在执行器中排队执行，不阻塞事件循环；每个线程各加载一份模型，默认单线程
+        self.executor = ThreadPoolExecutor(max_workers=OCR_WORKERS, thread_name_prefix="ocr")
+        # 排队中和执行中的识别任务数
+        self.pending = 0
+        self._pending_lock = threading.Lock()
     
     def ensure_temp_dir(self):
         """确保临时目录存在"""
         os.makedirs(self.temp_dir, exist_ok=True)
     
     def get_ocr_engine(self):
-        """获取OCR引擎实例（延迟加载）"""
-        if self.ocr_engine is None:
+        """获取当前线程的OCR引擎实例（延迟加载）"""
+        if getattr(self._engines, "engine", None) is None:
             if not PADDLE_OCR_AVAILABLE:
                 raise ImportError("PaddleOCR未安装，请执行 'pip install paddlepaddle paddleocr' 安装")
             
-            print("初始化PaddleOCR引擎...")
+            logger.info("初始化PaddleOCR引擎...")
             # 使用2.7.3版本兼容的配置初始化PaddleOCR
-            self.ocr_engine = PaddleOCR(
+            self._engines.engine = PaddleOCR(
                 use_angle_cls=True,     # 启用方向分类，自动处理倾斜文本
                 lang="ch",              # 中文模型
                 use_gpu=False,          # 默认使用CPU
                 show_log=False          # 不显示日志
             )
-            print("PaddleOCR引擎初始化完成")
+            logger.info("PaddleOCR引擎初始化完成")
         
-        return self.ocr_engine
+        return self._engines.engine
     
     async def recognize_invoice(self, file_content: bytes, file_extension: str) -> Dict[str, Any]:
+        """
+        识别发票内容，识别任务在OCR执行器中排队执行
+        
+        Args:
+            file_content: 文件内容
+            file_extension: 文件扩展名
+            
+        Returns:
+            Dict[str, Any]: 识别结果
+        """
+        with self._pending_lock:
+            self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.executor, self._recognize_invoice_sync, file_content, file_extension
+            )
+        finally:
+            with self._pending_lock:
+                self.pending -= 1
+    
+    def _recognize_invoice_sync(self, file_content: bytes, file_extension: str) -> Dict[str, Any]:
         """
         识别发票内容
         
@@ -120,11 +161,11 @@ class InvoiceService:
         Returns:
             Dict[str, Any]: 识别结果
         """
-        print(f"开始识别发票，文件类型: {file_extension}")
+        logger.info("开始识别发票，文件类型: %s", file_extension)
         
         # 检查PaddleOCR是否可用
         if not PADDLE_OCR_AVAILABLE:
-            print("警告: PaddleOCR未安装，发票识别功能不可用")
+            logger.warning("PaddleOCR未安装，发票识别功能不可用")
             return {
                 "amount": None,
                 "invoice_no": None,
@@ -140,12 +181,12 @@ class InvoiceService:
             with open(temp_file_path, "wb") as f:
                 f.write(file_content)
             
-            print(f"临时文件已保存: {temp_file_path}")
+            logger.debug("临时文件已保存: %s", temp_file_path)
             
             # 根据文件类型处理图像
             if file_extension.lower() == ".pdf":
                 if not PDF_SUPPORT:
-                    print("PDF处理功能不可用")
+                    logger.warning("PDF处理功能不可用")
                     return {
                         "amount": None,
                         "invoice_no": None,
@@ -154,10 +195,10 @@ class InvoiceService:
                     }
                 
                 # 处理PDF文件
-                print("开始处理PDF文件...")
+                logger.debug("开始处理PDF文件...")
                 images = pdf2image.convert_from_path(temp_file_path, dpi=300)
                 if not images:
-                    print("PDF转换失败，未能提取图像")
+                    logger.warning("PDF转换失败，未能提取图像")
                     return {
                         "amount": None,
                         "invoice_no": None,
@@ -169,29 +210,29 @@ class InvoiceService:
                 with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as tmp_file:
                     images[0].save(tmp_file.name, 'JPEG')
                     image_path = tmp_file.name
-                    print(f"PDF已转换为图像: {image_path}")
+                    logger.debug("PDF已转换为图像: %s", image_path)
             else:
                 # 处理图像文件
                 image_path = temp_file_path
-                print(f"使用图像文件: {image_path}")
+                logger.debug("使用图像文件: %s", image_path)
             
             # 图像预处理（可选，提高识别准确率）
             preprocessed_image_path = None
             if CV2_AVAILABLE:
-                print("进行图像预处理...")
+                logger.debug("进行图像预处理...")
                 preprocessed_image_path = self._preprocess_image(image_path)
                 if preprocessed_image_path:
                     image_path = preprocessed_image_path
-                    print(f"使用预处理后的图像: {image_path}")
+                    logger.debug("使用预处理后的图像: %s", image_path)
             
             # 使用PaddleOCR识别文本
-            print("开始使用PaddleOCR识别文本...")
+            logger.debug("开始使用PaddleOCR识别文本...")
             ocr_result = self._recognize_text_with_paddle(image_path)
             
             # 解析发票信息
-            print("开始解析发票信息...")
+            logger.debug("开始解析发票信息...")
             invoice_data = self._parse_invoice_data(ocr_result)
-            print(f"解析结果: {invoice_data}")
+            logger.info("解析结果: %s", invoice_data)
             
             # 清理临时文件
             if file_extension.lower() == ".pdf" and os.path.exists(image_path) and image_path != temp_file_path:
@@ -203,9 +244,7 @@ class InvoiceService:
             return invoice_data
         
         except Exception as e:
-            print(f"发票识别过程中出错: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("发票识别过程中出错: %s", e)
             return {
                 "amount": None,
                 "invoice_no": None,
@@ -219,7 +258,7 @@ class InvoiceService:
                 try:
                     os.remove(temp_file_path)
                 except Exception as e:
-                    print(f"删除临时文件失败: {str(e)}")
+                    logger.warning("删除临时文件失败: %s", e)
     
     def _preprocess_image(self, image_path: str) -> Optional[str]:
         """
@@ -235,7 +274,7 @@ class InvoiceService:
             # 读取图像
             img = cv2.imread(image_path)
             if img is None:
-                print(f"无法读取图像: {image_path}")
+                logger.warning("无法读取图像: %s", image_path)
                 return None
             
             # 转换为灰度图
@@ -256,7 +295,7 @@ class InvoiceService:
             
             return preprocessed_path
         except Exception as e:
-            print(f"图像预处理失败: {str(e)}")
+            logger.warning("图像预处理失败: %s", e)
             return None
     
     def _recognize_text_with_paddle(self, image_path: str) -> List[Tuple[str, List[List[int]], float]]:
@@ -272,18 +311,18 @@ class InvoiceService:
         try:
             # 获取OCR引擎
             ocr = self.get_ocr_engine()
-            print(f"OCR引擎获取成功，开始识别图像: {image_path}")
+            logger.debug("OCR引擎获取成功，开始识别图像: %s", image_path)
 
             # 识别图像
             result = ocr.ocr(image_path, cls=True)
-            print(f"OCR识别完成，返回结果类型: {type(result)}")
-            print(f"OCR返回结果长度: {len(result) if result else 0}")
+            logger.debug("OCR识别完成，返回结果类型: %s", type(result))
+            logger.debug("OCR返回结果长度: %s", len(result) if result else 0)
 
             # 调试：打印返回结果的结构
             if result:
-                print(f"OCR结果第一层类型: {type(result[0]) if len(result) > 0 else 'Empty'}")
+                logger.debug("OCR结果第一层类型: %s", type(result[0]) if len(result) > 0 else 'Empty')
                 if len(result) > 0 and result[0]:
-                    print(f"OCR结果第二层类型: {type(result[0][0]) if len(result[0]) > 0 else 'Empty'}")
+                    logger.debug("OCR结果第二层类型: %s", type(result[0][0]) if len(result[0]) > 0 else 'Empty')
 
             # 提取文本和位置信息
             text_with_positions = []
@@ -308,12 +347,13 @@ class InvoiceService:
                             confidence = item[1][1]  # 置信度
                             text_with_positions.append((text, position, confidence))
             
-            print(f"PaddleOCR识别完成，共识别出{len(text_with_positions)}个文本块")
+            if row_logger.isEnabledFor(logging.DEBUG):
+                for text, _, confidence in text_with_positions:
+                    row_logger.debug("识别文本块: %s (置信度: %.3f)", text, confidence)
+            logger.debug("PaddleOCR识别完成，共识别出%s个文本块", len(text_with_positions))
             return text_with_positions
         except Exception as e:
-            print(f"PaddleOCR识别失败: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("PaddleOCR识别失败: %s", e)
             return []
     
     def _parse_invoice_data(self, ocr_result: List[Tuple[str, List[List[int]], float]]) -> Dict[str, Any]:
@@ -334,13 +374,13 @@ class InvoiceService:
         }
         
         if not ocr_result:
-            print("OCR结果为空，返回默认值")
+            logger.info("OCR结果为空，返回默认值")
             return result
         
         # 提取所有文本内容
         all_texts = [text for text, _, _ in ocr_result]
         full_text = " ".join(all_texts)
-        print(f"合并后的文本内容(前200个字符): {full_text[:200]}")
+        logger.debug("合并后的文本内容(前200个字符): %s", full_text[:200])
         
         # 1. 提取发票号码
         invoice_no = self._extract_invoice_number(full_text)
@@ -355,7 +395,7 @@ class InvoiceService:
         # 3. 确定发票类型
         result["type"] = self._determine_invoice_type(full_text)
         
-        print(f"最终解析结果: {result}")
+        logger.info("最终解析结果: %s", result)
         return result
     
     def _extract_invoice_number(self, text: str) -> Optional[str]:
@@ -378,7 +418,7 @@ class InvoiceService:
             for match in matches:
                 exclude_numbers.add(match.group(1).strip())
         
-        print(f"需要排除的编号: {exclude_numbers}")
+        logger.debug("需要排除的编号: %s", exclude_numbers)
         
         # 方法1: 使用优化后的关键词匹配
         for pattern in self.INVOICE_NUMBER_PATTERNS:
@@ -387,10 +427,10 @@ class InvoiceService:
                 invoice_no = match.group(1).strip()
                 # 验证提取的号码
                 if invoice_no not in exclude_numbers and self._validate_invoice_number(invoice_no):
-                    print(f"通过正则表达式找到有效发票号码: {invoice_no}")
+                    logger.debug("通过正则表达式找到有效发票号码: %s", invoice_no)
                     return invoice_no
         
-        print("未找到有效的发票号码")
+        logger.info("未找到有效的发票号码")
         return None
     
     def _validate_invoice_number(self, number: str) -> bool:
@@ -474,13 +514,16 @@ class InvoiceService:
         if candidates:
             # 按优先级和金额大小排序
             candidates.sort(key=lambda x: (-x[1], -x[0]))
+            if row_logger.isEnabledFor(logging.DEBUG):
+                for amount, priority in candidates:
+                    row_logger.debug("候选金额: %s (优先级: %s)", amount, priority)
             
             # 选择优先级最高的金额
             highest_priority_amount = candidates[0][0]
-            print(f"最终选择的金额: {highest_priority_amount} (优先级: {candidates[0][1]})")
+            logger.debug("最终选择的金额: %s (优先级: %s)", highest_priority_amount, candidates[0][1])
             return highest_priority_amount
         
-        print("未找到有效金额")
+        logger.info("未找到有效金额")
         return None
     
     def _determine_invoice_type(self, text: str) -> str:
@@ -498,10 +541,10 @@ class InvoiceService:
         for invoice_type, keywords in self.INVOICE_TYPES.items():
             for keyword in keywords:
                 if keyword.lower() in text:
-                    print(f"根据关键词'{keyword}'确定发票类型为: {invoice_type}")
+                    logger.debug("根据关键词'%s'确定发票类型为: %s", keyword, invoice_type)
                     return invoice_type
         
-        print("未找到匹配的发票类型，使用默认类型: other")
+        logger.debug("未找到匹配的发票类型，使用默认类型: other")
         return "other"  # 默认为其他类型
     
     def _extract_numbers_with_positions(self, ocr_result: List[Tuple[str, List[List[int]], float]]) -> List[Tuple[float, float]]:
@@ -517,4 +560,8 @@ class InvoiceService:
                         numbers.append((number, center_y))
                 except ValueError:
                     continue
-        return sorted(numbers, key=lambda x: x[1]) 
\ No newline at end of file
+        return sorted(numbers, key=lambda x: x[1]) 
+
+
+# 创建单例实例
+invoice_service = InvoiceService()
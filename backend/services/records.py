@@ -0,0 +1,294 @@
+import copy
+import hashlib
+import json
+import numpy as np
+import pandas as pd
+from enum import Enum
+from typing import Callable, Dict, List, Optional, Any
+
+
+class RecordKind(str, Enum):
+    """记录类型"""
+    OVERTIME = 'overtime'
+    LEAVE = 'leave'
+
+
+# 归一化记录的列
+RECORD_COLUMNS = ['name', 'start', 'end', 'hours', 'kind']
+
+# 记录字段
+RECORD_FIELDS = ['name', 'start', 'end', 'hours']
+
+# 默认列映射：记录类型 -> 字段 -> 按优先级排列的候选列名
+# detect 为判断文件类型的特征列，出现任意一列即认为是该类型的文件，按类型顺序优先匹配
+DEFAULT_RECORD_COLUMNS: Dict[str, Dict[str, List[str]]] = {
+    RecordKind.OVERTIME.value: {
+        'detect': ['加班人', '加班时长'],
+        'name': ['加班人', '姓名'],
+        'start': ['开始时间'],
+        'end': ['结束时间'],
+        'hours': ['时长', '加班时长']
+    },
+    RecordKind.LEAVE.value: {
+        'detect': ['创建人', '请假时长', '请假类型'],
+        'name': ['创建人', '姓名'],
+        'start': ['开始时间'],
+        'end': ['结束时间'],
+        'hours': ['时长', '请假时长']
+    }
+}
+
+
+def get_column_mapping(overrides: Optional[Dict[str, Dict[str, List[str]]]] = None) -> Dict[str, Dict[str, List[str]]]:
+    """合并默认列映射和系统设置中的自定义映射
+
+    自定义映射只需提供需要修改的类型和字段，未提供的部分使用默认值
+
+    Args:
+        overrides: 自定义映射，格式与 DEFAULT_RECORD_COLUMNS 相同
+
+    Returns:
+        Dict[str, Dict[str, List[str]]]: 完整的列映射
+    """
+    mapping = copy.deepcopy(DEFAULT_RECORD_COLUMNS)
+    for kind, fields in (overrides or {}).items():
+        if kind in mapping:
+            mapping[kind].update({field: list(columns) for field, columns in fields.items()})
+    return mapping
+
+
+def validate_column_mapping(overrides: Dict[str, Any]):
+    """校验自定义列映射，格式不正确时抛出 ValueError"""
+    if not isinstance(overrides, dict):
+        raise ValueError("列映射必须是对象")
+    kinds = [kind.value for kind in RecordKind]
+    for kind, fields in overrides.items():
+        if kind not in kinds:
+            raise ValueError(f"记录类型必须是 {', '.join(kinds)} 之一")
+        if not isinstance(fields, dict):
+            raise ValueError(f"{kind} 的列映射必须是对象")
+        for field, columns in fields.items():
+            if field not in ['detect'] + RECORD_FIELDS:
+                raise ValueError(f"未知的记录字段: {field}")
+            if not isinstance(columns, list) or not columns or not all(isinstance(col, str) for col in columns):
+                raise ValueError(f"{kind}.{field} 必须是非空的列名列表")
+
+
+def get_mapping_digest(mapping: Dict[str, Dict[str, List[str]]]) -> str:
+    """计算列映射的摘要，列映射变化后据此使导出产物缓存失效"""
+    return hashlib.sha256(json.dumps(mapping, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+
+
+def get_mapping_columns(mapping: Dict[str, Dict[str, List[str]]]) -> List[str]:
+    """获取列映射涉及的所有列名，归一化记录只需要读取这些列"""
+    columns = []
+    for fields in mapping.values():
+        for names in fields.values():
+            columns.extend(col for col in names if col not in columns)
+    return columns
+
+
+def detect_kind(columns, mapping: Dict[str, Dict[str, List[str]]]) -> Optional[RecordKind]:
+    """根据列名判断文件的记录类型，无法判断时返回None"""
+    columns = set(str(col) for col in columns)
+    for kind, fields in mapping.items():
+        if any(col in columns for col in fields.get('detect', [])):
+            return RecordKind(kind)
+    return None
+
+
+def empty_records() -> pd.DataFrame:
+    """创建空的归一化记录"""
+    return pd.DataFrame({
+        'name': pd.Categorical([]),
+        'start': pd.Series([], dtype='datetime64[ns]'),
+        'end': pd.Series([], dtype='datetime64[ns]'),
+        'hours': pd.Series([], dtype=np.float32),
+        'kind': pd.Categorical([], categories=[kind.value for kind in RecordKind])
+    })
+
+
+def normalize_records(df: pd.DataFrame, mapping: Dict[str, Dict[str, List[str]]]) -> pd.DataFrame:
+    """将加班或请假记录归一化为紧凑的统一记录
+
+    - name: 人员姓名，分类类型
+    - start/end: 开始/结束时间，datetime64，"2024-01-05 上午" 这类格式只取日期部分
+    - hours: 时长换算为小时，float32，"1天" 按8小时计
+    - kind: 记录类型，分类类型
+
+    开始时间或时长无法解析的行被丢弃，请假记录还要求结束时间有效
+
+    Args:
+        df: 已使用第一行作为列名的DataFrame
+        mapping: 列映射
+
+    Returns:
+        pd.DataFrame: 归一化后的记录
+    """
+    kind = detect_kind(df.columns, mapping)
+    if kind is None:
+        return empty_records()
+
+    fields = mapping[kind.value]
+
+    def pick(field: str) -> Optional[pd.Series]:
+        column = next((col for col in fields.get(field, []) if col in df.columns), None)
+        return df[column] if column is not None else None
+
+    names = pick('name')
+    if names is None:
+        names = pd.Series('未知', index=df.index)
+
+    start = _parse_datetime_column(pick('start'), df.index)
+    end = _parse_datetime_column(pick('end'), df.index)
+    hours = _parse_hours_column(pick('hours'), df.index)
+
+    valid = start.notna() & hours.notna()
+    if kind == RecordKind.LEAVE:
+        valid &= end.notna()
+    valid = valid.to_numpy()
+
+    return pd.DataFrame({
+        'name': pd.Categorical(names.fillna('未知').astype(str).to_numpy()[valid]),
+        'start': start.to_numpy()[valid],
+        'end': end.to_numpy()[valid],
+        'hours': hours.to_numpy(dtype=np.float32)[valid],
+        'kind': pd.Categorical([kind.value] * int(valid.sum()), categories=[k.value for k in RecordKind])
+    })
+
+
+def _parse_datetime_column(series: Optional[pd.Series], index: pd.Index) -> pd.Series:
+    """解析时间列，完整时间解析失败时退回只解析第一个空格前的日期部分"""
+    if series is None:
+        return pd.Series(pd.NaT, index=index, dtype='datetime64[ns]')
+    text = series.astype(str).where(series.notna())
+    parsed = pd.to_datetime(text, errors='coerce', format='mixed')
+    missing = parsed.isna() & text.notna()
+    if missing.any():
+        date_part = text[missing].str.split().str[0]
+        parsed[missing] = pd.to_datetime(date_part, errors='coerce', format='mixed')
+    return parsed
+
+
+def _parse_hours_column(series: Optional[pd.Series], index: pd.Index) -> pd.Series:
+    """将 "3小时"、"1天"、"2.5" 这类时长解析为小时数，无法解析时为NaN"""
+    if series is None:
+        return pd.Series(np.nan, index=index, dtype='float64')
+    text = series.astype(str).str.strip()
+    is_day = text.str.contains('天', regex=False)
+    number = pd.to_numeric(text.str.replace('小时', '', regex=False).str.replace('天', '', regex=False),
+                           errors='coerce')
+    return number.where(~is_day, number * 8).where(series.notna())
+
+
+# 每日汇总的列
+AGGREGATE_COLUMNS = ['name', 'date', 'overtime', 'leave']
+
+# 一个工作日按8小时计
+WORKDAY_HOURS = 8
+
+
+def empty_aggregates() -> pd.DataFrame:
+    """创建空的每日汇总"""
+    return pd.DataFrame({
+        'name': pd.Categorical([]),
+        'date': pd.Series([], dtype='datetime64[ns]'),
+        'overtime': pd.Series([], dtype=np.float32),
+        'leave': pd.Series([], dtype=np.float32)
+    })
+
+
+def lookup_workdays(days: np.ndarray, workday_bitmap: Callable[[int], np.ndarray]) -> np.ndarray:
+    """查询每个日期是否为工作日，只加载日期实际所在年份的工作日位图
+
+    Args:
+        days: 日期数组（datetime64[D]）
+        workday_bitmap: 返回某年每天是否为工作日的布尔数组
+
+    Returns:
+        np.ndarray: 与 days 等长的布尔数组
+    """
+    years = days.astype('datetime64[Y]')
+    day_of_year = (days - years.astype('datetime64[D]')).astype(np.int64)
+    result = np.zeros(len(days), dtype=bool)
+    for year in np.unique(years):
+        in_year = years == year
+        result[in_year] = workday_bitmap(int(str(year)))[day_of_year[in_year]]
+    return result
+
+
+def aggregate_daily_hours(records: pd.DataFrame, workday_bitmap: Callable[[int], np.ndarray]) -> pd.DataFrame:
+    """将归一化记录汇总为 人员×日期 的加班和请假小时数（长表）
+
+    - 加班记录计入开始日期
+    - 不超过8小时的请假计入开始日期，开始日期不是工作日时忽略
+    - 超过8小时的请假在开始到结束之间的每个工作日各计8小时
+
+    请假区间整体展开为日期数组，用工作日位图过滤后通过 np.add.at
+    累加到 人员×日期 矩阵中，不再逐天循环判断工作日。矩阵的列只包含有记录的日期，
+    个别日期填写错误（如2099年）的记录不会使矩阵覆盖整个日期跨度
+
+    Args:
+        records: 归一化记录
+        workday_bitmap: 返回某年每天是否为工作日（包含调休）的布尔数组
+
+    Returns:
+        pd.DataFrame: 包含 name、date、overtime、leave 四列，每个 (name, date) 只有一行
+    """
+    if records.empty:
+        return empty_aggregates()
+
+    name_codes, names = pd.factorize(records['name'].astype(str))
+    is_overtime = (records['kind'] == RecordKind.OVERTIME.value).to_numpy()
+    start_days = records['start'].to_numpy().astype('datetime64[D]')
+    end_days = records['end'].to_numpy().astype('datetime64[D]')
+    hours = records['hours'].to_numpy(dtype=np.float32)
+
+    # 请假区间：短请假只占开始当天，长请假占开始到结束之间的每一天
+    is_leave = ~is_overtime
+    is_long = is_leave & (hours > WORKDAY_HOURS)
+    span_ends = np.where(is_long, end_days, start_days)
+    spans = np.where(is_leave, (span_ends - start_days).astype(np.int64) + 1, 0).clip(min=0)
+
+    # 加班直接计入开始日期
+    overtime_days = start_days[is_overtime]
+
+    # 请假区间展开为 (记录, 日期) 对，只保留工作日
+    record_ids = np.repeat(np.arange(len(records)), spans)
+    span_starts = np.cumsum(spans) - spans
+    day_offsets = np.arange(len(record_ids)) - np.repeat(span_starts, spans)
+    leave_days = start_days[record_ids] + day_offsets
+    on_workday = lookup_workdays(leave_days, workday_bitmap)
+    record_ids = record_ids[on_workday]
+    leave_days = leave_days[on_workday]
+    leave_hours = np.where(is_long[record_ids], np.float32(WORKDAY_HOURS), hours[record_ids])
+
+    # 只为有记录的日期分配矩阵列
+    occupied_days = np.unique(np.concatenate([overtime_days, leave_days]))
+    overtime = np.zeros((len(names), len(occupied_days)), dtype=np.float32)
+    leave = np.zeros((len(names), len(occupied_days)), dtype=np.float32)
+    np.add.at(overtime, (name_codes[is_overtime], np.searchsorted(occupied_days, overtime_days)), hours[is_overtime])
+    np.add.at(leave, (name_codes[record_ids], np.searchsorted(occupied_days, leave_days)), leave_hours)
+
+    # 只保留有数据的 (人员, 日期)
+    rows, days = np.nonzero((overtime != 0) | (leave != 0))
+    return pd.DataFrame({
+        'name': pd.Categorical.from_codes(rows, categories=names.astype(str)),
+        'date': occupied_days[days].astype('datetime64[ns]'),
+        'overtime': overtime[rows, days],
+        'leave': leave[rows, days]
+    })
+
+
+def merge_daily_aggregates(partials: List[pd.DataFrame]) -> pd.DataFrame:
+    """合并多个每日汇总，相同 (name, date) 的小时数相加"""
+    partials = [partial for partial in partials if not partial.empty]
+    if not partials:
+        return empty_aggregates()
+    combined = pd.concat(partials, ignore_index=True)
+    combined['name'] = combined['name'].astype(str)
+    merged = combined.groupby(['name', 'date'], sort=False, as_index=False)[['overtime', 'leave']].sum()
+    merged['name'] = merged['name'].astype('category')
+    merged['overtime'] = merged['overtime'].astype(np.float32)
+    merged['leave'] = merged['leave'].astype(np.float32)
+    return merged[AGGREGATE_COLUMNS]
@@ -5,6 +5,9 @@ from datetime import datetime
 from io import BytesIO
 import calendar
 import re
+from core.logger import get_logger
+
+logger = get_logger(__name__)
 
 class ReportService:
     # 事项类型映射
@@ -200,9 +203,7 @@ class ReportService:
             return output
         except Exception as e:
             # 记录错误并重新抛出
-            print(f"生成出差报表时出错: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("生成出差报表时出错: %s", e)
             raise 
 
     @staticmethod
@@ -294,7 +295,7 @@ class ReportService:
                 if not sheet_name or not re.match(r'^[a-zA-Z0-9\u4e00-\u9fa5]+$', sheet_name):
                     sheet_name = "ExpenseReport"
             except Exception as e:
-                print(f"处理工作表名称时出错: {str(e)}")
+                logger.warning("处理工作表名称时出错: %s", e)
                 sheet_name = "ExpenseReport"
 
             # 写入Excel
@@ -347,7 +348,5 @@ class ReportService:
             return output
         except Exception as e:
             # 记录错误并重新抛出
-            print(f"生成报销明细报表时出错: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("生成报销明细报表时出错: %s", e)
             raise 
\ No newline at end of file
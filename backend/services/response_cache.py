@@ -0,0 +1,168 @@
+import gzip
+import hashlib
+import threading
+import orjson
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Set
+from fastapi import Request
+from fastapi.responses import Response
+from core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 尝试导入brotli压缩（压缩率高于gzip，不可用时只提供gzip）
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+    logger.info("brotli 未安装，JSON响应缓存只提供gzip压缩")
+
+# gzip压缩级别，与 nginx 的 gzip_comp_level 保持一致
+GZIP_LEVEL = 6
+# brotli压缩质量
+BROTLI_QUALITY = 5
+# 小于该字节数的响应不压缩
+MIN_COMPRESS_SIZE = 1024
+
+
+class CachedBody:
+    """序列化并预压缩后的响应体"""
+
+    def __init__(self, payload: Any):
+        """序列化响应数据并生成压缩版本和ETag
+
+        Args:
+            payload: 可被orjson序列化的响应数据
+        """
+        self.raw = orjson.dumps(payload)
+        self.etag = f'"{hashlib.sha256(self.raw).hexdigest()[:32]}"'
+        self.encoded: Dict[str, bytes] = {}
+        if len(self.raw) >= MIN_COMPRESS_SIZE:
+            self.encoded['gzip'] = gzip.compress(self.raw, compresslevel=GZIP_LEVEL)
+            if BROTLI_AVAILABLE:
+                self.encoded['br'] = brotli.compress(self.raw, quality=BROTLI_QUALITY)
+
+    @property
+    def size(self) -> int:
+        """缓存占用的字节数"""
+        return len(self.raw) + sum(len(body) for body in self.encoded.values())
+
+
+class ResponseCache:
+    """不可变资源的JSON响应缓存
+
+    缓存序列化后的响应体及其gzip/brotli压缩版本，按LRU淘汰。
+    响应带有ETag，请求的 If-None-Match 匹配时直接返回304，
+    nginx 和浏览器都无需重新计算或重新压缩
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 64 * 1024 * 1024):
+        """初始化响应缓存
+
+        Args:
+            max_entries: 最多缓存的响应数
+            max_bytes: 缓存占用的最大字节数
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, CachedBody]" = OrderedDict()
+        # 标签 -> 缓存键集合，用于按文件等维度批量失效
+        self._tags: Dict[str, Set[str]] = {}
+        # 缓存键 -> 标签集合，删除缓存项时从对应标签中移除，避免标签索引无限增长
+        self._key_tags: Dict[str, Set[str]] = {}
+        self.total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CachedBody]:
+        """获取缓存的响应体"""
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key: str, payload: Any, tags: Iterable[str] = ()) -> CachedBody:
+        """序列化并缓存响应数据
+
+        Args:
+            key: 缓存键
+            payload: 响应数据
+            tags: 缓存项的标签，invalidate_tag 时一并删除
+
+        Returns:
+            CachedBody: 缓存的响应体
+        """
+        body = CachedBody(payload)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = body
+            self.total_bytes += body.size
+            key_tags = set(tags)
+            if key_tags:
+                self._key_tags[key] = key_tags
+            for tag in key_tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while self._entries and (len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+        return body
+
+    def _remove(self, key: str):
+        """删除一个缓存项，并从其标签中移除，标签下没有缓存项时删除标签"""
+        body = self._entries.pop(key, None)
+        if body is not None:
+            self.total_bytes -= body.size
+        for tag in self._key_tags.pop(key, ()):
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def invalidate_tag(self, tag: str):
+        """删除带有指定标签的所有缓存项"""
+        with self._lock:
+            for key in self._tags.pop(tag, set()):
+                self._remove(key)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self._key_tags.clear()
+            self.total_bytes = 0
+
+    def build_response(self, request: Request, body: CachedBody, cache_control: str) -> Response:
+        """根据请求头构建响应
+
+        If-None-Match 与ETag匹配时返回304，否则按 Accept-Encoding 选择预压缩的响应体
+
+        Args:
+            request: 当前请求
+            body: 缓存的响应体
+            cache_control: Cache-Control 响应头
+        """
+        headers = {
+            'ETag': body.etag,
+            'Cache-Control': cache_control,
+            'Vary': 'Accept-Encoding'
+        }
+
+        if_none_match = request.headers.get('if-none-match', '')
+        candidates = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+        if body.etag in candidates or if_none_match.strip() == '*':
+            return Response(status_code=304, headers=headers)
+
+        accept_encoding = request.headers.get('accept-encoding', '').lower()
+        for encoding in ('br', 'gzip'):
+            if encoding in body.encoded and encoding in accept_encoding:
+                headers['Content-Encoding'] = encoding
+                return Response(content=body.encoded[encoding], headers=headers, media_type='application/json')
+
+        return Response(content=body.raw, headers=headers, media_type='application/json')
+
+
+# 创建单例实例
+response_cache = ResponseCache()
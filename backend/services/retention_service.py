@@ -0,0 +1,183 @@
+import os
+import heapq
+import asyncio
+import threading
+from typing import List, Dict, Tuple, Callable, Optional
+from services.settings_service import settings_service
+from core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 每批最多清理的文件数，批与批之间让出事件循环
+EVICT_BATCH = 50
+
+
+class RetentionManager:
+    """上传目录保留策略管理
+
+    维护所有上传文件和导出产物的有序索引（按修改时间的最小堆），记录每个文件的大小，
+    增量地执行文件数量和总占用空间两种配额。只在启动后首次使用时扫描一次目录，
+    之后通过 register/unregister 维护索引，清理时只需从堆顶弹出最旧的文件。
+    """
+
+    def __init__(self):
+        """初始化保留策略管理"""
+        # 纳入管理的目录列表，由各服务初始化时登记
+        self.directories: List[str] = []
+        # 最小堆：(修改时间, 路径)，文件被替换或删除后旧记录延迟清除
+        self._heap: List[Tuple[float, str]] = []
+        # 当前有效记录：路径 -> (修改时间, 文件大小)
+        self._entries: Dict[str, Tuple[float, int]] = {}
+        self.total_bytes = 0
+        self._evict_callbacks: List[Callable[[str], None]] = []
+        self._lock = threading.Lock()
+        self._scanned = False
+        self._pending = False
+        self._task: Optional[asyncio.Task] = None
+
+    def add_directory(self, directory: str):
+        """将目录纳入管理"""
+        with self._lock:
+            if directory not in self.directories:
+                self.directories.append(directory)
+                # 启动后新增的目录需要补充扫描
+                if self._scanned:
+                    self._scan_directory(directory)
+
+    def add_evict_callback(self, callback: Callable[[str], None]):
+        """注册文件被清理时的回调，用于同步清理相关缓存"""
+        self._evict_callbacks.append(callback)
+
+    def _ensure_scanned(self):
+        """首次使用时扫描目录建立索引"""
+        if self._scanned:
+            return
+        self._scanned = True
+        for directory in self.directories:
+            self._scan_directory(directory)
+
+    def _scan_directory(self, directory: str):
+        """扫描目录中的文件加入索引"""
+        os.makedirs(directory, exist_ok=True)
+        with os.scandir(directory) as it:
+            for entry in it:
+                # 跳过正在写入的临时文件
+                if entry.is_file() and '.tmp.' not in entry.name:
+                    stat = entry.stat()
+                    self._add(os.path.join(directory, entry.name), stat.st_mtime, stat.st_size)
+
+    def _add(self, path: str, mtime: float, size: int):
+        """添加或更新一条记录"""
+        old = self._entries.get(path)
+        if old:
+            self.total_bytes -= old[1]
+        self._entries[path] = (mtime, size)
+        self.total_bytes += size
+        heapq.heappush(self._heap, (mtime, path))
+
+    def register(self, path: str):
+        """登记新写入或被替换的文件"""
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            logger.warning("登记文件 %s 失败: %s", path, e)
+            return
+        with self._lock:
+            self._ensure_scanned()
+            self._add(path, stat.st_mtime, stat.st_size)
+
+    def unregister(self, path: str):
+        """移除已被删除的文件记录"""
+        with self._lock:
+            entry = self._entries.pop(path, None)
+            if entry:
+                self.total_bytes -= entry[1]
+            self._compact()
+
+    def _compact(self):
+        """堆中过期记录过多时重建堆"""
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [(mtime, path) for path, (mtime, _) in self._entries.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_oldest(self) -> Optional[str]:
+        """弹出最旧的有效记录"""
+        while self._heap:
+            mtime, path = heapq.heappop(self._heap)
+            entry = self._entries.get(path)
+            if entry and entry[0] == mtime:
+                del self._entries[path]
+                self.total_bytes -= entry[1]
+                return path
+        return None
+
+    def enforce(self, limit: Optional[int] = None) -> int:
+        """执行文件数量和空间配额，删除最旧的文件
+
+        Args:
+            limit: 本次最多删除的文件数，None表示不限制
+
+        Returns:
+            int: 本次删除的文件数
+        """
+        max_files = settings_service.get_max_files()
+        max_bytes = settings_service.get_max_storage_bytes()
+        evicted = []
+        with self._lock:
+            self._ensure_scanned()
+            while len(self._entries) > max_files or self.total_bytes > max_bytes:
+                if limit is not None and len(evicted) >= limit:
+                    break
+                path = self._pop_oldest()
+                if path is None:
+                    break
+                evicted.append(path)
+            self._compact()
+
+        for path in evicted:
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+                logger.info("已删除旧文件: %s", path)
+            except Exception as e:
+                logger.error("删除文件 %s 失败: %s", path, e)
+            for callback in self._evict_callbacks:
+                try:
+                    callback(path)
+                except Exception as e:
+                    logger.error("清理文件 %s 的缓存失败: %s", path, e)
+
+        if evicted:
+            logger.info("文件清理完成，已删除 %s 个文件，当前 %s 个文件，共 %.1fMB",
+                        len(evicted), len(self._entries), self.total_bytes / 1024 / 1024)
+        return len(evicted)
+
+    def request_enforce(self):
+        """请求在后台执行配额检查，不阻塞当前请求"""
+        self._pending = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # 不在事件循环中时直接执行
+            self._pending = False
+            self.enforce()
+            return
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        """后台分批执行清理，批与批之间让出事件循环"""
+        while self._pending:
+            self._pending = False
+            while self.enforce(limit=EVICT_BATCH) >= EVICT_BATCH:
+                await asyncio.sleep(0)
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取当前索引的文件数量和总大小"""
+        with self._lock:
+            self._ensure_scanned()
+            return {'files': len(self._entries), 'bytes': self.total_bytes}
+
+
+# 创建单例实例，统一管理上传文件和导出产物
+retention_manager = RetentionManager()
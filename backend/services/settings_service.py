@@ -1,8 +1,11 @@
 import json
 import os
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 from models.schemas import SystemSettings
+from core.logger import get_logger
+
+logger = get_logger(__name__)
 
 class SettingsService:
     """系统设置服务"""
@@ -37,10 +40,10 @@ class SettingsService:
                     # 检查是否有缺失字段，如果有则保存更新后的设置
                     if len(self.settings) != len(loaded_settings):
                         self._save_settings()
-                        print("系统设置已更新，补充了缺失的默认字段")
+                        logger.info("系统设置已更新，补充了缺失的默认字段")
                         
             except Exception as e:
-                print(f"加载系统设置失败: {str(e)}")
+                logger.error("加载系统设置失败: %s", e)
                 self.settings = self.default_settings.copy()
                 self._save_settings()
     
@@ -50,7 +53,7 @@ class SettingsService:
             with open(self.settings_file, 'w', encoding='utf-8') as f:
                 json.dump(self.settings, f, ensure_ascii=False, indent=2)
         except Exception as e:
-            print(f"保存系统设置失败: {str(e)}")
+            logger.error("保存系统设置失败: %s", e)
     
     def get_settings(self) -> Dict[str, Any]:
         """获取系统设置"""
@@ -70,5 +73,17 @@ class SettingsService:
         """获取最大文件数量设置"""
         return self.settings.get("max_files", 100)
 
+    def get_max_storage_bytes(self) -> int:
+        """获取最大占用空间设置（字节）"""
+        return self.settings.get("max_storage_mb", 1024) * 1024 * 1024
+
+    def get_excel_engine(self) -> str:
+        """获取Excel读取引擎设置"""
+        return self.settings.get("excel_engine", "auto")
+
+    def get_record_columns(self) -> Optional[Dict[str, Dict[str, List[str]]]]:
+        """获取加班/请假记录的自定义列映射"""
+        return self.settings.get("record_columns")
+
 # 创建单例实例
 settings_service = SettingsService() 
\ No newline at end of file
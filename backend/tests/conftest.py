@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# 服务单例在导入时按相对路径创建上传目录、读写系统设置文件，
+# 测试在临时目录中运行，不修改仓库中的数据
+os.chdir(tempfile.mkdtemp(prefix='backend_tests_'))
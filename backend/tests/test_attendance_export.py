@@ -0,0 +1,34 @@
+import openpyxl
+import pandas as pd
+from services.excel_service import ExcelService
+
+INTEGER_FORMAT = '#,##0;-#,##0;0;@'
+DECIMAL_FORMAT = '#,##0.0;-#,##0.0;0;@'
+
+
+def test_attendance_sheet_cell_formats(tmp_path):
+    columns = ['姓名', '1', '2', '3', '加班时长', '调/请假', '总时长', '总时长(天)']
+    result_df = pd.DataFrame([
+        ['张三', 1, '', 2.5, 8.0, -4, 4, 0.5],
+        ['李四', '', 3.5, '', 0, -2.5, -2.5, 0],
+    ], columns=columns)
+    path = tmp_path / 'attendance.xlsx'
+
+    with pd.ExcelWriter(path, engine='xlsxwriter') as writer:
+        ExcelService()._write_attendance_sheet(writer, '2024年3月', result_df, columns, 3, 2024, 3)
+
+    worksheet = openpyxl.load_workbook(path)['2024年3月']
+    assert {str(cell_range) for cell_range in worksheet.merged_cells.ranges} == {
+        'A1:A2', 'B1:D1', 'E1:E2', 'F1:F2', 'G1:G2', 'H1:H2'
+    }
+    assert worksheet['B1'].value == '2024年3月加班统计表（小时）'
+    assert [cell.value for cell in worksheet[2]][1:4] == ['1', '2', '3']
+
+    # 整数不显示小数点，小数保留一位，空值写入带边框的空白单元格
+    rows = [[(cell.value, cell.number_format) for cell in row] for row in worksheet.iter_rows(min_row=3)]
+    assert rows == [
+        [('张三', INTEGER_FORMAT), (1, INTEGER_FORMAT), (None, INTEGER_FORMAT), (2.5, DECIMAL_FORMAT),
+         (8, INTEGER_FORMAT), (-4, INTEGER_FORMAT), (4, INTEGER_FORMAT), (0.5, DECIMAL_FORMAT)],
+        [('李四', INTEGER_FORMAT), (None, INTEGER_FORMAT), (3.5, DECIMAL_FORMAT), (None, INTEGER_FORMAT),
+         (0, INTEGER_FORMAT), (-2.5, DECIMAL_FORMAT), (-2.5, DECIMAL_FORMAT), (0, INTEGER_FORMAT)],
+    ]
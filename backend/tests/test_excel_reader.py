@@ -0,0 +1,46 @@
+import pandas as pd
+import pytest
+from services.excel_reader import read_excel_file_with_header
+from services.records import get_column_mapping, get_mapping_columns, normalize_records
+
+ENGINES = ['openpyxl']
+EXPORT_COLUMNS = ['加班人', '开始时间', '结束时间', '时长', '加班原因']
+
+
+@pytest.fixture
+def wide_workbook(tmp_path) -> str:
+    """带有大量审批字段的加班记录，与钉钉导出的宽表类似"""
+    rows = 20
+    data = {f'审批字段{i}': [f'值{i}-{j}' for j in range(rows)] for i in range(30)}
+    data.update({
+        '加班原因': ['上线'] * rows,
+        '加班人': [f'员工{j % 4}' for j in range(rows)],
+        '开始时间': ['2024-03-04 18:00'] * rows,
+        '结束时间': ['2024-03-04 21:00'] * rows,
+        '时长': [3] * rows,
+    })
+    path = tmp_path / 'overtime.xlsx'
+    pd.DataFrame(data).to_excel(path, index=False)
+    return str(path)
+
+
+def test_projected_read_matches_full_read(wide_workbook):
+    full = read_excel_file_with_header(wide_workbook, ENGINES)
+    projected = read_excel_file_with_header(wide_workbook, ENGINES, EXPORT_COLUMNS)
+
+    assert list(projected.columns) == EXPORT_COLUMNS
+    pd.testing.assert_frame_equal(projected, full[EXPORT_COLUMNS])
+
+
+def test_projected_read_keeps_records(wide_workbook):
+    mapping = get_column_mapping()
+    full = read_excel_file_with_header(wide_workbook, ENGINES)
+    projected = read_excel_file_with_header(wide_workbook, ENGINES, get_mapping_columns(mapping))
+
+    assert len(projected.columns) < len(full.columns)
+    pd.testing.assert_frame_equal(normalize_records(projected, mapping), normalize_records(full, mapping))
+
+
+def test_projection_without_needed_columns_returns_all_columns(wide_workbook):
+    df = read_excel_file_with_header(wide_workbook, ENGINES, ['不存在的列'])
+    assert len(df.columns) == 35
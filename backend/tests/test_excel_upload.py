@@ -0,0 +1,88 @@
+import asyncio
+import os
+import pandas as pd
+import pytest
+from services.excel_service import ExcelService
+
+
+class MemoryUpload:
+    """模拟 FastAPI UploadFile 的内存文件"""
+
+    def __init__(self, filename: str, content: bytes):
+        self.filename = filename
+        self._content = content
+        self._offset = 0
+
+    async def read(self, size: int = -1) -> bytes:
+        end = len(self._content) if size < 0 else self._offset + size
+        chunk = self._content[self._offset:end]
+        self._offset += len(chunk)
+        return chunk
+
+
+@pytest.fixture
+def leave_workbook(tmp_path) -> bytes:
+    path = tmp_path / 'leave.xlsx'
+    pd.DataFrame({
+        '创建人': ['张三', '李四', '王五'],
+        '请假类型': ['事假', '年假', '病假'],
+        '开始时间': ['2024-03-04 09:00', '2024-03-05 09:00', '2024-03-06 09:00'],
+        '结束时间': ['2024-03-04 18:00', '2024-03-05 18:00', '2024-03-06 18:00'],
+        '时长': [8, 8, 4],
+    }).to_excel(path, index=False)
+    return path.read_bytes()
+
+
+def test_concurrent_duplicate_upload_during_fallback_parse(monkeypatch, leave_workbook):
+    service = ExcelService()
+
+    # 只读模式无法读取的文件（如.xls）在生成预览前先完整解析
+    def fail_preview(file_path, rows):
+        raise ValueError('read-only preview unsupported')
+    monkeypatch.setattr(service, 'read_excel_preview', fail_preview)
+
+    async def upload_twice():
+        return await asyncio.gather(
+            service.process_upload(MemoryUpload('leave.xls', leave_workbook), 'leave'),
+            service.process_upload(MemoryUpload('leave_copy.xls', leave_workbook), 'leave'),
+        )
+
+    first, second = asyncio.run(upload_twice())
+    assert first.total_rows == second.total_rows == 3
+
+    # 两次上传共享同一个磁盘文件和引用计数
+    assert len(service.blobs) == 1
+    blob = next(iter(service.blobs.values()))
+    assert blob['refs'] == {first.file_id, second.file_id}
+    assert service.files[first.file_id]['path'] == service.files[second.file_id]['path'] == blob['path']
+    assert len(os.listdir(service.upload_dir)) == 1
+
+    # 删除其中一个文件后磁盘文件仍被另一个文件使用，全部删除后才释放
+    asyncio.run(service.delete_file(first.file_id))
+    assert os.path.exists(blob['path'])
+    assert service.files[second.file_id]['status'] == 'ready'
+    asyncio.run(service.delete_file(second.file_id))
+    assert not os.path.exists(blob['path'])
+    assert service.blobs == {}
+
+
+def test_page_headers_follow_parsed_frame(tmp_path):
+    # 首行时长为空：只读预览推断为字符串，完整解析后为数值列
+    path = tmp_path / 'leave.xlsx'
+    pd.DataFrame({
+        '创建人': ['张三', '李四'],
+        '开始时间': ['2024-03-04 09:00', '2024-03-05 09:00'],
+        '时长': [None, 8.0],
+    }).to_excel(path, index=False)
+    service = ExcelService()
+
+    async def upload_and_page():
+        preview = await service.process_upload(MemoryUpload('leave.xlsx', path.read_bytes()), 'leave')
+        await service.wait_parsed([preview.file_id])
+        page = await service.get_paginated_data(preview.file_id, 1, 10)
+        return preview, page
+
+    preview, page = asyncio.run(upload_and_page())
+    assert {header.key: header.type for header in preview.headers}['时长'] == 'string'
+    assert {header.key: header.type for header in page.headers}['时长'] == 'number'
+    assert page.total == 2
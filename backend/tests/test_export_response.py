@@ -0,0 +1,51 @@
+import os
+import re
+from api import routes
+
+NGINX_CONF = os.path.join(os.path.dirname(__file__), '..', '..', 'nginx.conf')
+# nginx 在 X-Accel-Redirect 内部跳转时保留的后端响应头，其余响应头需要在 internal location 中显式转发
+ACCEL_PASSTHROUGH_HEADERS = {
+    'content-type', 'content-disposition', 'accept-ranges', 'set-cookie', 'cache-control', 'expires',
+    'x-accel-redirect', 'content-length'
+}
+
+
+def get_protected_location_headers():
+    """读取 nginx.conf 中导出文件 internal location 转发的响应头"""
+    with open(NGINX_CONF, encoding='utf-8') as f:
+        conf = f.read()
+    block = re.search(r'location /_protected_uploads/ \{(.*?)\}', conf, re.S).group(1)
+    return {name.lower(): value for name, value in re.findall(r'add_header\s+(\S+)\s+(\S+)', block)}
+
+
+def test_accel_response_keeps_extra_headers(monkeypatch, tmp_path):
+    monkeypatch.setattr(routes, 'EXPORT_ACCEL_REDIRECT', True)
+    monkeypatch.setattr(routes, 'UPLOADS_ROOT', str(tmp_path))
+    file_path = tmp_path / 'exports' / 'merged.xlsx'
+    file_path.parent.mkdir()
+    file_path.write_bytes(b'xlsx')
+
+    response = routes.build_export_response(str(file_path), '合并请假记录.xlsx', {'X-Dropped-Duplicates': '500'})
+
+    assert response.body == b''
+    assert response.headers['x-accel-redirect'] == '/_protected_uploads/exports/merged.xlsx'
+    assert response.headers['x-dropped-duplicates'] == '500'
+    assert 'attachment' in response.headers['content-disposition']
+
+    # 跳转后 nginx 会丢弃未显式转发的自定义响应头
+    forwarded = get_protected_location_headers()
+    for name in response.headers.keys():
+        if name in ACCEL_PASSTHROUGH_HEADERS:
+            continue
+        assert forwarded.get(name) == f"$upstream_http_{name.replace('-', '_')}", name
+
+
+def test_file_response_without_accel(monkeypatch, tmp_path):
+    monkeypatch.setattr(routes, 'EXPORT_ACCEL_REDIRECT', False)
+    file_path = tmp_path / 'merged.xlsx'
+    file_path.write_bytes(b'xlsx')
+
+    response = routes.build_export_response(str(file_path), '合并请假记录.xlsx', {'X-Dropped-Duplicates': '3'})
+
+    assert 'x-accel-redirect' not in response.headers
+    assert response.headers['x-dropped-duplicates'] == '3'
@@ -28,6 +28,7 @@ export interface ColumnHeader {
 export interface ExcelPreview {
     file_id: string
     total_rows: number
+    total_rows_estimated?: boolean
     sample_data: any[]
     headers: ColumnHeader[]
 }